@@ -1,67 +1,366 @@
 import os
 import sys
 import numpy as np
-import tensorflow as tf
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, g, render_template, request, jsonify, send_from_directory, stream_with_context
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
-import cv2
-from PIL import Image
 import json
 from datetime import datetime
 import base64
-import io
+import hmac
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add current directory to path to import utilities
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.model_utils import ModelManager
-from utils.image_processing import ImageProcessor
+from utils.model_registry import ModelRegistry
+from utils.image_processing import ImageProcessor, DEFAULT_TTA_VARIANTS
+from utils.prediction_cache import PredictionCache
+from utils.metrics import MetricsRegistry
+from utils.runtime import startup_report
+
+class PredictionRequest(Request):
+    """Request class allowing larger bodies on the batch endpoint."""
+    
+    @property
+    def max_content_length(self):
+        if self.path == '/api/predict/batch':
+            return app.config['BATCH_MAX_CONTENT_LENGTH']
+        return app.config['MAX_CONTENT_LENGTH']
 
 app = Flask(__name__)
+app.request_class = PredictionRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['BATCH_MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max batch upload
+app.config['BATCH_MAX_FILES'] = int(os.environ.get('BATCH_MAX_FILES', '500'))
+# Shared secret enabling raw uint8 tensor input on /api/predict (empty disables it)
+app.config['RAW_TENSOR_TOKEN'] = os.environ.get('RAW_TENSOR_TOKEN', '')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['SECRET_KEY'] = 'tomato_disease_detection_secret_key'
+# Keep a copy of uploaded images on disk (written in the background)
+app.config['SAVE_UPLOADS'] = os.environ.get('SAVE_UPLOADS', '0') == '1'
+# Inference backend: 'tflite' (default), 'keras' (compiled tf.function) or 'savedmodel'
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'tflite')
+# Micro-batching of concurrent inference requests
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', '8'))
+app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+# Model cascade: CASCADE_MODEL names a small model that answers first and only
+# passes images it is less than CASCADE_THRESHOLD confident about to the main model
+# (empty threshold: use the value calibrated into the small model's metadata)
+app.config['CASCADE_MODEL'] = os.environ.get('CASCADE_MODEL', '')
+app.config['CASCADE_THRESHOLD'] = (
+    float(os.environ['CASCADE_THRESHOLD']) if os.environ.get('CASCADE_THRESHOLD') else None
+)
+# Test-time augmentation variants scored together when a request asks for TTA
+app.config['TTA_VARIANTS'] = tuple(
+    os.environ.get('TTA_VARIANTS', ','.join(DEFAULT_TTA_VARIANTS)).split(',')
+)
+# Content-addressed cache of results for repeated uploads (size 0 disables it)
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', '1024'))
+app.config['PREDICTION_CACHE_TTL'] = float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+# Interpreter pool: each member runs TFLITE_NUM_THREADS threads
+app.config['TFLITE_NUM_THREADS'] = int(os.environ.get('TFLITE_NUM_THREADS', '1'))
+app.config['TFLITE_POOL_SIZE'] = int(os.environ.get(
+    'TFLITE_POOL_SIZE', max(1, (os.cpu_count() or 1) // app.config['TFLITE_NUM_THREADS'])
+))
+app.config['TFLITE_USE_XNNPACK'] = os.environ.get('TFLITE_USE_XNNPACK', '1') == '1'
+# Model hot-swap: admin endpoints need ADMIN_TOKEN (empty disables them);
+# MODEL_WATCH_INTERVAL > 0 polls model/saved_models for changes
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+app.config['MODEL_WATCH_INTERVAL'] = float(os.environ.get('MODEL_WATCH_INTERVAL', '0'))
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Single background writer so storing uploads never blocks a request
+upload_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-writer')
+
+# Decode and preprocessing workers for batch requests (OpenCV releases the GIL)
+preprocess_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='preprocess')
+
 # Initialize model manager and image processor
 model_manager = ModelManager()
 image_processor = ImageProcessor()
 
-# Global variables for model and metadata
-model = None
-metadata = {}
-tflite_interpreter = None
-use_tflite = True  # Set to True to use TensorFlow Lite for faster inference
+# Prometheus metrics of this process (each gunicorn worker exports its own)
+metrics = MetricsRegistry('tomato')
+stage_seconds = metrics.histogram(
+    'stage_seconds', 'Time spent in each stage of the prediction pipeline.', ('stage',)
+)
+inference_batch_size = metrics.histogram(
+    'inference_batch_size', 'Images per inference backend call.',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+requests_total = metrics.counter(
+    'http_requests_total', 'HTTP requests by route, method and outcome.', ('route', 'method', 'outcome')
+)
+request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route.', ('route',)
+)
+predictions_total = metrics.counter(
+    'predictions_total', 'Images scored (cache hits excluded) by outcome.', ('outcome',)
+)
+cascade_stage_total = metrics.counter(
+    'cascade_stage_total', 'Images answered by each stage of the model cascade.', ('stage',)
+)
+cache_hits_total = metrics.counter(
+    'prediction_cache_hits_total', 'Prediction cache lookups answered without inference.'
+)
+cache_misses_total = metrics.counter(
+    'prediction_cache_misses_total', 'Prediction cache lookups that ran inference.'
+)
+
+def on_model_activated(version):
+    """Invalidate cached results when a new model version goes live."""
+    prediction_cache.set_model_identity(version.identity)
+
+def on_inference(batch_size, seconds):
+    """Record the latency and size of an inference backend call."""
+    stage_seconds.observe(seconds, stage='inference')
+    inference_batch_size.observe(batch_size)
+
+def on_cache_lookup(hit):
+    """Count a prediction cache hit or miss."""
+    (cache_hits_total if hit else cache_misses_total).inc()
+
+prediction_cache = PredictionCache(
+    max_entries=app.config['PREDICTION_CACHE_SIZE'],
+    ttl_seconds=app.config['PREDICTION_CACHE_TTL'],
+    on_lookup=on_cache_lookup
+)
+
+def backend_options():
+    """Options for the configured inference backend."""
+    if app.config['INFERENCE_BACKEND'] == 'tflite':
+        return {
+            'pool_size': app.config['TFLITE_POOL_SIZE'],
+            'num_threads': app.config['TFLITE_NUM_THREADS'],
+            'use_xnnpack': app.config['TFLITE_USE_XNNPACK']
+        }
+    return {}
+
+# Versioned models; each version owns its inference backend and batch scheduler
+model_registry = ModelRegistry(
+    model_manager,
+    backend=app.config['INFERENCE_BACKEND'],
+    backend_options=backend_options(),
+    batch_max_size=app.config['BATCH_MAX_SIZE'],
+    batch_max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+    on_activate=on_model_activated,
+    on_inference=on_inference,
+    cascade_model=app.config['CASCADE_MODEL'] or None,
+    cascade_threshold=app.config['CASCADE_THRESHOLD']
+)
+
+def active_gauge(read):
+    """Gauge callback reading a value from the active model version."""
+    def callback():
+        active = model_registry.active
+        return [({}, read(active))] if active is not None else []
+    return callback
+
+def cache_gauge(key):
+    """Gauge callback reading a prediction cache statistic."""
+    return lambda: [({}, prediction_cache.stats()[key])]
+
+metrics.gauge('batch_queue_depth', 'Images waiting in the batch scheduler queue.',
+              active_gauge(lambda version: version.scheduler.queue_depth))
+metrics.gauge('inference_in_flight', 'Inference backend calls currently executing.',
+              active_gauge(lambda version: version.running_inferences))
+metrics.gauge('model_requests_in_flight', 'Requests pinned to the active model version.',
+              active_gauge(lambda version: version.in_flight))
+metrics.gauge('interpreter_pool_utilization', 'Fraction of pooled TFLite interpreters in use.',
+              active_gauge(lambda version: version.backend.stats().get('utilization')))
+metrics.gauge('interpreter_pool_size', 'Interpreters in the TFLite interpreter pool.',
+              active_gauge(lambda version: version.backend.stats().get('pool_size')))
+metrics.gauge('prediction_cache_hit_rate', 'Fraction of prediction cache lookups that hit.', cache_gauge('hit_rate'))
+metrics.gauge('prediction_cache_entries', 'Results held in the prediction cache.', cache_gauge('entries'))
+metrics.gauge(
+    'model_info', 'Active model version (always 1).',
+    lambda: [(model_registry.active.describe(), 1)] if model_registry.active is not None else [],
+    ('model_name', 'version', 'backend', 'identity')
+)
 
 def load_model():
     """Load the trained model."""
-    global model, metadata, tflite_interpreter
+    # Follow changes to model/saved_models even if nothing loads yet
+    if app.config['MODEL_WATCH_INTERVAL'] > 0:
+        model_registry.start_watching(app.config['MODEL_WATCH_INTERVAL'])
     
-    try:
-        if use_tflite:
-            # Try to load TFLite model first
-            tflite_interpreter, metadata = model_manager.load_tflite_model()
-            print("Loaded TensorFlow Lite model successfully!")
-        else:
-            # Load regular Keras model
-            model, metadata = model_manager.load_model()
-            print("Loaded Keras model successfully!")
-        
-        return True
-    except Exception as e:
-        print(f"Error loading model: {str(e)}")
+    # Load and warm the active version on the configured backend
+    if not model_registry.activate():
         return False
+    print(f"Loaded model with the {app.config['INFERENCE_BACKEND']} backend successfully!")
+    return True
+
+def create_app(preload_only=False):
+    """
+    Application factory for WSGI servers such as gunicorn.
+    
+    Args:
+        preload_only: Only read the TFLite model into memory (TFLite backend)
+            and leave creating the interpreters to ``load_model()``. Used with gunicorn's
+            ``preload_app``, where the factory runs in the master before the
+            workers are forked (see gunicorn.conf.py)
+        
+    Returns:
+        The Flask application
+    """
+    if preload_only:
+        # Interpreters and their threads must not be created before fork
+        model_registry.preload()
+    elif not model_loaded():
+        print("Loading model...")
+        if load_model():
+            print(f"Startup report: {json.dumps(startup_report())}")
+        else:
+            print("Warning: Could not load model. Please train the model first.")
+    
+    return app
+
+def model_loaded():
+    """Check whether a model is ready to serve."""
+    return model_registry.active is not None
 
 def allowed_file(filename):
     """Check if the uploaded file is allowed."""
     allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def upload_filename(filename):
+    """
+    Build the stored name of an uploaded file.
+    
+    Args:
+        filename: Original name of the uploaded file
+        
+    Returns:
+        Sanitized, timestamped file name
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{timestamp}_{secure_filename(filename)}"
+
+def save_upload(image_bytes, filename):
+    """
+    Store uploaded image bytes in the upload folder.
+    
+    Args:
+        image_bytes: Raw bytes of the uploaded file
+        filename: Name of the file inside the upload folder
+    """
+    try:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        with open(filepath, 'wb') as f:
+            f.write(image_bytes)
+    except Exception as e:
+        print(f"Error saving upload {filename}: {str(e)}")
+
+def preprocess_image_bytes(image_bytes, out):
+    """
+    Decode, enhance and preprocess an encoded image for model input.
+    
+    Args:
+        image_bytes: Raw bytes of the uploaded image
+        out: Preallocated buffer of shape (height, width, channels)
+        
+    Returns:
+        Preprocessed image with shape (height, width, channels)
+    """
+    with stage_seconds.time(stage='decode'):
+        image = image_processor.load_image_from_bytes(image_bytes)
+    return prepare_model_input(image, out)
+
+def prepare_model_input(image, out):
+    """
+    Enhance and preprocess a decoded image, recording the stage timings.
+    
+    Args:
+        image: Decoded RGB image as numpy array
+        out: Preallocated model input buffer
+        
+    Returns:
+        Preprocessed image
+    """
+    timings = {}
+    processed = image_processor.prepare_model_input(image, out, timings)
+    for stage, seconds in timings.items():
+        stage_seconds.observe(seconds, stage=stage)
+    return processed
+
+def decode_data_url(image_data):
+    """
+    Decode a base64 image, with or without a data URL prefix.
+    
+    Args:
+        image_data: Base64 string, e.g. ``data:image/jpeg;base64,...``
+        
+    Returns:
+        Raw image bytes
+    """
+    return base64.b64decode(image_data.split(',')[-1])
+
+RAW_TENSOR_MIMETYPE = 'application/x-uint8-tensor'
+
+def tta_requested(value):
+    """Interpret a ``tta`` form field, query parameter or JSON value as a flag."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def predict_from_api_body(content_type, body, token=None, tta=False):
+    """
+    Predict disease from the body of an /api/predict request.
+    
+    Supported bodies:
+        - ``application/json`` with a base64 ``image`` field (data URL or plain base64)
+        - ``application/octet-stream`` or ``image/*`` with the encoded image bytes
+        - ``application/x-uint8-tensor`` with a decoded RGB frame at model
+          resolution (uint8, 224x224x3), for trusted clients presenting the
+          ``RAW_TENSOR_TOKEN``
+    
+    Args:
+        content_type: Content-Type header of the request
+        body: Raw request body
+        token: Value of the X-Internal-Token header, if any
+        tta: Use test-time augmentation (a JSON body may override it with a ``tta`` field)
+        
+    Returns:
+        Tuple of (response dictionary, HTTP status code)
+    """
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    
+    if mimetype == RAW_TENSOR_MIMETYPE:
+        expected_token = app.config['RAW_TENSOR_TOKEN']
+        if not expected_token or not token or not hmac.compare_digest(token, expected_token):
+            return {'error': 'Raw tensor input is not enabled for this client'}, 403
+        
+        width, height = image_processor.target_size
+        expected_size = height * width * 3
+        if len(body) != expected_size:
+            return {'error': f'Raw tensor must be {expected_size} bytes (uint8 {height}x{width}x3)'}, 400
+        
+        # Already decoded at model resolution: skip straight to enhancement
+        image = np.frombuffer(body, dtype=np.uint8).reshape(height, width, 3)
+        return predict_disease_from_array(image, tta), 200
+    
+    if mimetype == 'application/octet-stream' or mimetype.startswith('image/'):
+        if not body:
+            return {'error': 'No image data provided'}, 400
+        return predict_disease_from_bytes(body, tta), 200
+    
+    data = json.loads(body) if body else None
+    if not data or 'image' not in data:
+        return {'error': 'No image data provided'}, 400
+    
+    tta = tta_requested(data.get('tta', tta))
+    return predict_disease_from_bytes(decode_data_url(data['image']), tta), 200
+
 def predict_disease(image_path):
     """
-    Predict disease from uploaded image.
+    Predict disease from an image file on disk.
     
     Args:
         image_path: Path to the uploaded image
@@ -70,89 +369,199 @@ def predict_disease(image_path):
         Dictionary containing prediction results
     """
     try:
-        # Load and preprocess image
-        image = image_processor.load_image(image_path)
+        with stage_seconds.time(stage='decode'):
+            image = image_processor.load_image(image_path)
+    except Exception as e:
+        print(f"Error loading image: {str(e)}")
+        predictions_total.inc(outcome='error')
+        return {
+            'error': f'Prediction failed: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    return predict_disease_from_array(image)
+
+def predict_disease_from_bytes(image_bytes, tta=False):
+    """
+    Predict disease from an encoded image held in memory.
+    
+    Identical uploads are served from the prediction cache; such results
+    carry ``cached: true`` and report no TTA latency.
+    
+    Args:
+        image_bytes: Raw bytes of the uploaded image
+        tta: Average the predictions over test-time augmentation variants
         
-        # Apply image enhancement
-        enhanced_image = image_processor.enhance_image(image)
+    Returns:
+        Dictionary containing prediction results
+    """
+    def compute():
+        try:
+            with stage_seconds.time(stage='decode'):
+                image = image_processor.load_image_from_bytes(image_bytes)
+        except Exception as e:
+            print(f"Error decoding image: {str(e)}")
+            predictions_total.inc(outcome='error')
+            return {
+                'error': f'Prediction failed: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            }
         
-        # Preprocess for model input
-        processed_image = image_processor.preprocess_image(enhanced_image)
+        return predict_disease_from_array(image, tta)
+    
+    result = prediction_cache.get_or_compute(
+        image_bytes, compute, cacheable=lambda r: 'error' not in r,
+        variant=f"tta:{','.join(app.config['TTA_VARIANTS'])}" if tta else ''
+    )
+    result['timestamp'] = datetime.now().isoformat()
+    if result['cached'] and 'tta' in result:
+        # No inference ran for this request
+        result['tta'] = dict(result['tta'], latency_ms=0.0, added_latency_ms=0.0)
+    
+    return result
+
+def predict_disease_from_array(image, tta=False):
+    """
+    Predict disease from a decoded RGB image.
+    
+    Args:
+        image: Decoded RGB image as numpy array
+        tta: Average the predictions over test-time augmentation variants
         
-        # Make prediction
-        if use_tflite and tflite_interpreter is not None:
-            # Use TensorFlow Lite for prediction
-            predictions, predicted_class = model_manager.predict_with_tflite(
-                tflite_interpreter, processed_image.astype(np.float32)
-            )
-        else:
-            # Use regular Keras model
-            predictions = model.predict(processed_image)
-            predicted_class_idx = np.argmax(predictions[0])
-            predicted_class = model_manager.class_names[predicted_class_idx]
-            predictions = predictions[0]
-        
-        # Get confidence scores
-        confidence_scores = {}
-        for i, class_name in enumerate(model_manager.class_names):
-            confidence_scores[class_name] = float(predictions[i])
-        
-        # Sort by confidence
-        sorted_predictions = sorted(
-            confidence_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
+    Returns:
+        Dictionary containing prediction results
+    """
+    try:
+        width, height = image_processor.target_size
         
-        # Get top 3 predictions
-        top_predictions = sorted_predictions[:3]
-        
-        # Print the predicted class for debugging
-        print("Predicted class from model:", predicted_class)
-
-        # Mapping from model class names to frontend keys
-        class_name_map = {
-            "Tomato___Bacterial_spot": "Bacterial_spot",
-            "Tomato___Early_blight": "Early_blight",
-            "Tomato___Late_blight": "Late_blight",
-            "Tomato___Leaf_Mold": "Leaf_Mold",
-            "Tomato___Septoria_leaf_spot": "Septoria_leaf_spot",
-            "Tomato___Spider_mites Two-spotted_spider_mite": "Spider_mites",
-            "Tomato___Target_Spot": "Target_Spot",
-            "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Tomato_Yellow_Leaf_Curl_Virus",
-            "Tomato___Tomato_mosaic_virus": "Tomato_mosaic_virus",
-            "Tomato___healthy": "healthy"
-        }
-        # Map the predicted class to the frontend key
-        frontend_class = class_name_map.get(predicted_class, predicted_class)
-
-        # Create result dictionary
-        result = {
-            'predicted_class': frontend_class,
-            'confidence': float(confidence_scores[predicted_class]),
-            'all_predictions': confidence_scores,
-            'top_predictions': [
-                {
-                    'class': class_name_map.get(class_name, class_name),
-                    'confidence': float(confidence),
-                    'percentage': float(confidence * 100)
-                }
-                for class_name, confidence in top_predictions
-            ],
-            'timestamp': datetime.now().isoformat()
-        }
+        # Pin the active version so a hot-swap cannot change it mid-request
+        with model_registry.checkout() as version:
+            # Resize, enhance and normalize in one pass at model resolution
+            processed_image = prepare_model_input(
+                image, np.empty((1, height, width, 3), dtype=version.input_dtype)
+            )
+            
+            if tta:
+                result = predict_with_tta(version, processed_image)
+            else:
+                # Run the backend(s) through the batching scheduler
+                predictions, stage = version.predict_cascade(processed_image)
+                with stage_seconds.time(stage='postprocess'):
+                    result = version.postprocessor.format_result(predictions)
+                if version.fast_stage is not None:
+                    result['cascade'] = cascade_info(version, stage)
         
+        predictions_total.inc(outcome='success')
         return result
         
     except Exception as e:
         import traceback
         print(f"Error during prediction: {str(e)}")
         traceback.print_exc()
+        predictions_total.inc(outcome='error')
         return {
             'error': f'Prediction failed: {str(e)}',
             'timestamp': datetime.now().isoformat()
         }
 
+def cascade_info(version, stage):
+    """
+    Describe which cascade stage answered a prediction.
+    
+    Args:
+        version: Pinned model version with a fast stage
+        stage: 'fast' (small model) or 'full' (main model)
+        
+    Returns:
+        Dictionary for the ``cascade`` field of a result
+    """
+    cascade_stage_total.inc(stage=stage)
+    return {
+        'stage': stage,
+        'model_name': version.fast_stage.model_name if stage == 'fast' else version.model_name,
+        'threshold': version.cascade_threshold
+    }
+
+def predict_with_tta(version, processed_image):
+    """
+    Score test-time augmentation variants of an image in one inference call.
+    
+    With a cascade, the fast stage scores the variants first and the main
+    model only runs when their averaged confidence is below the threshold.
+    
+    Args:
+        version: Pinned model version
+        processed_image: Preprocessed image with shape (1, height, width, channels)
+        
+    Returns:
+        Dictionary containing the averaged prediction results and TTA timing
+    """
+    variants = app.config['TTA_VARIANTS']
+    
+    start = time.perf_counter()
+    batch = image_processor.create_tta_batch(processed_image, variants)
+    predictions, stage = version.predict_averaged_cascade(batch)
+    latency_ms = (time.perf_counter() - start) * 1000.0
+    
+    with stage_seconds.time(stage='postprocess'):
+        result = version.postprocessor.format_result(predictions)
+    if version.fast_stage is not None:
+        result['cascade'] = cascade_info(version, stage)
+    
+    # Extra cost over the usual single-image inference of the stage(s) that ran:
+    # the fast stage alone, or the fast stage then the main model
+    fast_stage = version.fast_stage
+    baseline_ms = (fast_stage.single_inference_ms or 0.0) if fast_stage is not None else 0.0
+    if stage == 'full':
+        baseline_ms += version.single_inference_ms or 0.0
+    result['tta'] = {
+        'variants': list(variants),
+        'latency_ms': latency_ms,
+        'added_latency_ms': max(0.0, latency_ms - baseline_ms)
+    }
+    
+    return result
+
+def request_outcome(status_code):
+    """Classify an HTTP status code for the request counter."""
+    if status_code >= 500:
+        return 'server_error'
+    if status_code >= 400:
+        return 'client_error'
+    return 'success'
+
+def record_request(route, method, status_code, seconds):
+    """
+    Record a finished HTTP request.
+    
+    Args:
+        route: Route pattern (not the raw path, to keep label values bounded)
+        method: HTTP method
+        status_code: Response status code
+        seconds: Time taken to produce the response
+    """
+    requests_total.inc(route=route, method=method, outcome=request_outcome(status_code))
+    request_seconds.observe(seconds, route=route)
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started."""
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    """Count the request and record its latency."""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of this process."""
+    return Response(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
 @app.route('/')
 def index():
     """Main page."""
@@ -176,21 +585,26 @@ def predict():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Please upload an image.'}), 400
         
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Read the upload into memory
+        image_bytes = file.read()
         
-        # Make prediction
-        result = predict_disease(filepath)
+        # Make prediction (optionally with test-time augmentation)
+        tta = tta_requested(request.form.get('tta', request.args.get('tta', '')))
+        result = predict_disease_from_bytes(image_bytes, tta)
         
-        # Add file information to result
-        result['uploaded_file'] = filename
+        # Optionally store the upload without blocking the response
+        if app.config['SAVE_UPLOADS']:
+            filename = upload_filename(file.filename)
+            upload_writer.submit(save_upload, image_bytes, filename)
+            
+            # Add file information to result
+            result['uploaded_file'] = filename
         
         return jsonify(result)
         
+    except HTTPException:
+        # Let the error handlers answer (e.g. 413 for an oversized upload)
+        raise
     except Exception as e:
         import traceback
         print('Error during /predict:', e)
@@ -200,72 +614,268 @@ def predict():
 @app.route('/health')
 def health():
     """Health check endpoint."""
-    model_loaded = model is not None or tflite_interpreter is not None
-    return jsonify({
+    return jsonify(health_status())
+
+def health_status():
+    """Build the health check response."""
+    active = model_registry.active
+    return {
         'status': 'healthy',
-        'model_loaded': model_loaded,
+        'model_loaded': model_loaded(),
+        'model_version': active.describe() if active is not None else None,
+        'backend': active.backend.stats() if active is not None else None,
+        'prediction_cache': prediction_cache.stats(),
         'timestamp': datetime.now().isoformat()
-    })
+    }
 
 @app.route('/model-info')
 def model_info():
     """Get model information."""
-    if not metadata:
-        return jsonify({'error': 'Model not loaded'}), 500
+    info, status = model_info_payload()
+    return jsonify(info), status
+
+def model_info_payload():
+    """
+    Build the model information response.
     
-    return jsonify({
-        'model_info': metadata,
+    Returns:
+        Tuple of (response dictionary, HTTP status code)
+    """
+    active = model_registry.active
+    if active is None or not active.metadata:
+        return {'error': 'Model not loaded'}, 500
+    
+    return {
+        'model_info': active.metadata,
+        'model_version': active.describe(),
         'class_names': model_manager.class_names,
         'num_classes': model_manager.num_classes,
-        'use_tflite': use_tflite
-    })
+        'inference_backend': active.backend.name,
+        'use_tflite': active.backend.name == 'tflite'
+    }, 200
+
+def admin_authorized(token):
+    """Check an admin token against ADMIN_TOKEN (admin endpoints are off without one)."""
+    expected_token = app.config['ADMIN_TOKEN']
+    return bool(expected_token) and bool(token) and hmac.compare_digest(token, expected_token)
+
+def admin_models_payload(token):
+    """
+    Build the model version listing.
+    
+    Args:
+        token: Value of the X-Admin-Token header, if any
+        
+    Returns:
+        Tuple of (response dictionary, HTTP status code)
+    """
+    if not admin_authorized(token):
+        return {'error': 'Forbidden'}, 403
+    
+    status = model_registry.status()
+    status['versions'] = model_registry.list_versions()
+    return status, 200
+
+def admin_activate_payload(data, token):
+    """
+    Activate a model version without restarting the server.
+    
+    The version is loaded and warmed up in the background (unless ``wait``
+    is set) and swapped in atomically; requests already running finish on
+    the previous version. The choice is written to the active pointer file,
+    so other workers watching the model directory follow it.
+    
+    Args:
+        data: JSON body with ``model_name`` and optional ``wait`` flag
+        token: Value of the X-Admin-Token header, if any
+        
+    Returns:
+        Tuple of (response dictionary, HTTP status code)
+    """
+    if not admin_authorized(token):
+        return {'error': 'Forbidden'}, 403
+    
+    model_name = (data or {}).get('model_name')
+    available = {version['model_name'] for version in model_registry.list_versions()}
+    if model_name not in available:
+        return {'error': f'Unknown model: {model_name}', 'available': sorted(available)}, 400
+    
+    if data.get('wait'):
+        if not model_registry.activate(model_name, persist=True):
+            return {'error': 'Activation failed', **model_registry.status()}, 500
+        return model_registry.status(), 200
+    
+    model_registry.activate(model_name, background=True, persist=True)
+    return {'status': 'loading', 'model_name': model_name}, 202
 
 @app.route('/static/uploads/<filename>')
 def uploaded_file(filename):
     """Serve uploaded files."""
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+@app.route('/admin/models')
+def admin_models():
+    """List available model versions and the active one."""
+    info, status = admin_models_payload(request.headers.get('X-Admin-Token'))
+    return jsonify(info), status
+
+@app.route('/admin/models/activate', methods=['POST'])
+def admin_activate_model():
+    """Hot-swap the served model version."""
+    info, status = admin_activate_payload(
+        request.get_json(silent=True),
+        request.headers.get('X-Admin-Token')
+    )
+    return jsonify(info), status
+
 @app.route('/api/predict', methods=['POST'])
 def api_predict():
-    """API endpoint for predictions."""
+    """API endpoint for predictions (JSON, binary image or raw tensor body)."""
     try:
-        # Get image data from request
-        data = request.get_json()
+        result, status = predict_from_api_body(
+            request.content_type,
+            request.get_data(cache=False),
+            request.headers.get('X-Internal-Token'),
+            tta_requested(request.args.get('tta', ''))
+        )
         
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
+        return jsonify(result), status
         
-        # Decode base64 image
-        image_data = data['image'].split(',')[1]  # Remove data URL prefix
-        image_bytes = base64.b64decode(image_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({'error': f'API error: {str(e)}'}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    """
+    Batch prediction endpoint.
+    
+    Accepts many images in one multipart request (``files`` fields) and/or
+    zip archives of images, and streams one JSON line per image as soon as
+    its batch has been scored.
+    """
+    try:
+        items = collect_batch_items()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Invalid zip archive'}), 400
+    
+    if not items:
+        return jsonify({'error': 'No images uploaded'}), 400
+    
+    if not model_loaded():
+        return jsonify({'error': 'Model not loaded'}), 503
+    
+    return Response(
+        stream_with_context(stream_batch_predictions(items)),
+        mimetype='application/x-ndjson'
+    )
+
+def collect_batch_items():
+    """
+    Read all images of a batch request into memory.
+    
+    Returns:
+        List of (filename, image_bytes) tuples in upload order
+    """
+    items = []
+    max_files = app.config['BATCH_MAX_FILES']
+    
+    for file in request.files.getlist('files') + request.files.getlist('file'):
+        if file.filename == '':
+            continue
         
-        # Convert to PIL Image
-        image = Image.open(io.BytesIO(image_bytes))
+        if file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not allowed_file(info.filename):
+                        continue
+                    if info.file_size > app.config['MAX_CONTENT_LENGTH']:
+                        raise ValueError(f'File too large in archive: {info.filename}')
+                    items.append((info.filename, archive.read(info)))
+                    if len(items) > max_files:
+                        raise ValueError(f'Too many images. Maximum is {max_files} per batch.')
+        elif allowed_file(file.filename):
+            items.append((file.filename, file.read()))
         
-        # Save temporarily
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        temp_filename = f"temp_{timestamp}.jpg"
-        temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-        image.save(temp_filepath)
+        if len(items) > max_files:
+            raise ValueError(f'Too many images. Maximum is {max_files} per batch.')
+    
+    return items
+
+def stream_batch_predictions(items):
+    """
+    Preprocess images in parallel and score them in batches.
+    
+    Args:
+        items: List of (filename, image_bytes) tuples
         
-        # Make prediction
-        result = predict_disease(temp_filepath)
+    Yields:
+        One JSON document per image, newline-terminated
+    """
+    batch_size = app.config['BATCH_MAX_SIZE']
+    
+    # The whole batch is scored by one model version, even across a hot-swap
+    with model_registry.checkout() as version:
+        # Every image is preprocessed straight into its row of one shared buffer
+        width, height = image_processor.target_size
+        inputs = np.empty((len(items), height, width, 3), dtype=version.input_dtype)
+        futures = {
+            preprocess_executor.submit(preprocess_image_bytes, image_bytes, inputs[index]): (index, filename)
+            for index, (filename, image_bytes) in enumerate(items)
+        }
         
-        # Clean up temporary file
-        try:
-            os.remove(temp_filepath)
-        except:
-            pass
+        def score(pending):
+            images = inputs[[index for index, _ in pending]]
+            try:
+                predictions, stages = version.predict_batch_cascade(images)
+            except Exception as e:
+                predictions_total.inc(len(pending), outcome='error')
+                for index, filename in pending:
+                    yield json.dumps({'index': index, 'filename': filename,
+                                      'error': f'Prediction failed: {str(e)}'}) + '\n'
+                return
+            
+            with stage_seconds.time(stage='postprocess'):
+                results = version.postprocessor.format_results(predictions)
+            predictions_total.inc(len(pending), outcome='success')
+            
+            for (index, filename), result, stage in zip(pending, results, stages):
+                result.update({'index': index, 'filename': filename})
+                if version.fast_stage is not None:
+                    result['cascade'] = cascade_info(version, stage)
+                yield json.dumps(result) + '\n'
         
-        return jsonify(result)
+        # Score images in arrival order of their preprocessing
+        pending = []
+        for future in as_completed(futures):
+            index, filename = futures[future]
+            try:
+                future.result()
+                pending.append((index, filename))
+            except Exception as e:
+                predictions_total.inc(outcome='error')
+                yield json.dumps({'index': index, 'filename': filename,
+                                  'error': f'Prediction failed: {str(e)}'}) + '\n'
+                continue
+            
+            if len(pending) >= batch_size:
+                yield from score(pending)
+                pending = []
         
-    except Exception as e:
-        return jsonify({'error': f'API error: {str(e)}'}), 500
+        if pending:
+            yield from score(pending)
+
+def too_large_message(limit):
+    """Error message for a body over an upload limit given in bytes."""
+    return f'File too large. Maximum size is {limit / (1024 * 1024):g}MB.'
 
 @app.errorhandler(413)
 def too_large(e):
-    """Handle file too large error."""
-    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    """Handle file too large error, naming the limit of the requested endpoint."""
+    return jsonify({'error': too_large_message(request.max_content_length)}), 413
 
 @app.errorhandler(404)
 def not_found(e):
@@ -304,6 +914,7 @@ if __name__ == '__main__':
     print("Loading model...")
     if load_model():
         print("Model loaded successfully!")
+        print(f"Startup report: {json.dumps(startup_report())}")
     else:
         print("Warning: Could not load model. Please train the model first.")
         print("You can still run the application, but predictions will not work.")
@@ -0,0 +1,280 @@
+"""
+Asyncio (ASGI) serving mode for Tomato Disease Detection.
+
+Exposes the same routes and JSON contracts as the Flask app in app.py, but
+receives request bodies asynchronously so slow uploads do not hold a worker
+thread. Decoding and inference run on a bounded thread pool.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Match, Route
+
+# Add current directory to path to import the shared prediction code
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as core
+
+# CPU-bound work is limited to this many threads; further requests wait their turn
+INFERENCE_WORKERS = int(os.environ.get('ASGI_INFERENCE_WORKERS', os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', INFERENCE_WORKERS * 4))
+
+executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='asgi-inference')
+pending = asyncio.BoundedSemaphore(MAX_PENDING)
+
+async def run_in_executor(func, *args):
+    """
+    Run a CPU-bound function on the bounded executor.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments for the function
+
+    Returns:
+        Return value of the function
+    """
+    async with pending:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+
+def too_large():
+    """Response for bodies over the upload limit."""
+    return JSONResponse({'error': core.too_large_message(core.app.config['MAX_CONTENT_LENGTH'])}, status_code=413)
+
+class BodyTooLarge(Exception):
+    """Raised while receiving a request body that exceeds the upload limit."""
+
+def content_length_error(request: Request):
+    """
+    Check the declared body size against the upload limit.
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        Error response for a malformed or too large Content-Length, else None
+    """
+    content_length = request.headers.get('content-length')
+    if content_length is None:
+        return None
+    try:
+        declared = int(content_length)
+    except ValueError:
+        declared = -1
+    if declared < 0:
+        return JSONResponse({'error': 'Invalid Content-Length header'}, status_code=400)
+    if declared > core.app.config['MAX_CONTENT_LENGTH']:
+        return too_large()
+    return None
+
+def limit_body(request: Request) -> Request:
+    """
+    Wrap a request so reading its body raises ``BodyTooLarge`` past the upload limit.
+
+    Chunked or header-less uploads have no declared size, so the limit is
+    enforced on the bytes actually received.
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        Request reading the same body through the size check
+    """
+    limit = core.app.config['MAX_CONTENT_LENGTH']
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > limit:
+                raise BodyTooLarge()
+        return message
+
+    return Request(request.scope, receive)
+
+async def predict(request: Request):
+    """Handle image upload and prediction."""
+    try:
+        error = content_length_error(request)
+        if error is not None:
+            return error
+
+        request = limit_body(request)
+        form = await request.form()
+        file = form.get('file')
+
+        # Check if file was uploaded
+        if file is None or not hasattr(file, 'filename'):
+            return JSONResponse({'error': 'No file uploaded'}, status_code=400)
+
+        # Check if file is empty
+        if file.filename == '':
+            return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+        # Check if file is allowed
+        if not core.allowed_file(file.filename):
+            return JSONResponse({'error': 'Invalid file type. Please upload an image.'}, status_code=400)
+
+        image_bytes = await file.read()
+        tta = core.tta_requested(form.get('tta', request.query_params.get('tta', '')))
+        result = await run_in_executor(core.predict_disease_from_bytes, image_bytes, tta)
+
+        # Optionally store the upload without blocking the response
+        if core.app.config['SAVE_UPLOADS']:
+            filename = core.upload_filename(file.filename)
+            core.upload_writer.submit(core.save_upload, image_bytes, filename)
+            result['uploaded_file'] = filename
+
+        return JSONResponse(result)
+
+    except BodyTooLarge:
+        return too_large()
+    except Exception as e:
+        print('Error during /predict:', e)
+        return JSONResponse({'error': f'Server error: {str(e)}'}, status_code=500)
+
+async def api_predict(request: Request):
+    """API endpoint for predictions (JSON, binary image or raw tensor body)."""
+    try:
+        error = content_length_error(request)
+        if error is not None:
+            return error
+
+        body = await limit_body(request).body()
+        result, status = await run_in_executor(
+            core.predict_from_api_body,
+            request.headers.get('content-type'),
+            body,
+            request.headers.get('x-internal-token'),
+            core.tta_requested(request.query_params.get('tta', ''))
+        )
+
+        return JSONResponse(result, status_code=status)
+
+    except BodyTooLarge:
+        return too_large()
+    except Exception as e:
+        return JSONResponse({'error': f'API error: {str(e)}'}, status_code=500)
+
+async def health(request: Request):
+    """Health check endpoint."""
+    return JSONResponse(core.health_status())
+
+async def model_info(request: Request):
+    """Get model information."""
+    info, status = core.model_info_payload()
+    return JSONResponse(info, status_code=status)
+
+async def admin_models(request: Request):
+    """List available model versions and the active one."""
+    info, status = core.admin_models_payload(request.headers.get('x-admin-token'))
+    return JSONResponse(info, status_code=status)
+
+async def admin_activate_model(request: Request):
+    """Hot-swap the served model version."""
+    error = content_length_error(request)
+    if error is not None:
+        return error
+    try:
+        data = await limit_body(request).json()
+    except BodyTooLarge:
+        return too_large()
+    except ValueError:
+        data = None
+    info, status = await run_in_executor(
+        core.admin_activate_payload, data, request.headers.get('x-admin-token')
+    )
+    return JSONResponse(info, status_code=status)
+
+async def metrics(request: Request):
+    """Prometheus metrics of this process."""
+    return Response(core.metrics.render(), media_type=core.MetricsRegistry.CONTENT_TYPE)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting requests by route pattern and outcome."""
+
+    def __init__(self, app, routes):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            routes: Routes used to resolve the route pattern of a request
+        """
+        self.app = app
+        self.routes = routes
+
+    def route_of(self, scope) -> str:
+        """Route pattern matching a request, or 'unmatched'."""
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            core.record_request(self.route_of(scope), scope['method'], status['code'],
+                                time.perf_counter() - start)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load the model before accepting traffic."""
+    print("Loading model...")
+    loaded = await asyncio.get_running_loop().run_in_executor(executor, core.load_model)
+    if loaded:
+        print(f"Startup report: {json.dumps(core.startup_report())}")
+    else:
+        print("Warning: Could not load model. Please train the model first.")
+    yield
+    executor.shutdown(wait=False)
+
+routes = [
+    Route('/predict', predict, methods=['POST']),
+    Route('/api/predict', api_predict, methods=['POST']),
+    Route('/health', health),
+    Route('/model-info', model_info),
+    Route('/metrics', metrics),
+    Route('/admin/models', admin_models),
+    Route('/admin/models/activate', admin_activate_model, methods=['POST']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(RequestMetricsMiddleware, routes=routes)],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=5000)
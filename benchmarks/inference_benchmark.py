@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Stage-level inference benchmark for Tomato Disease Detection.
+
+Times every stage of the prediction path separately:
+
+- decode: ``ImageProcessor.load_image_from_bytes``
+- enhance: ``ImageProcessor.enhance_image``
+- preprocess: ``ImageProcessor.preprocess_image``
+- fused_preprocess: ``ImageProcessor.prepare_model_input`` (serving path)
+- inference: one backend call per batch (``predict_batch_with_tflite`` for TFLite)
+- postprocess: ``PredictionPostprocessor.format_results``
+
+Image stages are measured per image size; inference and post-processing per
+combination of batch size, thread count and backend. Every result reports
+p50/p95/p99 latency and images/sec, and a run can be compared against a saved
+baseline to flag regressions. Without images in ``--data-dir`` the benchmark
+runs on synthetic images, so it works offline.
+
+Usage:
+    python benchmarks/inference_benchmark.py --output benchmark.json
+    python benchmarks/inference_benchmark.py --baseline benchmark.json --fail-on-regression
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# Add parent directory to path to import utilities
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.image_processing import ImageProcessor
+from utils.model_utils import ModelManager, create_backend
+from utils.postprocessing import PredictionPostprocessor
+
+IMAGE_STAGES = ('decode', 'enhance', 'preprocess', 'fused_preprocess')
+MODEL_STAGES = ('inference', 'postprocess')
+
+def parse_sizes(value):
+    """Parse a comma-separated list of WIDTHxHEIGHT sizes."""
+    sizes = []
+    for item in value.split(','):
+        width, height = item.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+def parse_ints(value):
+    """Parse a comma-separated list of integers."""
+    return [int(item) for item in value.split(',')]
+
+def latency_summary(latencies_ms, images_per_call=1):
+    """
+    Summarize latencies of repeated calls.
+
+    Args:
+        latencies_ms: Latency of each call in milliseconds
+        images_per_call: Number of images processed by each call
+
+    Returns:
+        Dictionary with mean, p50, p95 and p99 latency and images/sec
+    """
+    values = np.asarray(latencies_ms)
+    mean_ms = float(values.mean())
+    return {
+        'calls': int(values.size),
+        'mean_ms': mean_ms,
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'images_per_sec': images_per_call * 1000.0 / mean_ms if mean_ms > 0 else 0.0
+    }
+
+def time_calls(func, iterations, warmup):
+    """
+    Time repeated calls of a function.
+
+    Args:
+        func: Function to call without arguments
+        iterations: Number of timed calls
+        warmup: Number of untimed calls made first
+
+    Returns:
+        List of latencies in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+def result_key(stage, size=None, batch_size=None, threads=None, backend=None):
+    """Stable identifier of one measurement, used to match runs against a baseline."""
+    parts = [stage]
+    if size is not None:
+        parts.append(f"size={size[0]}x{size[1]}")
+    if backend is not None:
+        parts.append(f"backend={backend}")
+    if batch_size is not None:
+        parts.append(f"batch={batch_size}")
+    if threads is not None:
+        parts.append(f"threads={threads}")
+    return '|'.join(parts)
+
+def load_source_images(data_dir, max_images):
+    """
+    Load up to max_images RGB images from a directory tree.
+
+    Args:
+        data_dir: Directory searched recursively for images
+        max_images: Maximum number of images to load
+
+    Returns:
+        List of RGB images (empty if the directory has none)
+    """
+    images = []
+    if not os.path.isdir(data_dir):
+        return images
+
+    for root, _, files in sorted(os.walk(data_dir)):
+        for file in sorted(files):
+            if not file.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
+            image = cv2.imread(os.path.join(root, file))
+            if image is not None:
+                images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if len(images) >= max_images:
+                return images
+    return images
+
+def synthetic_images(count, seed=0):
+    """
+    Create leaf-like synthetic RGB images (smooth noise, so JPEG sizes are realistic).
+
+    Args:
+        count: Number of images
+        seed: Random seed
+
+    Returns:
+        List of RGB images
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        noise = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        image = cv2.GaussianBlur(cv2.resize(noise, (512, 512)), (0, 0), 6)
+        image[:, :, 1] = np.maximum(image[:, :, 1], 96)  # mostly green
+        images.append(image)
+    return images
+
+def encode_images(source_images, size, quality=90):
+    """
+    Resize source images to a size and encode them as JPEG.
+
+    Args:
+        source_images: RGB images
+        size: Target (width, height)
+        quality: JPEG quality
+
+    Returns:
+        List of encoded JPEG bytes
+    """
+    encoded = []
+    for image in source_images:
+        resized = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+        ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(resized, cv2.COLOR_RGB2BGR),
+                                  [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            encoded.append(buffer.tobytes())
+    return encoded
+
+def benchmark_image_stages(image_processor, encoded_images, size, iterations, warmup):
+    """
+    Time decoding and preprocessing of images of one size.
+
+    Args:
+        image_processor: Image processor under test
+        encoded_images: JPEG bytes of the benchmark images
+        size: Image size (width, height), used in the result keys
+        iterations: Timed calls per stage
+        warmup: Untimed calls before each stage
+
+    Returns:
+        Dictionary of results keyed by result_key
+    """
+    decoded = [image_processor.load_image_from_bytes(data) for data in encoded_images]
+    enhanced = [image_processor.enhance_image(image) for image in decoded]
+
+    # Rotate through the images so one cached image does not flatter the numbers
+    next_bytes = itertools.cycle(encoded_images).__next__
+    next_decoded = itertools.cycle(decoded).__next__
+    next_enhanced = itertools.cycle(enhanced).__next__
+    width, height = image_processor.target_size
+    out = np.empty((height, width, 3), dtype=np.float32)
+
+    stage_functions = {
+        'decode': lambda: image_processor.load_image_from_bytes(next_bytes()),
+        'enhance': lambda: image_processor.enhance_image(next_decoded()),
+        'preprocess': lambda: image_processor.preprocess_image(next_enhanced()),
+        'fused_preprocess': lambda: image_processor.prepare_model_input(next_decoded(), out)
+    }
+
+    results = {}
+    for stage in IMAGE_STAGES:
+        summary = latency_summary(time_calls(stage_functions[stage], iterations, warmup))
+        summary.update({'stage': stage, 'image_size': list(size)})
+        results[result_key(stage, size=size)] = summary
+    return results
+
+def benchmark_model_stages(backend, postprocessor, inputs, batch_size, threads, iterations, warmup):
+    """
+    Time inference and post-processing for one backend configuration.
+
+    Args:
+        backend: Loaded inference backend
+        postprocessor: Post-processor for the model's classes
+        inputs: Preprocessed float32 images, repeated to fill the batch
+        batch_size: Images per inference call
+        threads: Interpreter thread count (None for TensorFlow backends)
+        iterations: Timed calls per stage
+        warmup: Untimed calls before each stage
+
+    Returns:
+        Dictionary of results keyed by result_key
+    """
+    batch = np.resize(inputs, (batch_size, *inputs.shape[1:]))
+    if backend.input_dtype == np.uint8:
+        # Full-integer models take the enhanced pixels unscaled
+        batch = np.rint(batch * 255.0).astype(np.uint8)
+    scores = backend.predict_batch(batch)
+
+    results = {}
+    stage_functions = {
+        'inference': lambda: backend.predict_batch(batch),
+        'postprocess': lambda: postprocessor.format_results(scores)
+    }
+    for stage in MODEL_STAGES:
+        summary = latency_summary(time_calls(stage_functions[stage], iterations, warmup), batch_size)
+        summary.update({'stage': stage, 'backend': backend.name,
+                        'batch_size': batch_size, 'threads': threads})
+        results[result_key(stage, batch_size=batch_size, threads=threads, backend=backend.name)] = summary
+    return results
+
+def compare_with_baseline(results, baseline, tolerance, metric='p50_ms'):
+    """
+    Compare results against a baseline run.
+
+    Args:
+        results: Results of this run, keyed by result_key
+        baseline: Baseline report (as written by this script)
+        tolerance: Allowed relative slowdown before flagging a regression (0.1 = 10%)
+        metric: Latency metric to compare
+
+    Returns:
+        Dictionary listing regressions, improvements and unmatched measurements
+    """
+    baseline_results = baseline.get('results', {})
+    comparison = {'metric': metric, 'tolerance': tolerance,
+                  'regressions': [], 'improvements': [], 'unchanged': 0,
+                  'missing_in_baseline': sorted(set(results) - set(baseline_results))}
+
+    for key in sorted(set(results) & set(baseline_results)):
+        current = results[key][metric]
+        previous = baseline_results[key][metric]
+        if previous <= 0:
+            continue
+        change = current / previous - 1.0
+        entry = {'key': key, 'baseline': previous, 'current': current, 'change': change}
+        if change > tolerance:
+            comparison['regressions'].append(entry)
+        elif change < -tolerance:
+            comparison['improvements'].append(entry)
+        else:
+            comparison['unchanged'] += 1
+
+    return comparison
+
+def run_benchmark(args):
+    """
+    Run the stage benchmark.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary containing the benchmark report
+    """
+    image_processor = ImageProcessor()
+    model_manager = ModelManager(args.model_dir)
+
+    source_images = load_source_images(args.data_dir, args.num_images)
+    source = args.data_dir
+    if not source_images:
+        print(f"No images found in {args.data_dir}, using {args.num_images} synthetic images")
+        source_images = synthetic_images(args.num_images)
+        source = 'synthetic'
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__
+        },
+        'config': {
+            'source': source,
+            'num_images': len(source_images),
+            'image_sizes': [list(size) for size in args.sizes],
+            'batch_sizes': args.batch_sizes,
+            'threads': args.threads,
+            'backends': args.backends,
+            'iterations': args.iterations,
+            'warmup': args.warmup
+        },
+        'results': {},
+        'skipped': []
+    }
+
+    # Image stages, per input size
+    model_inputs = None
+    for size in args.sizes:
+        print(f"Benchmarking image stages at {size[0]}x{size[1]}...")
+        encoded = encode_images(source_images, size)
+        report['results'].update(
+            benchmark_image_stages(image_processor, encoded, size, args.iterations, args.warmup)
+        )
+        if model_inputs is None:
+            model_inputs = np.concatenate([
+                image_processor.prepare_model_input(image_processor.load_image_from_bytes(data))
+                for data in encoded
+            ])
+
+    # Inference and post-processing, per backend, thread count and batch size
+    for backend_name in args.backends:
+        # Thread count is a TFLite interpreter option; TensorFlow backends use the TF default
+        thread_counts = args.threads if backend_name == 'tflite' else [None]
+        for threads in thread_counts:
+            options = {'pool_size': 1, 'num_threads': threads} if backend_name == 'tflite' else {}
+            try:
+                backend = create_backend(backend_name, model_manager, args.model_name, **options)
+            except Exception as e:
+                print(f"Skipping {backend_name} backend: {str(e)}")
+                report['skipped'].append({'backend': backend_name, 'threads': threads, 'reason': str(e)})
+                break
+
+            postprocessor = PredictionPostprocessor.from_metadata(backend.metadata, model_manager.class_names)
+            for batch_size in args.batch_sizes:
+                print(f"Benchmarking {backend_name} backend (threads={threads}, batch={batch_size})...")
+                report['results'].update(benchmark_model_stages(
+                    backend, postprocessor, model_inputs, batch_size, threads, args.iterations, args.warmup
+                ))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_with_baseline(report['results'], baseline, args.tolerance)
+
+    return report
+
+def print_summary(report):
+    """Print a compact table of the results."""
+    print(f"\n{'measurement':<60} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'img/s':>10}")
+    for key, result in report['results'].items():
+        print(f"{key:<60} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['images_per_sec']:>10.1f}")
+
+    comparison = report.get('comparison')
+    if comparison:
+        print(f"\nBaseline comparison ({comparison['metric']}, tolerance {comparison['tolerance']:.0%}): "
+              f"{len(comparison['regressions'])} regressions, "
+              f"{len(comparison['improvements'])} improvements, {comparison['unchanged']} unchanged")
+        for entry in comparison['regressions']:
+            print(f"  REGRESSION {entry['key']}: {entry['baseline']:.2f} ms -> "
+                  f"{entry['current']:.2f} ms ({entry['change']:+.0%})")
+
+def main():
+    """Main function to run the benchmark."""
+    parser = argparse.ArgumentParser(description="Time each stage of the prediction path")
+    parser.add_argument('--data-dir', default='data/test', help='Directory with source images (searched recursively)')
+    parser.add_argument('--num-images', type=int, default=16, help='Number of distinct source images')
+    parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes('640x480,1920x1080,4000x3000'),
+                        help='Comma-separated input image sizes (WIDTHxHEIGHT)')
+    parser.add_argument('--batch-sizes', type=parse_ints, default=parse_ints('1,8,32'),
+                        help='Comma-separated inference batch sizes')
+    parser.add_argument('--threads', type=parse_ints, default=parse_ints('1,2,4'),
+                        help='Comma-separated TFLite interpreter thread counts')
+    parser.add_argument('--backends', type=lambda value: value.split(','), default=['tflite'],
+                        help='Comma-separated inference backends (tflite, keras, savedmodel)')
+    parser.add_argument('--model-dir', default='model/saved_models', help='Directory containing the model')
+    parser.add_argument('--model-name', default='tomato_disease_model', help='Name of the model')
+    parser.add_argument('--iterations', type=int, default=50, help='Timed calls per measurement')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed calls before each measurement')
+    parser.add_argument('--baseline', help='Baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative p50 slowdown flagged as a regression (default 0.10)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 if any regression is flagged')
+    parser.add_argument('--output', help='Optional path to save the JSON report')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_summary(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.fail_on_regression and report.get('comparison', {}).get('regressions'):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
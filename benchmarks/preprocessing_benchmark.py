@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Preprocessing benchmark for Tomato Disease Detection.
+
+Compares the legacy pipeline (``enhance_image`` on the full photo followed by
+``preprocess_image``) with the fused ``ImageProcessor.prepare_model_input``
+pipeline. Reports per-image latency of both, and, when a TFLite model is
+available, shows that predictions are unchanged: top-1 agreement between the
+two pipelines, accuracy of each against the folder labels, and the mean
+absolute difference of the class probabilities.
+
+Usage:
+    python benchmarks/preprocessing_benchmark.py --data-dir data/test --samples-per-class 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Add parent directory to path to import utilities
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.image_processing import ImageProcessor
+
+# Class names used when no model metadata is available
+DEFAULT_CLASS_NAMES = [
+    'Tomato___Bacterial_spot',
+    'Tomato___Early_blight',
+    'Tomato___healthy',
+    'Tomato___Late_blight',
+    'Tomato___Leaf_Mold',
+    'Tomato___Septoria_leaf_spot',
+    'Tomato___Spider_mites Two-spotted_spider_mite',
+    'Tomato___Target_Spot',
+    'Tomato___Tomato_mosaic_virus',
+    'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
+]
+
+def collect_images(data_dir, class_names, samples_per_class):
+    """
+    Collect labelled image paths from a class-per-folder directory.
+
+    Args:
+        data_dir: Directory with one sub-folder per class
+        class_names: Class names in model output order
+        samples_per_class: Maximum number of images per class
+
+    Returns:
+        List of (image_path, class_index) tuples
+    """
+    samples = []
+    for class_index, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        files = sorted(f for f in os.listdir(class_dir)
+                       if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for file in files[:samples_per_class]:
+            samples.append((os.path.join(class_dir, file), class_index))
+    return samples
+
+def percentile_summary(latencies_ms):
+    """Summarize a list of latencies in milliseconds."""
+    values = np.asarray(latencies_ms)
+    return {
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95))
+    }
+
+def run_benchmark(args):
+    """
+    Run the preprocessing comparison.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary containing the benchmark report
+    """
+    image_processor = ImageProcessor()
+
+    # Model is optional: without it only latency is compared
+    model_manager, interpreter, class_names = None, None, None
+    try:
+        from utils.model_utils import ModelManager
+        model_manager = ModelManager(args.model_dir)
+        class_names = model_manager.class_names
+        interpreter, metadata = model_manager.load_tflite_model(args.model_name)
+        class_names = metadata.get('class_names', class_names)
+    except Exception as e:
+        print(f"Model not available, comparing latency only: {str(e)}")
+
+    if class_names is None:
+        class_names = DEFAULT_CLASS_NAMES
+
+    samples = collect_images(args.data_dir, class_names, args.samples_per_class)
+    if samples:
+        images = [(image_processor.load_image(path), label) for path, label in samples]
+    else:
+        print(f"No images found in {args.data_dir}, using {args.synthetic} synthetic images")
+        rng = np.random.default_rng(0)
+        images = [(rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8), -1)
+                  for _ in range(args.synthetic)]
+
+    legacy_inputs, fused_inputs = [], []
+    legacy_ms, fused_ms = [], []
+    for image, _ in images:
+        start = time.perf_counter()
+        legacy = image_processor.preprocess_image(image_processor.enhance_image(image))
+        legacy_ms.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        fused = image_processor.prepare_model_input(image)
+        fused_ms.append((time.perf_counter() - start) * 1000.0)
+
+        legacy_inputs.append(legacy[0])
+        fused_inputs.append(fused[0])
+
+    legacy_inputs = np.stack(legacy_inputs)
+    fused_inputs = np.stack(fused_inputs)
+
+    report = {
+        'num_images': len(images),
+        'source': args.data_dir if samples else 'synthetic',
+        'latency': {
+            'legacy': percentile_summary(legacy_ms),
+            'fused': percentile_summary(fused_ms)
+        },
+        'speedup': float(np.mean(legacy_ms) / np.mean(fused_ms)),
+        'input_mean_abs_diff': float(np.abs(legacy_inputs - fused_inputs).mean())
+    }
+
+    if interpreter is not None:
+        legacy_scores, fused_scores = [], []
+        for start in range(0, len(images), args.batch_size):
+            end = start + args.batch_size
+            legacy_scores.append(model_manager.predict_batch_with_tflite(interpreter, legacy_inputs[start:end]))
+            fused_scores.append(model_manager.predict_batch_with_tflite(interpreter, fused_inputs[start:end]))
+        legacy_scores = np.concatenate(legacy_scores)
+        fused_scores = np.concatenate(fused_scores)
+
+        legacy_top1 = np.argmax(legacy_scores, axis=1)
+        fused_top1 = np.argmax(fused_scores, axis=1)
+        labels = np.array([label for _, label in images])
+
+        report['predictions'] = {
+            'top1_agreement': float(np.mean(legacy_top1 == fused_top1)),
+            'probability_mean_abs_diff': float(np.abs(legacy_scores - fused_scores).mean())
+        }
+        if samples:
+            report['predictions']['legacy_accuracy'] = float(np.mean(legacy_top1 == labels))
+            report['predictions']['fused_accuracy'] = float(np.mean(fused_top1 == labels))
+
+    return report
+
+def main():
+    """Main function to run the benchmark."""
+    parser = argparse.ArgumentParser(description="Compare legacy and fused preprocessing pipelines")
+    parser.add_argument('--data-dir', default='data/test', help='Class-per-folder image directory')
+    parser.add_argument('--samples-per-class', type=int, default=20, help='Images per class to benchmark')
+    parser.add_argument('--model-dir', default='model/saved_models', help='Directory containing the TFLite model')
+    parser.add_argument('--model-name', default='tomato_disease_model', help='Name of the TFLite model')
+    parser.add_argument('--batch-size', type=int, default=32, help='Inference batch size')
+    parser.add_argument('--synthetic', type=int, default=50, help='Synthetic images when no data is found')
+    parser.add_argument('--width', type=int, default=4000, help='Synthetic image width')
+    parser.add_argument('--height', type=int, default=3000, help='Synthetic image height')
+    parser.add_argument('--output', help='Optional path to save the JSON report')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,6 @@ import os
 import sys
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras import layers, models
 import json
 
 # Add current directory to path
@@ -23,25 +22,8 @@ def create_demo_model():
     # Initialize model manager
     model_manager = ModelManager()
     
-    # Create a simple CNN model
-    model = models.Sequential([
-        layers.Conv2D(32, (3, 3), activation='relu', input_shape=(224, 224, 3)),
-        layers.MaxPooling2D((2, 2)),
-        layers.Conv2D(64, (3, 3), activation='relu'),
-        layers.MaxPooling2D((2, 2)),
-        layers.Conv2D(64, (3, 3), activation='relu'),
-        layers.Flatten(),
-        layers.Dense(64, activation='relu'),
-        layers.Dropout(0.5),
-        layers.Dense(len(model_manager.class_names), activation='softmax')
-    ])
-    
-    # Compile the model
-    model.compile(
-        optimizer='adam',
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
+    # Create a simple CNN model (also the fast stage of a model cascade)
+    model = model_manager.create_small_model((224, 224, 3))
     
     print("Demo model created successfully!")
     print(f"Model summary:")
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for Tomato Disease Detection.
+
+The master reads the TFLite model into memory once and then forks the
+workers, so the model's pages are shared copy-on-write instead of every
+worker loading its own copy. Each worker builds its interpreters on that
+shared buffer and warms them up with a dummy inference before it starts
+accepting requests.
+
+The XNNPACK delegate is off by default here: it repacks the weights into
+memory private to each worker, which would undo that sharing. What each
+worker still adds is its interpreters' tensor arena (activations and
+scratch buffers), reported as ``private_mb`` in its startup report.
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import os
+import json
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', os.cpu_count() or 1))
+
+# Request threads per worker; concurrent requests are micro-batched
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Load the application (and the model bytes) in the master before forking
+wsgi_app = 'app:create_app(preload_only=True)'
+preload_app = True
+
+# Workers already split the CPUs: one single-threaded interpreter each unless overridden
+os.environ.setdefault('TFLITE_POOL_SIZE', '1')
+os.environ.setdefault('TFLITE_NUM_THREADS', '1')
+
+# XNNPACK copies the weights into a packed, per-worker buffer; keep the shared ones
+os.environ.setdefault('TFLITE_USE_XNNPACK', '0')
+
+def post_worker_init(worker):
+    """Create this worker's interpreters on the preloaded model and warm them up."""
+    import app as core
+
+    if core.load_model():
+        report = core.startup_report()
+        print(f"Worker {worker.pid} startup report: {json.dumps(report)}")
+    else:
+        print(f"Warning: Worker {worker.pid} could not load the model. Please train the model first.")
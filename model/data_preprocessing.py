@@ -1,14 +1,24 @@
 import os
 import shutil
 import random
+import time
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Sequence
 import cv2
 from PIL import Image
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.model_selection import train_test_split
 
+# Add parent directory to path to import utilities
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.dataset_manifest import DatasetManifest, SPLITS
+from utils.constants import IMAGE_FORMATS
+
 class DataPreprocessor:
     """Data preprocessing utilities for tomato disease detection dataset."""
     
@@ -33,6 +43,53 @@ class DataPreprocessor:
             'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
         ]
         
+        # Manifests by (directory, splits), loaded or walked on first use and reused until rescanned
+        self._manifests = {}
+    
+    def get_manifest(self, data_dir: str = None, rescan: bool = False,
+                     splits: Optional[Sequence[str]] = SPLITS) -> DatasetManifest:
+        """
+        Get the manifest of a dataset directory.
+        
+        The manifest stored in ``<data_dir>/.manifest.npz`` is used as is; the
+        directory is only walked when there is no stored manifest or when
+        ``rescan`` is set. A rescan stats every file but reuses dimensions and
+        hashes of unchanged files from the previous manifest, so only new or
+        changed files are read, and stores the result.
+        
+        Args:
+            data_dir: Directory containing the dataset
+            rescan: Walk the directory again to pick up files added, removed or changed
+                since the manifest was built
+            splits: Split folders holding class folders, or None when the class
+                folders are directly in ``data_dir``
+            
+        Returns:
+            Dataset manifest
+        """
+        if data_dir is None:
+            data_dir = self.data_dir
+        key = (os.path.abspath(data_dir), None if splits is None else tuple(splits))
+        layout = 'classes' if splits is None else 'splits'
+        
+        manifest = self._manifests.get(key)
+        if manifest is None:
+            manifest = DatasetManifest.load(data_dir)
+            if manifest is not None and manifest.layout != layout:
+                manifest = None
+            if manifest is not None:
+                self._manifests[key] = manifest
+        if manifest is not None and not rescan:
+            return manifest
+        
+        manifest = DatasetManifest.scan(data_dir, splits, previous=manifest)
+        try:
+            manifest.save()
+        except OSError as e:
+            print(f"Could not save dataset manifest in {data_dir}: {e}")
+        self._manifests[key] = manifest
+        return manifest
+    
     def organize_dataset(self, source_dir: str, target_dir: str = None) -> str:
         """
         Organize the dataset into the required structure.
@@ -52,35 +109,35 @@ class DataPreprocessor:
             os.makedirs(os.path.join(target_dir, 'train', class_name), exist_ok=True)
             os.makedirs(os.path.join(target_dir, 'test', class_name), exist_ok=True)
         
-        # Organize files by class
+        # Organize files by class; the source is only listed (no reads, nothing written to it)
+        source = DatasetManifest.scan(source_dir, splits=None, describe=False)
         for class_name in self.class_names:
-            class_dir = os.path.join(source_dir, class_name)
-            if os.path.exists(class_dir):
-                files = [f for f in os.listdir(class_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+            if class_name in source.classes():
+                files = source.paths(class_name=class_name)
+                class_dir = os.path.join(source_dir, class_name)
                 
                 # Split into train and test
                 train_files, test_files = train_test_split(files, test_size=0.2, random_state=42)
                 
-                # Copy train files
-                for file in train_files:
-                    src = os.path.join(class_dir, file)
-                    dst = os.path.join(target_dir, 'train', class_name, file)
-                    shutil.copy2(src, dst)
-                
-                # Copy test files
-                for file in test_files:
-                    src = os.path.join(class_dir, file)
-                    dst = os.path.join(target_dir, 'test', class_name, file)
-                    shutil.copy2(src, dst)
+                # Copy files, keeping their subfolders so same-named files cannot overwrite each other
+                for split, split_files in (('train', train_files), ('test', test_files)):
+                    for src in split_files:
+                        dst = os.path.join(target_dir, split, class_name, os.path.relpath(src, class_dir))
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        shutil.copy2(src, dst)
+        
+        # Pick up the copied files
+        self.get_manifest(target_dir, rescan=True)
         
         return target_dir
     
-    def get_dataset_stats(self, data_dir: str = None) -> Dict:
+    def get_dataset_stats(self, data_dir: str = None, rescan: bool = False) -> Dict:
         """
         Get statistics about the dataset.
         
         Args:
             data_dir: Directory containing the dataset
+            rescan: Rescan the directory first instead of reading the stored manifest
             
         Returns:
             Dictionary containing dataset statistics
@@ -95,14 +152,13 @@ class DataPreprocessor:
             'class_distribution': {}
         }
         
+        manifest = self.get_manifest(data_dir, rescan)
         for split in ['train', 'test']:
-            split_dir = os.path.join(data_dir, split)
-            if os.path.exists(split_dir):
+            if manifest.has_split(split):
+                split_classes = manifest.classes(split)
                 for class_name in self.class_names:
-                    class_dir = os.path.join(split_dir, class_name)
-                    if os.path.exists(class_dir):
-                        num_images = len([f for f in os.listdir(class_dir) 
-                                        if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
+                    if class_name in split_classes:
+                        num_images = len(manifest.select(split, class_name))
                         stats[split][class_name] = num_images
                         stats['total_images'] += num_images
                         
@@ -112,18 +168,20 @@ class DataPreprocessor:
         
         return stats
     
-    def visualize_dataset_distribution(self, data_dir: str = None, save_path: str = None):
+    def visualize_dataset_distribution(self, data_dir: str = None, save_path: str = None,
+                                       rescan: bool = False):
         """
         Visualize the dataset distribution.
         
         Args:
             data_dir: Directory containing the dataset
             save_path: Path to save the visualization
+            rescan: Rescan the directory first instead of reading the stored manifest
         """
         if data_dir is None:
             data_dir = self.data_dir
         
-        stats = self.get_dataset_stats(data_dir)
+        stats = self.get_dataset_stats(data_dir, rescan)
         
         # Create subplots
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
@@ -161,53 +219,106 @@ class DataPreprocessor:
         
         plt.show()
     
-    def augment_dataset(self, data_dir: str = None, augmentation_factor: int = 2):
+    def augment_dataset(self, data_dir: str = None, augmentation_factor: int = 2,
+                        num_workers: int = None, seed: int = 42, dry_run: bool = False,
+                        rescan: bool = False) -> Dict:
         """
         Augment the dataset to balance class distribution.
         
+        The missing images of each class are spread round-robin over its
+        source files (in manifest order). Each source is decoded once by a
+        worker process, which derives all of its variants from the decoded
+        image. Every variant has its own RNG seeded from ``seed``, the class
+        and the variant index, so runs are reproducible whatever the number
+        of workers or the order they finish in.
+        
         Args:
             data_dir: Directory containing the dataset
             augmentation_factor: Factor by which to augment the dataset
+            num_workers: Worker processes (default: CPU count; 1 runs in-process)
+            seed: Base random seed
+            dry_run: Only report the planned counts, without writing images
+            rescan: Rescan the directory first instead of reading the stored manifest
+            
+        Returns:
+            Dictionary with the planned counts per class, images written,
+            unreadable sources and throughput
         """
         if data_dir is None:
             data_dir = self.data_dir
         
-        stats = self.get_dataset_stats(data_dir)
+        stats = self.get_dataset_stats(data_dir, rescan)
+        target_count = max(stats['class_distribution'].values(), default=0) * augmentation_factor
         
+        # Plan: variant i of a class is derived from source file i % len(files)
+        manifest = self.get_manifest(data_dir)
+        train_classes = manifest.classes('train')
+        report = {'classes': {}, 'planned': 0, 'written': 0, 'failed': [], 'seconds': 0.0}
+        tasks = []
         for class_name in self.class_names:
-            train_dir = os.path.join(data_dir, 'train', class_name)
-            if os.path.exists(train_dir):
-                files = [f for f in os.listdir(train_dir) 
-                        if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-                
-                # Calculate how many augmented images to create
-                target_count = max(stats['class_distribution'].values()) * augmentation_factor
-                current_count = len(files)
+            if class_name not in train_classes:
+                continue
+            files = manifest.paths('train', class_name)
+            
+            planned = max(0, target_count - len(files)) if files else 0
+            report['classes'][class_name] = {'current': len(files), 'target': target_count, 'planned': planned}
+            report['planned'] += planned
+            
+            for source_index, original_path in enumerate(files[:planned]):
+                variant_indices = list(range(source_index, planned, len(files)))
+                tasks.append((os.path.dirname(original_path), os.path.basename(original_path),
+                              class_name, variant_indices, seed))
+        
+        for class_name, counts in report['classes'].items():
+            print(f"{class_name}: {counts['current']} images, {counts['planned']} augmented images planned")
+        print(f"Total: {report['planned']} augmented images from {len(tasks)} source images")
+        
+        if dry_run or not tasks:
+            return report
+        
+        num_workers = num_workers or os.cpu_count() or 1
+        start = time.time()
+        last_report = start
+        
+        if num_workers == 1:
+            results = map(_augment_source, tasks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_init_augment_worker)
+            results = executor.map(_augment_source, tasks, chunksize=max(1, len(tasks) // (num_workers * 16)))
+        
+        try:
+            for written, failed_path in results:
+                report['written'] += written
+                if failed_path:
+                    report['failed'].append(failed_path)
                 
-                if current_count < target_count:
-                    # Create augmented versions
-                    for i in range(target_count - current_count):
-                        # Randomly select a file to augment
-                        original_file = random.choice(files)
-                        original_path = os.path.join(train_dir, original_file)
-                        
-                        # Create augmented version
-                        augmented_image = self._augment_single_image(original_path)
-                        
-                        # Save augmented image
-                        base_name = os.path.splitext(original_file)[0]
-                        ext = os.path.splitext(original_file)[1]
-                        new_name = f"{base_name}_aug_{i}{ext}"
-                        new_path = os.path.join(train_dir, new_name)
-                        
-                        cv2.imwrite(new_path, augmented_image)
+                now = time.time()
+                if now - last_report >= 5:
+                    last_report = now
+                    print(f"Augmented {report['written']}/{report['planned']} images "
+                          f"({report['written'] / (now - start):.1f} images/s)")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        # Pick up the written images
+        self.get_manifest(data_dir, rescan=True)
+        
+        report['seconds'] = time.time() - start
+        report['images_per_second'] = report['written'] / report['seconds'] if report['seconds'] else 0.0
+        print(f"Augmented {report['written']} images in {report['seconds']:.1f}s "
+              f"({report['images_per_second']:.1f} images/s, {len(report['failed'])} unreadable sources)")
+        
+        return report
     
-    def _augment_single_image(self, image_path: str) -> np.ndarray:
+    def _augment_single_image(self, image_path: str, rng: random.Random = None) -> np.ndarray:
         """
         Augment a single image with various transformations.
         
         Args:
             image_path: Path to the image file
+            rng: Random number generator (defaults to the ``random`` module)
             
         Returns:
             Augmented image as numpy array
@@ -215,92 +326,156 @@ class DataPreprocessor:
         # Load image
         image = cv2.imread(image_path)
         
-        # Apply random transformations
-        if random.random() > 0.5:
+        return self._augment_image(image, rng or random)
+    
+    @staticmethod
+    def _augment_image(image: np.ndarray, rng) -> np.ndarray:
+        """
+        Apply random transformations to a decoded image.
+        
+        Args:
+            image: BGR image as numpy array
+            rng: Random number generator (``random.Random`` or the ``random`` module)
+            
+        Returns:
+            Augmented image as numpy array
+        """
+        if rng.random() > 0.5:
             # Random rotation
-            angle = random.uniform(-30, 30)
+            angle = rng.uniform(-30, 30)
             height, width = image.shape[:2]
             center = (width // 2, height // 2)
             rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
             image = cv2.warpAffine(image, rotation_matrix, (width, height))
         
-        if random.random() > 0.5:
+        if rng.random() > 0.5:
             # Random brightness adjustment
-            brightness = random.uniform(0.7, 1.3)
+            brightness = rng.uniform(0.7, 1.3)
             image = cv2.convertScaleAbs(image, alpha=brightness, beta=0)
         
-        if random.random() > 0.5:
+        if rng.random() > 0.5:
             # Random contrast adjustment
-            contrast = random.uniform(0.8, 1.2)
+            contrast = rng.uniform(0.8, 1.2)
             image = cv2.convertScaleAbs(image, alpha=contrast, beta=0)
         
-        if random.random() > 0.5:
+        if rng.random() > 0.5:
             # Random horizontal flip
             image = cv2.flip(image, 1)
         
-        if random.random() > 0.5:
+        if rng.random() > 0.5:
             # Random crop and resize
             height, width = image.shape[:2]
             crop_size = min(height, width) // 2
-            x = random.randint(0, width - crop_size)
-            y = random.randint(0, height - crop_size)
+            x = rng.randint(0, width - crop_size)
+            y = rng.randint(0, height - crop_size)
             image = image[y:y+crop_size, x:x+crop_size]
             image = cv2.resize(image, (width, height))
         
         return image
     
-    def validate_dataset(self, data_dir: str = None) -> Dict:
+    def validate_dataset(self, data_dir: str = None, full_decode: bool = False,
+                         num_workers: int = None, manifest_path: str = None,
+                         rescan: bool = False) -> Dict:
         """
         Validate the dataset for common issues.
         
+        Folders and images are read from the dataset manifest (see
+        ``get_manifest``). By default images get a header-level check (the file opens as a JPEG
+        or PNG with valid dimensions, and a JPEG ends with its end-of-image
+        marker); ``full_decode`` decodes every pixel with OpenCV instead.
+        Checks run on a thread pool and their results are kept in a manifest
+        keyed by path, size and modification time, so later runs only check
+        new or changed files (a full-decode result also satisfies a header check).
+        
         Args:
             data_dir: Directory containing the dataset
+            full_decode: Fully decode every image instead of checking headers
+            num_workers: Checker threads (default: CPU count)
+            manifest_path: Validation manifest (default: <data_dir>/.validation_manifest.json)
+            rescan: Rescan the directory first instead of reading the stored manifest
             
         Returns:
             Dictionary containing validation results
         """
         if data_dir is None:
             data_dir = self.data_dir
+        if manifest_path is None:
+            manifest_path = os.path.join(data_dir, '.validation_manifest.json')
         
         validation_results = {
             'valid': True,
             'issues': [],
             'class_counts': {},
-            'corrupted_files': []
+            'corrupted_files': [],
+            'checked': 0,
+            'cached': 0
         }
         
+        dataset_manifest = self.get_manifest(data_dir, rescan)
+        rows = []
         for split in ['train', 'test']:
-            split_dir = os.path.join(data_dir, split)
-            if not os.path.exists(split_dir):
+            if not dataset_manifest.has_split(split):
                 validation_results['issues'].append(f"Missing {split} directory")
                 validation_results['valid'] = False
                 continue
             
+            split_classes = dataset_manifest.classes(split)
             for class_name in self.class_names:
-                class_dir = os.path.join(split_dir, class_name)
-                if not os.path.exists(class_dir):
+                if class_name not in split_classes:
                     validation_results['issues'].append(f"Missing {class_name} directory in {split}")
                     validation_results['valid'] = False
                     continue
                 
-                files = [f for f in os.listdir(class_dir) 
-                        if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+                class_rows = dataset_manifest.select(split, class_name)
                 
-                if len(files) == 0:
+                if len(class_rows) == 0:
                     validation_results['issues'].append(f"No images found in {class_name}/{split}")
                     validation_results['valid'] = False
                 
-                validation_results['class_counts'][f"{class_name}_{split}"] = len(files)
-                
-                # Check for corrupted files
-                for file in files:
-                    file_path = os.path.join(class_dir, file)
-                    try:
-                        img = cv2.imread(file_path)
-                        if img is None:
-                            validation_results['corrupted_files'].append(file_path)
-                    except Exception as e:
-                        validation_results['corrupted_files'].append(file_path)
+                validation_results['class_counts'][f"{class_name}_{split}"] = len(class_rows)
+                rows.extend(class_rows)
+        
+        all_files = dataset_manifest['path'][rows].tolist()
+        sizes = dataset_manifest['bytes'][rows].tolist()
+        mtimes = dataset_manifest['mtime_ns'][rows].tolist()
+        
+        # Check for corrupted files, reusing results for unchanged files
+        manifest = _load_validation_manifest(manifest_path)
+        level = 'full' if full_decode else 'header'
+        results = {}
+        to_check = []
+        for file_path, size, mtime_ns in zip(all_files, sizes, mtimes):
+            entry = manifest.get(file_path)
+            if (entry is not None and entry['size'] == size and entry['mtime_ns'] == mtime_ns
+                    and (entry['level'] == 'full' or level == 'header')):
+                results[file_path] = entry
+            else:
+                to_check.append((file_path, size, mtime_ns))
+        validation_results['cached'] = len(results)
+        
+        def check(item):
+            file_path, size, mtime_ns = item
+            return file_path, {'size': size, 'mtime_ns': mtime_ns, 'level': level,
+                               'ok': _check_image(file_path, full_decode)}
+        
+        if to_check:
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count() or 1) as executor:
+                for done, (file_path, entry) in enumerate(executor.map(check, to_check), 1):
+                    results[file_path] = entry
+                    if done % 5000 == 0:
+                        print(f"Validated {done}/{len(to_check)} new or changed images")
+            print(f"Validated {len(to_check)} images ({level} check) in {time.time() - start:.1f}s, "
+                  f"{validation_results['cached']} unchanged")
+        validation_results['checked'] = len(to_check)
+        
+        validation_results['corrupted_files'] = [
+            file_path for file_path in all_files if not results[file_path]['ok']
+        ]
+        
+        # Files that are gone drop out of the manifest
+        if os.path.isdir(data_dir):
+            _write_validation_manifest(manifest_path, results)
         
         return validation_results
     
@@ -319,4 +494,84 @@ class DataPreprocessor:
         # Create sample images (this is just for demonstration)
         # In a real scenario, you would copy actual images from your dataset
         print(f"Sample dataset structure created at: {output_dir}")
-        print("Please add your actual tomato disease images to the appropriate directories.") 
\ No newline at end of file
+        print("Please add your actual tomato disease images to the appropriate directories.") 
+
+def _init_augment_worker():
+    # One OpenCV thread per worker process; parallelism comes from the pool
+    cv2.setNumThreads(1)
+
+def _augment_source(task: Tuple) -> Tuple[int, str]:
+    """
+    Decode one source image and write its augmented variants (process pool worker).
+    
+    Args:
+        task: Tuple of (class directory, source file, class name, variant indices, seed)
+        
+    Returns:
+        Tuple of (images written, source path if it could not be read else None)
+    """
+    train_dir, original_file, class_name, variant_indices, seed = task
+    original_path = os.path.join(train_dir, original_file)
+    image = cv2.imread(original_path)
+    if image is None:
+        return 0, original_path
+    
+    base_name, ext = os.path.splitext(original_file)
+    written = 0
+    for i in variant_indices:
+        rng = random.Random(f"{seed}:{class_name}:{i}")
+        augmented_image = DataPreprocessor._augment_image(image, rng)
+        if cv2.imwrite(os.path.join(train_dir, f"{base_name}_aug_{i}{ext}"), augmented_image):
+            written += 1
+    return written, None
+
+def _check_image(file_path: str, full_decode: bool = False) -> bool:
+    """
+    Check that an image file is readable.
+    
+    The header check accepts every format the dataset manifest lists
+    (JPEG, PNG and BMP, see ``utils.constants``).
+    
+    Args:
+        file_path: Path to the image file
+        full_decode: Decode all pixels with OpenCV instead of checking the header
+        
+    Returns:
+        True if the image passed the check
+    """
+    if full_decode:
+        try:
+            return cv2.imread(file_path) is not None
+        except Exception:
+            return False
+    
+    try:
+        with Image.open(file_path) as img:
+            if img.format not in IMAGE_FORMATS or img.width <= 0 or img.height <= 0:
+                return False
+            img.verify()
+            if img.format == 'JPEG':
+                # Truncated uploads lose the end-of-image marker (some files carry trailing bytes)
+                with open(file_path, 'rb') as f:
+                    f.seek(max(0, os.path.getsize(file_path) - 1024))
+                    return b'\xff\xd9' in f.read()
+        return True
+    except Exception:
+        return False
+
+def _load_validation_manifest(manifest_path: str) -> Dict:
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        return manifest['files'] if manifest.get('version') == 1 else {}
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+def _write_validation_manifest(manifest_path: str, files: Dict) -> None:
+    """Atomically replace the validation manifest."""
+    try:
+        with open(f"{manifest_path}.tmp", 'w') as f:
+            json.dump({'version': 1, 'files': files}, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+    except OSError as e:
+        print(f"Could not write validation manifest {manifest_path}: {e}")
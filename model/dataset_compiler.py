@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Add parent directory to path to import utilities
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_pipeline import list_image_files, create_array_dataset
+
+class DatasetCompiler:
+    """Compiles the image folders into memory-mapped uint8 arrays, decoded once."""
+    
+    def __init__(self, data_dir: str = "data", output_dir: str = None,
+                 target_size: Tuple[int, int] = (224, 224), num_workers: Optional[int] = None,
+                 manifest=None):
+        """
+        Initialize the dataset compiler.
+        
+        Args:
+            data_dir: Directory containing the dataset (train/val/test class folders)
+            output_dir: Directory for the compiled arrays (default: <data_dir>/compiled)
+            target_size: Stored image size as (height, width)
+            num_workers: Decode threads (default: CPU count)
+            manifest: Optional ``DatasetManifest`` of ``data_dir`` to read file
+                listings, sizes and mtimes from instead of walking the folders
+        """
+        self.data_dir = data_dir
+        self.output_dir = output_dir or os.path.join(data_dir, 'compiled')
+        self.target_size = tuple(target_size)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.manifest = manifest
+    
+    def split_dir(self, split: str) -> str:
+        """Directory holding one compiled split."""
+        height, width = self.target_size
+        return os.path.join(self.output_dir, f"{split}_{height}x{width}")
+    
+    def compile(self, splits: Sequence[str] = ('train', 'val', 'test')) -> Dict:
+        """
+        Compile (or incrementally update) the given splits.
+        
+        Splits without a source folder are skipped.
+        
+        Args:
+            splits: Split folders to compile
+        
+        Returns:
+            Dictionary with the compile report of each split
+        """
+        report = {}
+        for split in splits:
+            if self.manifest is not None:
+                exists = self.manifest.has_split(split)
+            else:
+                exists = os.path.isdir(os.path.join(self.data_dir, split))
+            if exists:
+                report[split] = self.compile_split(split)
+        return report
+    
+    def compile_split(self, split: str) -> Dict:
+        """
+        Compile one split, decoding only images that are new or changed.
+        
+        Images are listed in ``flow_from_directory`` order (so class indices
+        match the other pipelines), decoded with OpenCV, resized with
+        INTER_AREA to the target size and written as rows of an ``images.npy``
+        array. ``index.json`` records the label, source path, size and mtime
+        of each row. Rows of unchanged files are copied from the previous
+        build; unreadable files are left out of the rows, reported, and
+        recorded with their size and mtime so they are not decoded again
+        until they change.
+        
+        Args:
+            split: Split folder to compile (e.g. "train")
+        
+        Returns:
+            Dictionary with image counts (reused, decoded, failed) and timing
+        """
+        start = time.time()
+        source_dir = os.path.join(self.data_dir, split)
+        output_dir = self.split_dir(split)
+        os.makedirs(output_dir, exist_ok=True)
+        
+        if self.manifest is not None:
+            paths, labels, class_indices = self.manifest.image_files(split)
+            rows = self.manifest.select(split)
+            known = dict(zip(self.manifest['path'][rows].tolist(),
+                             zip(self.manifest['bytes'][rows].tolist(), self.manifest['mtime_ns'][rows].tolist())))
+            stats = [known[path] for path in paths]
+        else:
+            paths, labels, class_indices = list_image_files(source_dir)
+            stats = [_file_stat(path) for path in paths]
+        
+        previous = self._load_index(split)
+        old_images = None
+        if previous is not None and previous['class_indices'] == class_indices:
+            old_images = self._open_images(split, previous)
+            if old_images is None:
+                print(f"{split}: compiled images missing or inconsistent with the index, recompiling")
+        previous_rows = {}
+        previous_failed = {}
+        if old_images is not None:
+            previous_rows = {
+                entry['path']: (entry['row'], (entry['size'], entry['mtime_ns']))
+                for entry in previous['entries']
+            }
+            previous_failed = {
+                entry['path']: (entry['size'], entry['mtime_ns'])
+                for entry in previous.get('failed', [])
+            }
+        
+        # Nothing added, removed or modified (unreadable files included): keep the existing build
+        known = {path: stat for path, (_, stat) in previous_rows.items()}
+        known.update(previous_failed)
+        if old_images is not None and len(known) == len(paths) and all(
+            known.get(path) == stat for path, stat in zip(paths, stats)
+        ):
+            print(f"{split}: compiled dataset up to date ({len(previous_rows)} images, "
+                  f"{len(previous_failed)} unreadable)")
+            return {'images': len(previous_rows), 'reused': len(previous_rows), 'decoded': 0,
+                    'failed': list(previous_failed), 'seconds': time.time() - start, 'up_to_date': True}
+        
+        height, width = self.target_size
+        images_path = os.path.join(output_dir, 'images.npy')
+        temp_path = f"{images_path}.tmp"
+        images = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8,
+                                           shape=(max(1, len(paths)), height, width, 3))
+        
+        # Copy rows of unchanged files, skip unchanged unreadable ones, decode the rest in parallel
+        to_decode = []
+        reused = 0
+        failed = []
+        for row, (path, stat) in enumerate(zip(paths, stats)):
+            old_row, old_stat = previous_rows.get(path, (None, None))
+            if old_row is not None and old_stat == stat:
+                images[row] = old_images[old_row]
+                reused += 1
+            elif previous_failed.get(path) == stat:
+                failed.append(path)
+            else:
+                to_decode.append(row)
+        decoded = 0
+        
+        def decode(row):
+            return row, self._decode_into(paths[row], images[row])
+        
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for done, (row, ok) in enumerate(executor.map(decode, to_decode), 1):
+                if ok:
+                    decoded += 1
+                else:
+                    failed.append(paths[row])
+                if done % 1000 == 0:
+                    print(f"{split}: decoded {done}/{len(to_decode)} images")
+        
+        images.flush()
+        del images, old_images
+        # Drop the old index first and write the new one last: an interrupted
+        # build leaves no index, so the next compile starts from scratch
+        index_path = os.path.join(output_dir, 'index.json')
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.replace(temp_path, images_path)
+        
+        failed_paths = set(failed)
+        entries = [
+            {'row': row, 'path': path, 'label': int(label), 'size': stat[0], 'mtime_ns': stat[1]}
+            for row, (path, label, stat) in enumerate(zip(paths, labels, stats))
+            if path not in failed_paths
+        ]
+        self._write_index(split, {
+            'source_dir': source_dir,
+            'target_size': list(self.target_size),
+            'class_indices': class_indices,
+            'entries': entries,
+            'failed': [
+                {'path': path, 'size': stat[0], 'mtime_ns': stat[1]}
+                for path, stat in zip(paths, stats) if path in failed_paths
+            ]
+        })
+        
+        elapsed = time.time() - start
+        print(f"{split}: compiled {len(entries)} images ({reused} reused, {decoded} decoded, "
+              f"{len(failed)} failed) in {elapsed:.1f}s")
+        return {'images': len(entries), 'reused': reused, 'decoded': decoded,
+                'failed': failed, 'seconds': elapsed, 'up_to_date': False}
+    
+    def load(self, split: str) -> Tuple[np.ndarray, Dict]:
+        """
+        Open a compiled split.
+        
+        Args:
+            split: Compiled split name
+        
+        Returns:
+            Tuple of (memory-mapped images array, index dictionary)
+        """
+        index = self._load_index(split)
+        images = self._open_images(split, index) if index is not None else None
+        if images is None:
+            raise FileNotFoundError(f"Compiled dataset not found: {self.split_dir(split)} (run compile first)")
+        return images, index
+    
+    def create_dataset(self, split: str, batch_size: int = 32, shuffle: bool = False,
+                       augment: bool = False, fraction: Optional[Tuple[float, float]] = None,
+                       seed: Optional[int] = None):
+        """
+        Create a ``tf.data`` pipeline reading a compiled split.
+        
+        Args:
+            split: Compiled split name
+            batch_size: Batch size
+            shuffle: Reshuffle every epoch (training)
+            augment: Apply random augmentation (training)
+            fraction: Optional (start, stop) fraction of each class to use,
+                as used for ``validation_split`` subsets
+            seed: Optional random seed
+        
+        Returns:
+            Dataset of (images, one-hot labels) batches with DirectoryIterator-style attributes
+        """
+        images, index = self.load(split)
+        entries = index['entries']
+        if fraction:
+            entries = _class_fraction(entries, fraction)
+        
+        return create_array_dataset(
+            images,
+            np.array([entry['label'] for entry in entries], dtype=np.int32),
+            index['class_indices'],
+            [entry['path'] for entry in entries],
+            rows=np.array([entry['row'] for entry in entries], dtype=np.int64),
+            batch_size=batch_size,
+            shuffle=shuffle,
+            augment=augment,
+            seed=seed
+        )
+    
+    def create_training_datasets(self, batch_size: int = 32, validation_split: float = 0.2):
+        """
+        Create training and validation pipelines from the compiled splits.
+        
+        Uses the compiled 'val' split if there is one, otherwise the first
+        ``validation_split`` of each class of 'train', like ``create_data_generators``.
+        
+        Args:
+            batch_size: Batch size
+            validation_split: Validation fraction when there is no 'val' split
+        
+        Returns:
+            Tuple of (train_dataset, validation_dataset)
+        """
+        if self._load_index('val') is not None:
+            return (self.create_dataset('train', batch_size, shuffle=True, augment=True),
+                    self.create_dataset('val', batch_size))
+        return (self.create_dataset('train', batch_size, shuffle=True, augment=True,
+                                    fraction=(validation_split, 1.0)),
+                self.create_dataset('train', batch_size, fraction=(0.0, validation_split)))
+    
+    def _decode_into(self, path: str, out: np.ndarray) -> bool:
+        """Decode, convert to RGB and resize an image into a row of the array."""
+        image = cv2.imread(path)
+        if image is None:
+            return False
+        height, width = self.target_size
+        interpolation = cv2.INTER_AREA if image.shape[0] > height or image.shape[1] > width else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (width, height), interpolation=interpolation)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=out)
+        return True
+    
+    def _load_index(self, split: str) -> Optional[Dict]:
+        index_path = os.path.join(self.split_dir(split), 'index.json')
+        try:
+            with open(index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _open_images(self, split: str, index: Dict) -> Optional[np.ndarray]:
+        """Memory-map the images of a split, or None if missing, truncated or not matching the index."""
+        try:
+            images = np.load(os.path.join(self.split_dir(split), 'images.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        height, width = self.target_size
+        rows = [entry['row'] for entry in index['entries']]
+        if (images.dtype != np.uint8 or images.shape[1:] != (height, width, 3)
+                or list(index['target_size']) != [height, width] or (rows and max(rows) >= len(images))):
+            return None
+        return images
+    
+    def _write_index(self, split: str, index: Dict) -> None:
+        """Atomically replace the index of a split."""
+        index_path = os.path.join(self.split_dir(split), 'index.json')
+        with open(f"{index_path}.tmp", 'w') as f:
+            json.dump(index, f)
+        os.replace(f"{index_path}.tmp", index_path)
+
+def _file_stat(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _class_fraction(entries: List[Dict], fraction: Tuple[float, float]) -> List[Dict]:
+    """Keep the (start, stop) fraction of each class's entries, in order."""
+    by_class = {}
+    for entry in entries:
+        by_class.setdefault(entry['label'], []).append(entry)
+    selected = []
+    for label in sorted(by_class):
+        class_entries = by_class[label]
+        selected.extend(class_entries[int(fraction[0] * len(class_entries)):int(fraction[1] * len(class_entries))])
+    return selected
+
+def main():
+    """Compile the dataset in data/ (incrementally)."""
+    compiler = DatasetCompiler("data")
+    report = compiler.compile()
+    for split, result in report.items():
+        print(f"{split}: {result['images']} images, {len(result['failed'])} unreadable")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import io
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path to import utilities
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.constants import IMAGE_EXTENSIONS
+
+# Split folders scanned under a dataset directory
+SPLITS = ('train', 'val', 'test')
+
+# Manifest file stored at the root of the scanned directory
+MANIFEST_FILENAME = '.manifest.npz'
+
+MANIFEST_VERSION = 1
+
+class DatasetManifest:
+    """Single-scan listing of a dataset: one row per image, stored column by column."""
+
+    COLUMNS = ('path', 'class_name', 'split', 'bytes', 'mtime_ns', 'height', 'width', 'hash')
+
+    def __init__(self, root: str, columns: Dict[str, np.ndarray], splits: Sequence[str],
+                 class_dirs: Sequence[Tuple[str, str]], layout: str = 'splits'):
+        """
+        Initialize the manifest.
+
+        Args:
+            root: Scanned directory
+            columns: Array of each column in ``COLUMNS``, one row per image
+            splits: Split folders found ('' when the root holds the class folders)
+            class_dirs: (split, class name) of every class folder, including empty ones
+            layout: 'splits' (root/split/class) or 'classes' (root/class)
+        """
+        self.root = root
+        self.columns = columns
+        self.splits = list(splits)
+        self.class_dirs = [tuple(class_dir) for class_dir in class_dirs]
+        self.layout = layout
+
+    def __len__(self) -> int:
+        return len(self.columns['path'])
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    @classmethod
+    def scan(cls, root: str, splits: Optional[Sequence[str]] = SPLITS,
+             previous: Optional['DatasetManifest'] = None, num_workers: Optional[int] = None,
+             describe: bool = True) -> 'DatasetManifest':
+        """
+        Walk a dataset directory once and describe every image.
+
+        Images are listed in ``flow_from_directory`` order (sorted class
+        folders, sorted walk within each class). Pixel dimensions come from
+        the image header and the hash is the SHA-1 of the file contents; both
+        are reused from ``previous`` for files whose size and modification
+        time are unchanged, so a rescan only reads new or changed files.
+        With ``describe`` off no file is read at all: the manifest is a plain
+        listing with sizes and modification times (dimensions 0, no hash).
+
+        Args:
+            root: Dataset directory
+            splits: Split folders holding class folders, or None when ``root``
+                holds the class folders directly
+            previous: Earlier manifest of the same directory
+            num_workers: Threads reading new or changed files (default: CPU count)
+            describe: Read pixel dimensions and content hashes
+
+        Returns:
+            The manifest
+        """
+        start = time.time()
+        if splits is None:
+            split_dirs = [('', root)]
+        else:
+            split_dirs = [(split, os.path.join(root, split)) for split in splits
+                          if os.path.isdir(os.path.join(root, split))]
+
+        class_dirs = []
+        rows = []
+        for split, split_dir in split_dirs:
+            class_names = sorted(d for d in os.listdir(split_dir) if os.path.isdir(os.path.join(split_dir, d)))
+            for class_name in class_names:
+                class_dirs.append((split, class_name))
+                for dirpath, _, files in sorted(os.walk(os.path.join(split_dir, class_name)), key=lambda x: x[0]):
+                    for fname in sorted(files):
+                        if fname.lower().endswith(IMAGE_EXTENSIONS):
+                            path = os.path.join(dirpath, fname)
+                            stat = os.stat(path)
+                            rows.append([path, class_name, split, stat.st_size, stat.st_mtime_ns, 0, 0, ''])
+
+        # Reuse dimensions and hashes of unchanged files, read the others in parallel
+        known = previous._described_rows() if previous is not None else {}
+        to_read = []
+        for row in rows if describe else ():
+            described = known.get((row[0], row[3], row[4]))
+            if described is not None:
+                row[5:] = described
+            else:
+                to_read.append(row)
+
+        with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count() or 1) as executor:
+            for row, described in zip(to_read, executor.map(_describe_file, (row[0] for row in to_read))):
+                row[5:] = described
+
+        columns = {
+            'path': np.array([row[0] for row in rows], dtype=str),
+            'class_name': np.array([row[1] for row in rows], dtype=str),
+            'split': np.array([row[2] for row in rows], dtype=str),
+            'bytes': np.array([row[3] for row in rows], dtype=np.int64),
+            'mtime_ns': np.array([row[4] for row in rows], dtype=np.int64),
+            'height': np.array([row[5] for row in rows], dtype=np.int32),
+            'width': np.array([row[6] for row in rows], dtype=np.int32),
+            'hash': np.array([row[7] for row in rows], dtype=str)
+        }
+        print(f"Scanned {len(rows)} images in {root} ({len(to_read)} new or changed) "
+              f"in {time.time() - start:.1f}s")
+        return cls(root, columns, [split for split, _ in split_dirs], class_dirs,
+                   'classes' if splits is None else 'splits')
+
+    @classmethod
+    def load(cls, root: str, path: Optional[str] = None) -> Optional['DatasetManifest']:
+        """
+        Load a stored manifest.
+
+        Args:
+            root: Scanned directory
+            path: Manifest file (default: <root>/.manifest.npz)
+
+        Returns:
+            The manifest, or None if there is no readable manifest
+        """
+        path = path or os.path.join(root, MANIFEST_FILENAME)
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != MANIFEST_VERSION:
+                    return None
+                columns = {column: data[column] for column in cls.COLUMNS}
+                return cls(root, columns, data['splits'].tolist(),
+                           zip(data['class_dir_split'].tolist(), data['class_dir_name'].tolist()),
+                           str(data['layout']))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: Optional[str] = None) -> str:
+        """
+        Atomically write the manifest as a columnar ``.npz`` file.
+
+        Args:
+            path: Manifest file (default: <root>/.manifest.npz)
+
+        Returns:
+            Path of the written file
+        """
+        path = path or os.path.join(self.root, MANIFEST_FILENAME)
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(MANIFEST_VERSION),
+                layout=np.array(self.layout),
+                splits=np.array(self.splits, dtype=str),
+                class_dir_split=np.array([split for split, _ in self.class_dirs], dtype=str),
+                class_dir_name=np.array([name for _, name in self.class_dirs], dtype=str),
+                **self.columns
+            )
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def has_split(self, split: str) -> bool:
+        """Whether the split folder exists."""
+        return split in self.splits
+
+    def classes(self, split: str = '') -> List[str]:
+        """Sorted class folders of a split (including empty ones)."""
+        return [name for class_split, name in self.class_dirs if class_split == split]
+
+    def select(self, split: Optional[str] = None, class_name: Optional[str] = None) -> np.ndarray:
+        """
+        Rows of the images of a split and/or class, in manifest order.
+
+        Args:
+            split: Split to keep (all splits if None)
+            class_name: Class to keep (all classes if None)
+
+        Returns:
+            Array of row indices
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if split is not None:
+            mask &= self.columns['split'] == split
+        if class_name is not None:
+            mask &= self.columns['class_name'] == class_name
+        return np.flatnonzero(mask)
+
+    def paths(self, split: Optional[str] = None, class_name: Optional[str] = None) -> List[str]:
+        """Image paths of a split and/or class, in manifest order."""
+        return self.columns['path'][self.select(split, class_name)].tolist()
+
+    def image_files(self, split: str, fraction: Optional[Tuple[float, float]] = None
+                    ) -> Tuple[List[str], np.ndarray, Dict[str, int]]:
+        """
+        Images of a split in the form returned by ``list_image_files``.
+
+        Args:
+            split: Split folder
+            fraction: Optional (start, stop) fraction of each class's files to keep
+
+        Returns:
+            Tuple of (file paths, class indices, class name to index mapping)
+        """
+        class_indices = {class_name: index for index, class_name in enumerate(self.classes(split))}
+        paths, labels = [], []
+        for class_name, index in class_indices.items():
+            class_paths = self.paths(split, class_name)
+            if fraction:
+                class_paths = class_paths[int(fraction[0] * len(class_paths)):int(fraction[1] * len(class_paths))]
+            paths.extend(class_paths)
+            labels.extend([index] * len(class_paths))
+        return paths, np.array(labels, dtype=np.int32), class_indices
+
+    def _described_rows(self) -> Dict[Tuple[str, int, int], List]:
+        """(height, width, hash) of every row, keyed by (path, size, mtime)."""
+        return {
+            (path, int(size), int(mtime_ns)): [int(height), int(width), str(digest)]
+            for path, size, mtime_ns, height, width, digest in zip(
+                self.columns['path'], self.columns['bytes'], self.columns['mtime_ns'],
+                self.columns['height'], self.columns['width'], self.columns['hash']
+            )
+        }
+
+def _describe_file(path: str) -> List:
+    """Read a file once: pixel dimensions from its header (0 if unreadable) and content hash."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return [0, 0, '']
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+    except Exception:
+        width, height = 0, 0
+    return [height, width, hashlib.sha1(data).hexdigest()]
+
+def main():
+    """Scan data/ (incrementally) and store its manifest."""
+    data_dir = "data"
+    manifest = DatasetManifest.scan(data_dir, previous=DatasetManifest.load(data_dir))
+    print(f"Manifest saved to: {manifest.save()}")
+    for split in manifest.splits:
+        print(f"{split}: {len(manifest.select(split))} images in {len(manifest.classes(split))} classes")
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,17 @@ import tensorflow as tf
 import matplotlib.pyplot as plt
 import seaborn as sns
 import json
+import time
 from sklearn.metrics import classification_report, confusion_matrix, precision_recall_fscore_support
 import pandas as pd
 
 # Add parent directory to path to import utilities
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.model_utils import ModelManager
+from utils.model_utils import ModelManager, convert_input, create_backend
 from utils.image_processing import ImageProcessor
+from utils.data_pipeline import create_image_dataset, list_image_files
+from model.dataset_compiler import DatasetCompiler
 
 class ModelEvaluator:
     """Comprehensive model evaluation for tomato disease detection."""
@@ -28,6 +31,40 @@ class ModelEvaluator:
         self.model_manager = ModelManager(model_dir)
         self.image_processor = ImageProcessor()
         
+        # Test data pipeline: "generator" (Keras ImageDataGenerator), "tf.data"
+        # or "compiled" (pre-decoded arrays, see DatasetCompiler)
+        self.input_pipeline = "generator"
+    
+    def create_test_data(self, data_dir: str = "data", batch_size: int = 32):
+        """
+        Create the (unshuffled) test data pipeline selected by ``input_pipeline``.
+        
+        Args:
+            data_dir: Directory containing the dataset
+            batch_size: Batch size
+            
+        Returns:
+            Keras DirectoryIterator or ``tf.data`` dataset with the same ``classes`` attribute
+        """
+        test_dir = os.path.join(data_dir, 'test')
+        if self.input_pipeline == "tf.data":
+            return create_image_dataset(test_dir, batch_size)
+        if self.input_pipeline == "compiled":
+            compiler = DatasetCompiler(data_dir)
+            compiler.compile(['test'])
+            return compiler.create_dataset('test', batch_size)
+        if self.input_pipeline != "generator":
+            raise ValueError(f"Unknown input pipeline: {self.input_pipeline}")
+        
+        test_datagen = tf.keras.preprocessing.image.ImageDataGenerator(rescale=1./255)
+        return test_datagen.flow_from_directory(
+            test_dir,
+            target_size=(224, 224),
+            batch_size=batch_size,
+            class_mode='categorical',
+            shuffle=False
+        )
+        
     def load_model_and_data(self, model_name: str = "tomato_disease_model", data_dir: str = "data"):
         """
         Load the trained model and test data.
@@ -43,14 +80,7 @@ class ModelEvaluator:
         model, metadata = self.model_manager.load_model(model_name)
         
         # Create test data generator
-        test_datagen = tf.keras.preprocessing.image.ImageDataGenerator(rescale=1./255)
-        test_generator = test_datagen.flow_from_directory(
-            os.path.join(data_dir, 'test'),
-            target_size=(224, 224),
-            batch_size=32,
-            class_mode='categorical',
-            shuffle=False
-        )
+        test_generator = self.create_test_data(data_dir)
         
         return model, test_generator, metadata
     
@@ -131,6 +161,137 @@ class ModelEvaluator:
         
         return results
     
+    def evaluate_cascade(self, small_model_name: str, large_model_name: str = "tomato_disease_model",
+                         data_dir: str = "data", thresholds: list = None, backend: str = "tflite",
+                         max_accuracy_drop: float = 0.005, latency_samples: int = 50,
+                         save_threshold: bool = False, batch_size: int = 32):
+        """
+        Evaluate the accuracy/latency trade-off of a two-stage model cascade.
+        
+        The small model scores every test image; images whose top-1 confidence
+        is below the threshold are answered by the large model instead. Mean
+        latency per image is the small model's single-image latency plus the
+        large model's, weighted by the fraction of images escalated. Test
+        images go through the serving preprocessing (``prepare_model_input``),
+        so the recommended threshold holds for the confidences seen in production.
+        
+        Args:
+            small_model_name: Fast first-stage model
+            large_model_name: Full model used for uncertain images
+            data_dir: Directory containing the dataset
+            thresholds: Confidence thresholds to evaluate (default 0.5 to 0.99)
+            backend: Inference backend used to score and time both models
+            max_accuracy_drop: Largest accuracy loss versus the large model
+                accepted when recommending a threshold
+            latency_samples: Number of single-image calls timed per model
+            save_threshold: Store the recommended threshold as ``cascade_threshold``
+                in the small model's metadata, where the server picks it up
+            batch_size: Number of test images scored per call
+            
+        Returns:
+            Dictionary containing per-model and per-threshold results
+        """
+        if thresholds is None:
+            thresholds = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99]
+        
+        print(f"Evaluating cascade: {small_model_name} -> {large_model_name}")
+        models = {
+            'small': create_backend(backend, self.model_manager, small_model_name),
+            'large': create_backend(backend, self.model_manager, large_model_name)
+        }
+        
+        # Preprocess exactly as the server does (CLAHE included), so the
+        # calibrated confidences match the ones the cascade sees at serving time
+        paths, y_true, _ = list_image_files(os.path.join(data_dir, 'test'))
+        if not paths:
+            raise ValueError(f"No test images found in {data_dir}")
+        
+        # Score the whole test set with both models, batch by batch
+        scores = {name: [] for name in models}
+        latency_images = []
+        for start in range(0, len(paths), batch_size):
+            images = self._serving_inputs(paths[start:start + batch_size])
+            if len(latency_images) < latency_samples:
+                latency_images.extend(images[:latency_samples - len(latency_images)])
+            for name, model in models.items():
+                scores[name].append(model.predict_batch(convert_input(images, model.input_dtype)))
+        scores = {name: np.concatenate(batches) for name, batches in scores.items()}
+        
+        # Single-image latency, as served per request
+        latency_ms = {}
+        for name, model in models.items():
+            samples = [convert_input(image[np.newaxis], model.input_dtype) for image in latency_images]
+            model.predict_batch(samples[0])
+            start = time.perf_counter()
+            for sample in samples:
+                model.predict_batch(sample)
+            latency_ms[name] = (time.perf_counter() - start) * 1000.0 / len(samples)
+        
+        small_pred = np.argmax(scores['small'], axis=1)
+        large_pred = np.argmax(scores['large'], axis=1)
+        small_confidence = np.max(scores['small'], axis=1)
+        large_accuracy = float(np.mean(large_pred == y_true))
+        
+        threshold_results = []
+        for threshold in thresholds:
+            escalate = small_confidence < threshold
+            y_pred = np.where(escalate, large_pred, small_pred)
+            mean_latency = latency_ms['small'] + float(np.mean(escalate)) * latency_ms['large']
+            threshold_results.append({
+                'threshold': float(threshold),
+                'accuracy': float(np.mean(y_pred == y_true)),
+                'escalation_rate': float(np.mean(escalate)),
+                'mean_latency_ms': mean_latency,
+                'speedup': latency_ms['large'] / mean_latency
+            })
+        
+        # Lowest (fastest) threshold that stays within the accepted accuracy loss
+        acceptable = [r for r in threshold_results if r['accuracy'] >= large_accuracy - max_accuracy_drop]
+        recommended = min(acceptable, key=lambda r: r['threshold']) if acceptable else None
+        
+        results = {
+            'small_model': {
+                'model_name': small_model_name,
+                'accuracy': float(np.mean(small_pred == y_true)),
+                'latency_ms': latency_ms['small']
+            },
+            'large_model': {
+                'model_name': large_model_name,
+                'accuracy': large_accuracy,
+                'latency_ms': latency_ms['large']
+            },
+            'backend': backend,
+            'thresholds': threshold_results,
+            'recommended_threshold': recommended['threshold'] if recommended else None
+        }
+        
+        print(f"{'Threshold':>10} {'Accuracy':>10} {'Escalated':>10} {'Latency ms':>11} {'Speedup':>8}")
+        for r in threshold_results:
+            print(f"{r['threshold']:>10.2f} {r['accuracy']:>10.4f} {r['escalation_rate']:>10.1%} "
+                  f"{r['mean_latency_ms']:>11.2f} {r['speedup']:>7.1f}x")
+        print(f"Large model alone: accuracy {large_accuracy:.4f}, {latency_ms['large']:.2f} ms")
+        
+        if recommended is None:
+            print(f"No threshold keeps accuracy within {max_accuracy_drop:.3f} of the large model")
+        else:
+            print(f"Recommended threshold: {recommended['threshold']:.2f} "
+                  f"({recommended['speedup']:.1f}x faster on average)")
+            if save_threshold:
+                self.model_manager.update_metadata(small_model_name, {
+                    'cascade_threshold': recommended['threshold'],
+                    'cascade_large_model': large_model_name
+                })
+                print(f"Saved cascade_threshold to the {small_model_name} metadata")
+        
+        return results
+    
+    def _serving_inputs(self, paths: list) -> np.ndarray:
+        """Load images and preprocess them as the server does, as [0, 1] float32."""
+        images = np.empty((len(paths), 224, 224, 3), dtype=np.float32)
+        for i, path in enumerate(paths):
+            self.image_processor.prepare_model_input(self.image_processor.load_image(path), images[i])
+        return images
+    
     def plot_confusion_matrix(self, results: dict, save_path: str = None):
         """
         Plot and save confusion matrix.
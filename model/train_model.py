@@ -5,14 +5,110 @@ import tensorflow as tf
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
 import matplotlib.pyplot as plt
 import json
+import time
+import hashlib
 from datetime import datetime
 
 # Add parent directory to path to import utilities
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.model_utils import ModelManager
+from utils.model_utils import ModelManager, create_backend
 from utils.image_processing import ImageProcessor
+from utils.data_pipeline import create_image_dataset
 from model.data_preprocessing import DataPreprocessor
+from model.dataset_compiler import DatasetCompiler
+
+class DistillationSequence(tf.keras.utils.Sequence):
+    """Wraps a data generator, appending the teacher's softened predictions to each label batch."""
+    
+    def __init__(self, generator, teacher: tf.keras.Model, temperature: float):
+        """
+        Initialize the sequence.
+        
+        Args:
+            generator: Image data generator yielding (images, one-hot labels)
+            teacher: Trained teacher model returning class probabilities
+            temperature: Softening temperature applied to the teacher's output
+        """
+        super().__init__()
+        self.generator = generator
+        self.teacher = teacher
+        self.temperature = temperature
+    
+    def __len__(self):
+        return len(self.generator)
+    
+    def __getitem__(self, index):
+        images, labels = self.generator[index]
+        probabilities = self.teacher(images, training=False)
+        soft_targets = soften(probabilities, self.temperature)
+        return images, np.concatenate([labels, soft_targets.numpy()], axis=1)
+    
+    def on_epoch_end(self):
+        self.generator.on_epoch_end()
+
+def with_soft_targets(data, teacher: tf.keras.Model, temperature: float):
+    """
+    Append the teacher's softened predictions to the labels of a generator or ``tf.data`` dataset.
+    
+    Args:
+        data: Image data generator or dataset yielding (images, one-hot labels)
+        teacher: Trained teacher model returning class probabilities
+        temperature: Softening temperature
+        
+    Returns:
+        Sequence or dataset yielding (images, labels concatenated with soft targets)
+    """
+    if not isinstance(data, tf.data.Dataset):
+        return DistillationSequence(data, teacher, temperature)
+    
+    def add_soft_targets(images, labels):
+        soft_targets = soften(teacher(images, training=False), temperature)
+        return images, tf.concat([labels, tf.cast(soft_targets, labels.dtype)], axis=1)
+    
+    return data.map(add_soft_targets).prefetch(tf.data.AUTOTUNE)
+
+def soften(probabilities, temperature: float):
+    """Re-scale class probabilities to a temperature (softmax of log-probabilities / T)."""
+    log_probabilities = tf.math.log(tf.clip_by_value(probabilities, 1e-7, 1.0))
+    return tf.nn.softmax(log_probabilities / temperature, axis=-1)
+
+def distillation_loss(num_classes: int, temperature: float, alpha: float):
+    """
+    Create the distillation loss for labels from ``DistillationSequence``.
+    
+    Args:
+        num_classes: Number of classes (width of the one-hot part of the labels)
+        temperature: Softening temperature
+        alpha: Weight of the hard-label loss; the soft-target loss gets 1 - alpha
+        
+    Returns:
+        Keras loss function
+    """
+    def loss(y_true, y_pred):
+        hard_targets, soft_targets = y_true[:, :num_classes], y_true[:, num_classes:]
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard_targets, y_pred)
+        # Scaled by T^2 so the soft-target gradients keep their magnitude
+        soft_predictions = tf.clip_by_value(soften(y_pred, temperature), 1e-7, 1.0)
+        soft_targets = tf.clip_by_value(soft_targets, 1e-7, 1.0)
+        soft_loss = tf.reduce_sum(soft_targets * tf.math.log(soft_targets / soft_predictions), axis=-1)
+        return alpha * hard_loss + (1.0 - alpha) * temperature ** 2 * soft_loss
+    return loss
+
+def hard_label_accuracy(num_classes: int):
+    """Accuracy metric on the one-hot part of ``DistillationSequence`` labels."""
+    def accuracy(y_true, y_pred):
+        return tf.keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
+
+def _split_features(features: dict, validation_split: float):
+    """Split cached features into training and validation parts (first fraction of each class)."""
+    validation = np.zeros(len(features['labels']), dtype=bool)
+    for label in np.unique(features['labels']):
+        indices = np.flatnonzero(features['labels'] == label)
+        validation[indices[:int(validation_split * len(indices))]] = True
+    return ({key: value[~validation] for key, value in features.items()},
+            {key: value[validation] for key, value in features.items()})
 
 class TomatoDiseaseTrainer:
     """Trainer class for tomato disease detection model."""
@@ -37,13 +133,83 @@ class TomatoDiseaseTrainer:
         self.learning_rate = 0.001
         self.input_shape = (224, 224, 3)
         
+        # TFLite export: "dynamic" range or full-integer "int8" quantization
+        self.tflite_quantization = "dynamic"
+        
+        # Also export a SavedModel for the "savedmodel" inference backend
+        self.export_saved_model = False
+        
+        # Input pipeline: "generator" (Keras ImageDataGenerator), "tf.data"
+        # (parallel decode/augment, in-memory cache, prefetch) or "compiled"
+        # (images decoded once into memory-mapped arrays, see DatasetCompiler)
+        self.input_pipeline = "generator"
+        
+        # Feature-extraction mode: pooled backbone features are cached here and
+        # the classification head is trained on them for head_epochs
+        self.feature_cache_dir = os.path.join(model_dir, "features")
+        self.head_epochs = 30
+        
+        # Knowledge distillation: softening temperature and weight of the hard labels
+        self.distillation_temperature = 4.0
+        self.distillation_alpha = 0.1
+        
+        self._manifest = None
+        
+    def dataset_manifest(self):
+        """
+        Manifest of the dataset, shared by the input pipelines and the preprocessor.
+        
+        The dataset is rescanned on first use (only new or changed files are
+        read) and the result is reused for the rest of the run.
+        
+        Returns:
+            DatasetManifest of ``data_dir``
+        """
+        if self._manifest is None:
+            self._manifest = self.data_preprocessor.get_manifest(self.data_dir, rescan=True)
+        return self._manifest
+    
     def prepare_data(self):
         """
         Prepare the dataset for training.
         
         Returns:
-            Tuple of (train_generator, validation_generator, test_generator)
+            Tuple of (train_generator, validation_generator, test_generator); with
+            ``input_pipeline = "tf.data"`` these are ``tf.data`` datasets
         """
+        if self.input_pipeline == "tf.data":
+            print("Preparing tf.data pipelines...")
+            manifest = self.dataset_manifest()
+            train_generator, validation_generator = self.model_manager.create_datasets(
+                self.data_dir, self.batch_size, manifest=manifest
+            )
+            test_generator = create_image_dataset(os.path.join(self.data_dir, 'test'), self.batch_size,
+                                                  files=manifest.image_files('test'))
+            
+            print(f"Training samples: {train_generator.samples}")
+            print(f"Validation samples: {validation_generator.samples}")
+            print(f"Test samples: {test_generator.samples}")
+            
+            return train_generator, validation_generator, test_generator
+        
+        if self.input_pipeline == "compiled":
+            print("Preparing compiled dataset pipelines...")
+            # Incremental: only new or changed images are decoded
+            compiler = DatasetCompiler(self.data_dir, target_size=self.input_shape[:2],
+                                       manifest=self.dataset_manifest())
+            compiler.compile()
+            train_generator, validation_generator = compiler.create_training_datasets(self.batch_size)
+            test_generator = compiler.create_dataset('test', self.batch_size)
+            
+            print(f"Training samples: {train_generator.samples}")
+            print(f"Validation samples: {validation_generator.samples}")
+            print(f"Test samples: {test_generator.samples}")
+            
+            return train_generator, validation_generator, test_generator
+        
+        if self.input_pipeline != "generator":
+            raise ValueError(f"Unknown input pipeline: {self.input_pipeline}")
+        
         print("Preparing data generators...")
         
         # Create data generators
@@ -107,12 +273,14 @@ class TomatoDiseaseTrainer:
         
         return [checkpoint, early_stopping, reduce_lr]
     
-    def train_model(self, model_name: str = "tomato_disease_model"):
+    def train_model(self, model_name: str = "tomato_disease_model", architecture: str = "efficientnet"):
         """
         Train the tomato disease detection model.
         
         Args:
             model_name: Name for the model
+            architecture: "efficientnet" (transfer learning) or "small" (the
+                small CNN used as the fast stage of a model cascade)
         """
         print("Starting model training...")
         
@@ -121,7 +289,12 @@ class TomatoDiseaseTrainer:
         
         # Create model
         print("Creating model...")
-        model = self.model_manager.create_model(self.input_shape)
+        if architecture == "small":
+            model = self.model_manager.create_small_model(self.input_shape)
+        elif architecture == "efficientnet":
+            model = self.model_manager.create_model(self.input_shape)
+        else:
+            raise ValueError(f"Unknown architecture: {architecture}")
         
         # Print model summary
         print("\nModel Summary:")
@@ -146,7 +319,9 @@ class TomatoDiseaseTrainer:
         
         # Convert to TFLite
         print("Converting to TensorFlow Lite...")
-        tflite_path = self.model_manager.convert_to_tflite(model, model_name)
+        tflite_path = self.export_tflite(model, model_name)
+        if self.export_saved_model:
+            self.model_manager.export_saved_model(model, model_name)
         
         # Evaluate the model
         print("Evaluating model...")
@@ -167,6 +342,310 @@ class TomatoDiseaseTrainer:
         
         return model, history, evaluation_results
     
+    def train_head_on_features(self, model_name: str = "tomato_disease_model",
+                               dropout_rates: tuple = (0.5, 0.3, 0.2), learning_rate: float = None):
+        """
+        Train the classification head on cached backbone features.
+        
+        The EfficientNetB0 backbone is frozen, so its pooled features for a
+        (non-augmented) image never change: they are extracted once per split,
+        stored in ``feature_cache_dir`` and reused until the images change.
+        The Dense head trains on them directly, then its weights are attached
+        to a full model, which is saved and exported like ``train_model``.
+        Without augmentation this trades some regularization for speed; use it
+        for fast head experiments (dropout, learning rate) and ``train_model``
+        for the final run if augmentation matters.
+        
+        Args:
+            model_name: Name for the model
+            dropout_rates: Dropout before each of the three Dense layers of the head
+            learning_rate: Head learning rate (defaults to ``learning_rate``)
+            
+        Returns:
+            Tuple of (model, history, evaluation_results)
+        """
+        learning_rate = learning_rate or self.learning_rate
+        print("Starting head training on cached backbone features...")
+        
+        model = self.model_manager.create_model(self.input_shape, dropout_rates, learning_rate)
+        feature_extractor = self.model_manager.create_feature_extractor(model)
+        
+        train_features = self.extract_features(feature_extractor, 'train')
+        if train_features is None:
+            raise FileNotFoundError(f"Training data not found: {os.path.join(self.data_dir, 'train')}")
+        
+        # Separate 'val' folder, or the first 20% of each class like the data generators
+        validation_features = self.extract_features(feature_extractor, 'val')
+        if validation_features is None:
+            train_features, validation_features = _split_features(train_features, 0.2)
+        
+        num_classes = self.model_manager.num_classes
+        head = self.model_manager.create_head_model(
+            train_features['features'].shape[1], dropout_rates, learning_rate
+        )
+        callbacks = [callback for callback in self.create_callbacks(model_name)
+                     if not isinstance(callback, ModelCheckpoint)]
+        
+        print(f"\nTraining head on {len(train_features['labels'])} feature vectors for up to {self.head_epochs} epochs...")
+        history = head.fit(
+            train_features['features'],
+            tf.keras.utils.to_categorical(train_features['labels'], num_classes),
+            batch_size=self.batch_size,
+            epochs=self.head_epochs,
+            validation_data=(
+                validation_features['features'],
+                tf.keras.utils.to_categorical(validation_features['labels'], num_classes)
+            ) if len(validation_features['labels']) else None,
+            callbacks=callbacks,
+            verbose=1
+        )
+        
+        # Reattach the head to the backbone for export
+        self.model_manager.attach_head(model, head)
+        
+        print("Saving model...")
+        model_path = self.model_manager.save_model(model, model_name)
+        tflite_path = self.export_tflite(model, model_name)
+        if self.export_saved_model:
+            self.model_manager.export_saved_model(model, model_name)
+        
+        # End-to-end check of the reattached model on the test images
+        print("Evaluating model...")
+        evaluation_results = self.model_manager.evaluate_model(model, self._feature_source('test'))
+        
+        eval_path = os.path.join(self.model_dir, f"{model_name}_evaluation.json")
+        with open(eval_path, 'w') as f:
+            json.dump(evaluation_results, f, indent=2)
+        
+        self.plot_training_history(history, model_name)
+        
+        print(f"\nHead training completed!")
+        print(f"Model saved to: {model_path}")
+        print(f"TFLite model saved to: {tflite_path}")
+        print(f"Evaluation results saved to: {eval_path}")
+        
+        return model, history, evaluation_results
+    
+    def extract_features(self, feature_extractor, split: str):
+        """
+        Pooled backbone features of a split, from the feature cache when the images are unchanged.
+        
+        Args:
+            feature_extractor: Model from ``ModelManager.create_feature_extractor``
+            split: Dataset split folder (e.g. "train")
+            
+        Returns:
+            Dictionary with ``features``, ``labels`` and ``paths`` arrays, or
+            None if the split does not exist
+        """
+        manifest = self.dataset_manifest()
+        if not manifest.has_split(split):
+            return None
+        
+        # Fingerprint of the images (paths, content hashes) and of the backbone input;
+        # the pipelines resize differently, so features depend on input_pipeline too
+        rows = manifest.select(split)
+        digest = hashlib.sha256(json.dumps(
+            [list(self.input_shape), self.input_pipeline == "compiled", manifest.classes(split)]
+        ).encode())
+        for path, content_hash in zip(manifest['path'][rows], manifest['hash'][rows]):
+            digest.update(f"{path}\0{content_hash}\n".encode())
+        fingerprint = digest.hexdigest()
+        
+        cache_path = os.path.join(self.feature_cache_dir, f"{split}_efficientnetb0.npz")
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            if str(cached['fingerprint']) == fingerprint:
+                print(f"{split}: using cached features ({len(cached['labels'])} images)")
+                return {key: cached[key] for key in ('features', 'labels', 'paths')}
+        
+        print(f"{split}: extracting backbone features...")
+        start = time.time()
+        dataset = self._feature_source(split)
+        features = feature_extractor.predict(dataset, verbose=1).astype(np.float32)
+        result = {
+            'features': features,
+            'labels': np.asarray(dataset.classes, dtype=np.int32),
+            'paths': np.asarray(dataset.filepaths)
+        }
+        
+        os.makedirs(self.feature_cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.tmp.npz"
+        np.savez(temp_path, fingerprint=np.array(fingerprint), **result)
+        os.replace(temp_path, cache_path)
+        print(f"{split}: cached {features.shape} features in {time.time() - start:.1f}s")
+        
+        return result
+    
+    def _feature_source(self, split: str):
+        """Unshuffled, non-augmented pipeline over a split, for feature extraction and evaluation."""
+        manifest = self.dataset_manifest()
+        if self.input_pipeline == "compiled":
+            compiler = DatasetCompiler(self.data_dir, target_size=self.input_shape[:2], manifest=manifest)
+            compiler.compile([split])
+            return compiler.create_dataset(split, self.batch_size)
+        return create_image_dataset(os.path.join(self.data_dir, split), self.batch_size,
+                                    target_size=self.input_shape[:2], files=manifest.image_files(split))
+    
+    def distill_model(self, teacher_name: str = "tomato_disease_model",
+                      model_name: str = "tomato_disease_student",
+                      student_architecture: str = "mobilenet"):
+        """
+        Train a compact student model on the soft targets of a trained teacher.
+        
+        The student learns from both the true labels and the teacher's
+        temperature-softened predictions (weighted by ``distillation_alpha``),
+        is exported to TFLite, and has its size and single-image latency
+        recorded next to its accuracy (and the teacher's) in its metadata.
+        
+        Args:
+            teacher_name: Name of the trained teacher model
+            model_name: Name for the student model
+            student_architecture: "mobilenet" or "small" (see ``ModelManager.create_student_model``)
+            
+        Returns:
+            Tuple of (student model, history, distillation report)
+        """
+        print(f"Distilling {teacher_name} into a {student_architecture} student...")
+        
+        # Load the teacher (inference only)
+        teacher, _ = self.model_manager.load_model(teacher_name)
+        teacher.trainable = False
+        
+        # Prepare data
+        train_generator, validation_generator, test_generator = self.prepare_data()
+        
+        # Create the student and train it against hard labels plus soft targets
+        student = self.model_manager.create_student_model(self.input_shape, student_architecture)
+        num_classes = self.model_manager.num_classes
+        temperature = self.distillation_temperature
+        student.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=self.learning_rate),
+            loss=distillation_loss(num_classes, temperature, self.distillation_alpha),
+            metrics=[hard_label_accuracy(num_classes)]
+        )
+        
+        print("\nStudent Summary:")
+        print(self.model_manager.get_model_summary(student))
+        
+        # The checkpoint callback would serialize the custom loss; keep the others
+        callbacks = [callback for callback in self.create_callbacks(model_name)
+                     if not isinstance(callback, ModelCheckpoint)]
+        
+        print(f"\nTraining for {self.epochs} epochs (T={temperature}, alpha={self.distillation_alpha})...")
+        history = student.fit(
+            with_soft_targets(train_generator, teacher, temperature),
+            epochs=self.epochs,
+            validation_data=with_soft_targets(validation_generator, teacher, temperature),
+            callbacks=callbacks,
+            verbose=1
+        )
+        
+        # Standard loss again, so the saved model loads without custom objects
+        student.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        
+        print("Saving student model...")
+        model_path = self.model_manager.save_model(student, model_name)
+        tflite_path = self.export_tflite(student, model_name)
+        if self.export_saved_model:
+            self.model_manager.export_saved_model(student, model_name)
+        
+        # Accuracy of both models on the test set, size and latency of both TFLite models
+        print("Evaluating student and teacher...")
+        evaluation_results = self.model_manager.evaluate_model(student, test_generator)
+        teacher.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+        teacher_accuracy = float(teacher.evaluate(test_generator, verbose=0)[1])
+        
+        report = {
+            'teacher': teacher_name,
+            'student_architecture': student_architecture,
+            'temperature': temperature,
+            'alpha': self.distillation_alpha,
+            'student': {
+                'accuracy': float(evaluation_results['accuracy']),
+                'parameters': int(student.count_params()),
+                **self.measure_tflite_model(model_name)
+            },
+            'teacher_model': {
+                'accuracy': teacher_accuracy,
+                'parameters': int(teacher.count_params()),
+                **self.measure_tflite_model(teacher_name)
+            }
+        }
+        self.model_manager.update_metadata(model_name, {'distillation': report})
+        
+        eval_path = os.path.join(self.model_dir, f"{model_name}_evaluation.json")
+        with open(eval_path, 'w') as f:
+            json.dump({**evaluation_results, 'distillation': report}, f, indent=2)
+        
+        self.plot_training_history(history, model_name)
+        
+        student_info, teacher_info = report['student'], report['teacher_model']
+        print(f"\nDistillation completed!")
+        print(f"Student: accuracy {student_info['accuracy']:.4f}, {student_info['parameters']:,} parameters, "
+              f"{student_info.get('tflite_size_mb', float('nan')):.2f} MB, "
+              f"{student_info.get('latency_ms', float('nan')):.2f} ms")
+        print(f"Teacher: accuracy {teacher_info['accuracy']:.4f}, {teacher_info['parameters']:,} parameters, "
+              f"{teacher_info.get('tflite_size_mb', float('nan')):.2f} MB, "
+              f"{teacher_info.get('latency_ms', float('nan')):.2f} ms")
+        print(f"Model saved to: {model_path}")
+        print(f"TFLite model saved to: {tflite_path}")
+        
+        return student, history, report
+    
+    def measure_tflite_model(self, model_name: str, runs: int = 50) -> dict:
+        """
+        Measure the file size and single-image latency of a TFLite model.
+        
+        Args:
+            model_name: Name of the TFLite model
+            runs: Number of timed single-image inferences
+            
+        Returns:
+            Dictionary with ``tflite_size_mb`` and ``latency_ms`` (empty if there is no TFLite model)
+        """
+        tflite_path = os.path.join(self.model_dir, f"{model_name}.tflite")
+        if not os.path.exists(tflite_path):
+            return {}
+        
+        backend = create_backend("tflite", self.model_manager, model_name, pool_size=1)
+        image = np.zeros((1, *backend.input_shape), dtype=backend.input_dtype)
+        backend.predict_batch(image)
+        
+        start = time.perf_counter()
+        for _ in range(runs):
+            backend.predict_batch(image)
+        
+        return {
+            'tflite_size_mb': os.path.getsize(tflite_path) / (1024 * 1024),
+            'latency_ms': (time.perf_counter() - start) * 1000.0 / runs
+        }
+    
+    def export_tflite(self, model, model_name: str) -> str:
+        """
+        Export the model to TensorFlow Lite using the configured quantization.
+        
+        For int8 export, calibration samples come from the training set and the
+        accuracy delta against the float model on the test set is recorded in
+        the model metadata.
+        
+        Args:
+            model: Trained Keras model
+            model_name: Name of the model
+            
+        Returns:
+            Path to the saved TFLite model
+        """
+        if self.tflite_quantization == "int8":
+            return self.model_manager.convert_to_tflite(
+                model, model_name,
+                quantization="int8",
+                representative_data_dir=os.path.join(self.data_dir, 'train'),
+                evaluation_data_dir=os.path.join(self.data_dir, 'test')
+            )
+        
+        return self.model_manager.convert_to_tflite(model, model_name)
+    
     def plot_training_history(self, history, model_name: str):
         """
         Plot training history.
@@ -246,7 +725,9 @@ class TomatoDiseaseTrainer:
         
         # Save the fine-tuned model
         model_path = self.model_manager.save_model(model, model_name)
-        tflite_path = self.model_manager.convert_to_tflite(model, model_name)
+        tflite_path = self.export_tflite(model, model_name)
+        if self.export_saved_model:
+            self.model_manager.export_saved_model(model, model_name)
         
         print(f"Fine-tuning completed!")
         print(f"Fine-tuned model saved to: {model_path}")
@@ -279,9 +760,12 @@ def main():
     # Initialize trainer
     trainer = TomatoDiseaseTrainer(data_dir)
     
+    # Scan the dataset once (only new or changed files are read); later steps use the manifest
+    trainer.dataset_manifest()
+    
     # Validate dataset
     print("Validating dataset...")
-    validation_results = trainer.data_preprocessor.validate_dataset(data_dir)
+    validation_results = trainer.data_preprocessor.validate_dataset(data_dir, rescan=False)
     
     if not validation_results['valid']:
         print("Dataset validation failed!")
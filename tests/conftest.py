@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the project root to path to import the application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('starlette')
+from starlette.testclient import TestClient
+
+import asgi
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(asgi.core.app.config, 'MAX_CONTENT_LENGTH', 1024 * 1024)
+    # No lifespan: the routes under test reject the body before any model is needed
+    return TestClient(asgi.app)
+
+def chunks(size, chunk_size=64 * 1024):
+    for _ in range(0, size, chunk_size):
+        yield b'x' * chunk_size
+
+def test_declared_oversized_body_is_rejected(client):
+    response = client.post('/api/predict', content=b'x' * (2 * 1024 * 1024), headers={'content-type': 'image/jpeg'})
+    assert response.status_code == 413
+    assert response.json()['error'] == 'File too large. Maximum size is 1MB.'
+
+@pytest.mark.parametrize('path', ['/api/predict', '/predict'])
+def test_chunked_oversized_body_is_rejected(client, path):
+    content_type = 'image/jpeg' if path == '/api/predict' else 'multipart/form-data; boundary=x'
+    response = client.post(path, content=chunks(2 * 1024 * 1024), headers={'content-type': content_type})
+    assert response.status_code == 413
+
+def test_malformed_content_length_is_a_client_error(client):
+    response = client.post('/api/predict', content=b'x', headers={'content-length': 'abc'})
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import numpy as np
+import pytest
+
+from utils.batching import BatchScheduler
+
+def make_image(value=0.0):
+    return np.full((4, 4, 3), value, dtype=np.float32)
+
+def test_predict_returns_own_row():
+    scheduler = BatchScheduler(lambda images: images.reshape(len(images), -1)[:, :2], max_wait_ms=1)
+    scheduler.start()
+    try:
+        assert scheduler.predict(make_image(3.0))[0] == 3.0
+        assert scheduler.predict(make_image(5.0)[None])[0] == 5.0
+    finally:
+        scheduler.stop()
+
+def test_stop_fails_queued_futures():
+    # Never started: nothing drains the queue until stop()
+    scheduler = BatchScheduler(lambda images: images)
+    future = scheduler.submit(make_image())
+
+    scheduler.stop()
+
+    with pytest.raises(RuntimeError, match='scheduler stopped'):
+        future.result(timeout=1)
+
+def test_submit_after_stop_raises():
+    scheduler = BatchScheduler(lambda images: images)
+    scheduler.start()
+    scheduler.stop()
+
+    assert scheduler.stopped
+    with pytest.raises(RuntimeError, match='scheduler stopped'):
+        scheduler.submit(make_image())
+    with pytest.raises(RuntimeError, match='scheduler stopped'):
+        scheduler.predict(make_image())
+
+def test_restart_after_stop():
+    scheduler = BatchScheduler(lambda images: images.reshape(len(images), -1), max_wait_ms=1)
+    scheduler.start()
+    scheduler.stop()
+    scheduler.start()
+    try:
+        assert scheduler.predict(make_image(1.0))[0] == 1.0
+    finally:
+        scheduler.stop()
+
+def test_predict_times_out_and_cancels():
+    release = threading.Event()
+
+    def blocked(images):
+        release.wait(5)
+        return images.reshape(len(images), -1)
+
+    scheduler = BatchScheduler(blocked, max_batch_size=1, max_wait_ms=0)
+    scheduler.start()
+    try:
+        # The first image occupies the only worker, the second waits in the queue
+        first = scheduler.submit(make_image())
+        with pytest.raises(TimeoutError):
+            scheduler.predict(make_image(), timeout=0.2)
+    finally:
+        release.set()
+        first.result(timeout=5)
+        scheduler.stop()
+
+def test_predict_exception_reaches_every_caller():
+    def failing(images):
+        raise ValueError('backend failed')
+
+    scheduler = BatchScheduler(failing, max_batch_size=4, max_wait_ms=20)
+    scheduler.start()
+    try:
+        futures = [scheduler.submit(make_image()) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match='backend failed'):
+                future.result(timeout=5)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from model.data_preprocessing import DataPreprocessor, _check_image
+from model import dataset_manifest
+from model.dataset_manifest import DatasetManifest
+
+CLASSES = ['Tomato___healthy', 'Tomato___Late_blight']
+
+def write_image(path, ext='.jpg', value=128):
+    image = np.full((16, 24, 3), value, dtype=np.uint8)
+    assert cv2.imwrite(str(path.with_suffix(ext)), image)
+    return path.with_suffix(ext)
+
+@pytest.fixture
+def dataset(tmp_path):
+    for split in ('train', 'test'):
+        for class_name in CLASSES:
+            class_dir = tmp_path / split / class_name
+            class_dir.mkdir(parents=True)
+            for i in range(3):
+                write_image(class_dir / f"img{i}", value=40 * i)
+    return tmp_path
+
+@pytest.fixture
+def preprocessor(dataset):
+    preprocessor = DataPreprocessor(str(dataset))
+    preprocessor.class_names = CLASSES
+    return preprocessor
+
+@pytest.mark.parametrize('ext', ['.jpg', '.png', '.bmp'])
+def test_check_image_accepts_listed_formats(tmp_path, ext):
+    path = write_image(tmp_path / 'image', ext)
+    assert _check_image(str(path))
+    assert _check_image(str(path), full_decode=True)
+
+def test_check_image_rejects_garbage_and_truncated_jpeg(tmp_path):
+    garbage = tmp_path / 'garbage.png'
+    garbage.write_bytes(b'not an image')
+    assert not _check_image(str(garbage))
+
+    data = write_image(tmp_path / 'image').read_bytes()
+    truncated = tmp_path / 'truncated.jpg'
+    truncated.write_bytes(data[:len(data) // 2])
+    assert not _check_image(str(truncated))
+
+def test_validate_sees_files_changed_after_manifest(dataset, preprocessor):
+    results = preprocessor.validate_dataset()
+    assert results['valid'] and results['corrupted_files'] == []
+    assert results['checked'] == 12
+
+    target = dataset / 'train' / CLASSES[0] / 'img1.jpg'
+    target.write_bytes(b'garbage overwriting a valid image')
+
+    # Same object and a fresh one (reading the stored manifest) both notice the change on rescan
+    for checker in (preprocessor, DataPreprocessor(str(dataset))):
+        checker.class_names = CLASSES
+        results = checker.validate_dataset(rescan=True)
+        assert results['corrupted_files'] == [str(target)]
+        assert results['cached'] >= 11
+
+def test_stats_pick_up_added_files(dataset, preprocessor):
+    assert preprocessor.get_dataset_stats()['train'][CLASSES[0]] == 3
+    write_image(dataset / 'train' / CLASSES[0] / 'extra', '.bmp')
+    assert preprocessor.get_dataset_stats(rescan=True)['train'][CLASSES[0]] == 4
+
+def test_stored_manifest_is_used_without_walking(dataset, preprocessor, monkeypatch):
+    preprocessor.get_manifest()
+
+    def walk(*args, **kwargs):
+        raise AssertionError('directory walked')
+    monkeypatch.setattr(DatasetManifest, 'scan', walk)
+    fresh = DataPreprocessor(str(dataset))
+    fresh.class_names = CLASSES
+    assert fresh.get_dataset_stats()['total_images'] == 12
+
+def test_organize_keeps_nested_files_and_leaves_source_alone(tmp_path, monkeypatch):
+    source = tmp_path / 'raw'
+    for folder in ('', 'batch1', 'batch2'):
+        (source / CLASSES[0] / folder).mkdir(parents=True, exist_ok=True)
+        for i in range(3):
+            write_image(source / CLASSES[0] / folder / f"img{i}")
+    describe_file = dataset_manifest._describe_file
+
+    def describe_target_only(path):
+        assert not path.startswith(str(source)), 'source file read'
+        return describe_file(path)
+    monkeypatch.setattr(dataset_manifest, '_describe_file', describe_target_only)
+
+    preprocessor = DataPreprocessor(str(tmp_path / 'data'))
+    preprocessor.class_names = CLASSES
+    target = preprocessor.organize_dataset(str(source))
+
+    assert not (source / '.manifest.npz').exists()
+    stats = preprocessor.get_dataset_stats(target)
+    assert stats['train'][CLASSES[0]] + stats['test'][CLASSES[0]] == 9
+
+def test_manifest_reuses_unchanged_rows(dataset):
+    first = DatasetManifest.scan(str(dataset))
+    first.save()
+    write_image(dataset / 'test' / CLASSES[1] / 'img0', value=255)
+
+    second = DatasetManifest.scan(str(dataset), previous=DatasetManifest.load(str(dataset)))
+    assert len(second) == 12
+    changed = second.select('test', CLASSES[1])[0]
+    assert second['hash'][changed] != first['hash'][changed]
+    assert (second['height'] == 16).all() and (second['width'] == 24).all()
+
+def test_manifest_does_not_import_tensorflow():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, model.data_preprocessing; print('tensorflow' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from model.dataset_compiler import DatasetCompiler
+
+@pytest.fixture
+def compiler(tmp_path):
+    for class_name in ('healthy', 'blight'):
+        class_dir = tmp_path / 'train' / class_name
+        class_dir.mkdir(parents=True)
+        for i in range(3):
+            Image.new('RGB', (40, 30), (i * 40, 100, 50)).save(class_dir / f"{i}.png")
+    return DatasetCompiler(str(tmp_path), target_size=(16, 16), num_workers=2)
+
+def images_path(compiler):
+    return os.path.join(compiler.split_dir('train'), 'images.npy')
+
+def test_incremental_compile_reuses_rows(compiler):
+    assert compiler.compile_split('train')['decoded'] == 6
+    assert compiler.compile_split('train')['up_to_date']
+
+    images, index = compiler.load('train')
+    assert images.shape == (6, 16, 16, 3)
+    assert index['class_indices'] == {'blight': 0, 'healthy': 1}
+
+@pytest.mark.parametrize('damage', ['missing', 'truncated', 'wrong_shape'])
+def test_recompiles_when_images_do_not_match_index(compiler, damage):
+    compiler.compile_split('train')
+    expected, _ = compiler.load('train')
+    expected = np.array(expected)
+
+    path = images_path(compiler)
+    if damage == 'missing':
+        os.remove(path)
+    elif damage == 'truncated':
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) // 2)
+    else:
+        np.save(path, np.zeros((2, 16, 16, 3), dtype=np.uint8))
+
+    result = compiler.compile_split('train')
+    assert not result['up_to_date'] and result['reused'] == 0 and result['decoded'] == 6
+    images, _ = compiler.load('train')
+    np.testing.assert_array_equal(images, expected)
+
+def test_interrupted_build_leaves_no_index(compiler, monkeypatch):
+    compiler.compile_split('train')
+    Image.new('RGB', (40, 30)).save(os.path.join(compiler.data_dir, 'train', 'healthy', '9.png'))
+
+    def interrupted(split, index):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(compiler, '_write_index', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        compiler.compile_split('train')
+    monkeypatch.undo()
+
+    with pytest.raises(FileNotFoundError):
+        compiler.load('train')
+    assert compiler.compile_split('train')['decoded'] == 7
+
+def test_unreadable_files_do_not_force_rebuilds(compiler):
+    broken = os.path.join(compiler.data_dir, 'train', 'healthy', 'broken.png')
+    with open(broken, 'wb') as f:
+        f.write(b'not an image')
+
+    result = compiler.compile_split('train')
+    assert result['failed'] == [broken] and result['images'] == 6
+
+    result = compiler.compile_split('train')
+    assert result['up_to_date'] and result['failed'] == [broken]
+
+    # Another change rebuilds without decoding the unchanged unreadable file again
+    Image.new('RGB', (40, 30)).save(os.path.join(compiler.data_dir, 'train', 'blight', '9.png'))
+    result = compiler.compile_split('train')
+    assert not result['up_to_date'] and result['decoded'] == 1 and result['reused'] == 6
+    assert result['failed'] == [broken]
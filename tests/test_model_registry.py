@@ -0,0 +1,109 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils import model_utils
+from utils.model_registry import ModelRegistry, ModelVersion
+from utils.model_utils import InferenceBackend, ModelManager
+
+class FakeBackend(InferenceBackend):
+    """Backend scoring images by their mean pixel value, with an optional per-call delay."""
+
+    name = "fake"
+    artifact_suffix = ".fake"
+    delay = 0.0
+
+    def __init__(self, model_manager, model_name="tomato_disease_model"):
+        super().__init__(model_manager, model_name)
+        self.metadata = {'version': model_name}
+        self.input_shape = (4, 4, 3)
+        self.concurrency = 2
+
+    def predict_batch(self, images):
+        time.sleep(self.delay)
+        scores = np.zeros((len(images), 10), dtype=np.float32)
+        scores[:, 0] = images.reshape(len(images), -1).mean(axis=1)
+        return scores
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setitem(model_utils.INFERENCE_BACKENDS, 'fake', FakeBackend)
+    for name in ('model_v1', 'model_v2'):
+        (tmp_path / f"{name}.fake").write_bytes(b'')
+    registry = ModelRegistry(ModelManager(str(tmp_path)), default_model='model_v1', backend='fake',
+                             batch_max_wait_ms=1)
+    assert registry.activate('model_v1')
+    yield registry
+    registry.active.close(timeout=1)
+
+def test_checkout_pins_version_across_swap(registry):
+    with registry.checkout() as old:
+        assert registry.activate('model_v2')
+        assert registry.active.model_name == 'model_v2'
+
+        # The retired version keeps serving its pinned request
+        time.sleep(0.1)
+        assert not old.scheduler.stopped
+        image = np.ones((1, 4, 4, 3), dtype=np.float32)
+        scores, stage = old.predict_cascade(image)
+        assert stage == 'full' and scores[0] == 1.0
+
+    # Once released, the retired version shuts down and refuses new requests
+    deadline = time.monotonic() + 5
+    while not old.scheduler.stopped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert old.scheduler.stopped
+    assert not old._enter()
+
+def test_checkout_refuses_closing_version(registry):
+    registry.active.close(timeout=1)
+    with pytest.raises(RuntimeError, match='shutting down'):
+        with registry.checkout():
+            pass
+
+def test_swap_under_load(registry, monkeypatch):
+    monkeypatch.setattr(FakeBackend, 'delay', 0.002)
+    stop = threading.Event()
+    errors = []
+    completed = [0]
+
+    def client(value):
+        image = np.full((1, 4, 4, 3), value, dtype=np.float32)
+        while not stop.is_set():
+            try:
+                with registry.checkout() as version:
+                    scores, _ = version.predict_cascade(image)
+                assert scores[0] == pytest.approx(value)
+                completed[0] += 1
+            except Exception as e:
+                errors.append(e)
+
+    clients = [threading.Thread(target=client, args=(i / 10.0,)) for i in range(8)]
+    for thread in clients:
+        thread.start()
+    for i in range(10):
+        assert registry.activate(('model_v1', 'model_v2')[i % 2])
+        time.sleep(0.02)
+    stop.set()
+    for thread in clients:
+        thread.join(10)
+
+    assert not any(thread.is_alive() for thread in clients)
+    assert errors == []
+    assert completed[0] > 0
+
+def test_averaged_cascade_escalates_on_mean_confidence(registry):
+    version = registry.active
+    fast_stage = ModelVersion(registry.model_manager, 'model_v2', 'fake')
+    version.attach_fast_stage(fast_stage, threshold=0.5)
+
+    # Variants disagree, but their average is confident enough for the fast stage
+    confident = np.stack([np.full((4, 4, 3), value, dtype=np.float32) for value in (0.4, 0.8)])
+    scores, stage = version.predict_averaged_cascade(confident)
+    assert stage == 'fast' and scores[0] == pytest.approx(0.6)
+
+    uncertain = np.full((2, 4, 4, 3), 0.2, dtype=np.float32)
+    scores, stage = version.predict_averaged_cascade(uncertain)
+    assert stage == 'full' and scores.shape == (10,)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from utils.prediction_cache import PredictionCache
+
+def test_repeated_upload_is_served_from_cache():
+    lookups = []
+    cache = PredictionCache(max_entries=4, on_lookup=lookups.append)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'label': 'healthy'}
+
+    first = cache.get_or_compute(b'image', compute)
+    second = cache.get_or_compute(b'image', compute)
+
+    assert calls == [1]
+    assert first == {'label': 'healthy', 'cached': False}
+    assert second == {'label': 'healthy', 'cached': True}
+    assert lookups == [False, True]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_concurrent_identical_uploads_compute_once():
+    cache = PredictionCache(max_entries=4)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'label': 'healthy'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(b'image', compute)))
+               for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Let the other requests join the computation before it finishes
+    deadline = time.monotonic() + 5
+    while cache.stats()['hits'] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert len(results) == 8
+    assert sum(result['cached'] for result in results) == 7
+    assert all(result['label'] == 'healthy' for result in results)
+
+def test_failed_computation_is_shared_and_not_cached():
+    cache = PredictionCache(max_entries=4)
+
+    def fail():
+        raise ValueError('bad image')
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute(b'image', fail)
+    assert cache.get_or_compute(b'image', lambda: {'label': 'healthy'})['cached'] is False
+
+def test_results_of_other_models_and_variants_are_separate():
+    cache = PredictionCache(max_entries=4)
+    cache.set_model_identity('model_v1')
+    cache.get_or_compute(b'image', lambda: {'label': 'healthy'})
+
+    assert cache.get_or_compute(b'image', lambda: {'label': 'blight'}, variant='tta')['label'] == 'blight'
+    cache.set_model_identity('model_v2')
+    assert cache.get_or_compute(b'image', lambda: {'label': 'mold'})['label'] == 'mold'
+
+def test_expired_and_uncacheable_results_are_recomputed():
+    cache = PredictionCache(max_entries=4, ttl_seconds=0.0)
+    cache.get_or_compute(b'image', lambda: {'label': 'healthy'})
+    assert cache.get_or_compute(b'image', lambda: {'label': 'blight'})['label'] == 'blight'
+
+    cache = PredictionCache(max_entries=4)
+    cache.get_or_compute(b'image', lambda: {'error': 'failed'}, cacheable=lambda r: 'error' not in r)
+    assert cache.get_or_compute(b'image', lambda: {'label': 'healthy'})['cached'] is False
+
+def test_waiters_on_uncacheable_result_are_not_reported_cached():
+    cache = PredictionCache(max_entries=4)
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return {'error': 'Prediction failed'}
+
+    results = []
+
+    def request():
+        results.append(cache.get_or_compute(b'image', compute, cacheable=lambda r: 'error' not in r))
+
+    owner = threading.Thread(target=request)
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=request)
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()['hits'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert len(results) == 2
+    assert all(result == {'error': 'Prediction failed', 'cached': False} for result in results)
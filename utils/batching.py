@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+# Longest a caller waits for its prediction by default, so a stalled backend cannot hang requests
+DEFAULT_PREDICT_TIMEOUT = 30.0
+
+class BatchScheduler:
+    """Dynamic micro-batching scheduler in front of a batched predict function."""
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, num_workers: int = 1):
+        """
+        Initialize the batch scheduler.
+
+        Args:
+            predict_fn: Function mapping an (N, H, W, C) batch to (N, num_classes) scores
+            max_batch_size: Maximum number of images per inference call
+            max_wait_ms: Maximum time to wait for more images once one is pending
+            num_workers: Number of batches that may run concurrently
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_workers = num_workers
+
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._stop_event = threading.Event()
+        self._workers: List[threading.Thread] = []
+        # Guards the stopped flag against submits racing with stop()
+        self._state_lock = threading.Lock()
+        self._stopped = False
+
+    def start(self) -> None:
+        """Start the background batching threads."""
+        if self._workers:
+            return
+
+        with self._state_lock:
+            self._stopped = False
+        self._stop_event.clear()
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._run, name=f'batch-scheduler-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background batching threads.
+
+        Images still queued are not run: their futures fail with a
+        ``RuntimeError``, and later submits are refused.
+
+        Args:
+            timeout: Maximum time to wait for each thread to exit
+        """
+        with self._state_lock:
+            self._stopped = True
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError('scheduler stopped'))
+
+    @property
+    def stopped(self) -> bool:
+        """Whether the scheduler has been stopped."""
+        return self._stopped
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of images waiting to be batched."""
+        return self._queue.qsize()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """
+        Queue a preprocessed image for batched inference.
+
+        Args:
+            image: Preprocessed image with shape (H, W, C) or (1, H, W, C)
+
+        Returns:
+            Future resolving to the prediction scores for this image
+
+        Raises:
+            RuntimeError: If the scheduler has been stopped
+        """
+        if image.ndim == 4:
+            image = image[0]
+
+        future = Future()
+        with self._state_lock:
+            if self._stopped:
+                raise RuntimeError('scheduler stopped')
+            self._queue.put((image, future))
+        return future
+
+    def predict(self, image: np.ndarray, timeout: Optional[float] = DEFAULT_PREDICT_TIMEOUT) -> np.ndarray:
+        """
+        Run batched inference for a single image and wait for its result.
+
+        Args:
+            image: Preprocessed image with shape (H, W, C) or (1, H, W, C)
+            timeout: Maximum time to wait for the result in seconds
+
+        Returns:
+            Prediction scores for this image
+
+        Raises:
+            RuntimeError: If the scheduler is (or gets) stopped before the image runs
+            concurrent.futures.TimeoutError: If no result arrives within the timeout
+        """
+        future = self.submit(image)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Drop the image if its batch has not started yet
+            future.cancel()
+            raise
+
+    def _collect_batch(self) -> List[Tuple[np.ndarray, Future]]:
+        """Collect up to max_batch_size items, waiting at most max_wait after the first."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        """Background loop that runs one inference call per collected batch."""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # Skip callers that gave up before their batch ran
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                images = np.stack([image for image, _ in batch])
+                predictions = self.predict_fn(images)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # Hand each caller its own row of the output
+            for i, (_, future) in enumerate(batch):
+                future.set_result(predictions[i])
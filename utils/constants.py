@@ -0,0 +1,6 @@
+# Image file extensions the training pipelines read. Kept free of heavy imports
+# (TensorFlow, OpenCV) so dataset scanning and serving can share it.
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# PIL format names of the files with those extensions
+IMAGE_FORMATS = ('JPEG', 'PNG', 'BMP')
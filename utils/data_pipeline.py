@@ -0,0 +1,212 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import tensorflow as tf
+
+# Formats tf.io.decode_image reads (flow_from_directory also lists ppm/tif files)
+from utils.constants import IMAGE_EXTENSIONS
+
+# Decoded images are cached in memory up to this size by default
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+def list_image_files(directory: str, classes: Optional[Sequence[str]] = None,
+                     split: Optional[Tuple[float, float]] = None) -> Tuple[List[str], np.ndarray, Dict[str, int]]:
+    """
+    List the images of a class-per-folder directory in ``flow_from_directory`` order.
+
+    Classes are the sorted subdirectory names (so class indices match the
+    Keras generators and existing models); within each class, files are
+    listed in sorted walk order.
+
+    Args:
+        directory: Directory with one subdirectory per class
+        classes: Optional explicit class list (defaults to the sorted subdirectories)
+        split: Optional (start, stop) fraction of each class's files to keep,
+            as used for ``validation_split`` subsets
+
+    Returns:
+        Tuple of (file paths, class indices, class name to index mapping)
+    """
+    if classes is None:
+        classes = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    class_indices = {class_name: index for index, class_name in enumerate(classes)}
+
+    paths, labels = [], []
+    for class_name in classes:
+        class_dir = os.path.join(directory, class_name)
+        class_files = [
+            os.path.join(root, fname)
+            for root, _, files in sorted(os.walk(class_dir), key=lambda x: x[0])
+            for fname in sorted(files)
+            if fname.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        if split:
+            class_files = class_files[int(split[0] * len(class_files)):int(split[1] * len(class_files))]
+        paths.extend(class_files)
+        labels.extend([class_indices[class_name]] * len(class_files))
+
+    return paths, np.array(labels, dtype=np.int32), class_indices
+
+def augmentation_layers(seed: Optional[int] = None) -> tf.keras.Sequential:
+    """
+    Random augmentation matching the training ``ImageDataGenerator`` settings.
+
+    Rotation (20 degrees), shifts and zoom (20%) and horizontal flips, with
+    nearest fill. Shear has no preprocessing-layer equivalent and is left out.
+
+    Args:
+        seed: Optional random seed
+
+    Returns:
+        Keras model applying the augmentation to a batch
+    """
+    from tensorflow.keras import layers
+
+    return tf.keras.Sequential([
+        layers.RandomFlip('horizontal', seed=seed),
+        layers.RandomRotation(20 / 360, fill_mode='nearest', seed=seed),
+        layers.RandomTranslation(0.2, 0.2, fill_mode='nearest', seed=seed),
+        layers.RandomZoom(0.2, fill_mode='nearest', seed=seed)
+    ])
+
+def create_image_dataset(directory: str, batch_size: int = 32, target_size: Tuple[int, int] = (224, 224),
+                         shuffle: bool = False, augment: bool = False,
+                         split: Optional[Tuple[float, float]] = None,
+                         cache: Union[bool, str] = 'auto', cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                         shuffle_buffer: int = 1000, seed: Optional[int] = None,
+                         files: Optional[Tuple[List[str], np.ndarray, Dict[str, int]]] = None) -> tf.data.Dataset:
+    """
+    Build a ``tf.data`` pipeline over a class-per-folder image directory.
+
+    Images are decoded and resized in parallel, optionally cached (as uint8
+    at the target size), shuffled, batched, augmented in parallel, rescaled
+    to [0, 1] and prefetched with autotuning. Labels are one-hot, in the
+    same class order as ``flow_from_directory``.
+
+    The returned dataset also carries the ``samples``, ``classes``,
+    ``class_indices``, ``num_classes`` and ``filepaths`` attributes of a Keras
+    ``DirectoryIterator``, so evaluation code reading them works with either.
+
+    Args:
+        directory: Directory with one subdirectory per class
+        batch_size: Batch size
+        target_size: Image size as (height, width)
+        shuffle: Reshuffle every epoch (training)
+        augment: Apply random augmentation (training)
+        split: Optional (start, stop) fraction of each class's files to use
+        cache: True to cache decoded images in memory, False to decode every
+            epoch, 'auto' to cache in memory when they fit in ``cache_max_bytes``,
+            or a file path to cache on disk
+        cache_max_bytes: Memory budget for ``cache='auto'``
+        shuffle_buffer: Shuffle buffer size once images are cached
+        seed: Optional random seed for shuffling and augmentation
+        files: Optional (paths, labels, class_indices) listing, e.g. from a
+            dataset manifest, used instead of listing ``directory`` (``split``
+            is then ignored)
+
+    Returns:
+        Dataset of (images, one-hot labels) batches
+    """
+    paths, labels, class_indices = files if files is not None else list_image_files(directory, split=split)
+    num_classes = len(class_indices)
+    height, width = target_size
+    print(f"Found {len(paths)} images belonging to {num_classes} classes (tf.data).")
+
+    if cache == 'auto':
+        cache = len(paths) * height * width * 3 <= cache_max_bytes
+
+    dataset = tf.data.Dataset.from_tensor_slices((tf.constant(paths, dtype=tf.string), labels))
+    if shuffle and not cache:
+        # Nothing is cached: shuffle the (cheap) file list before decoding
+        dataset = dataset.shuffle(max(1, len(paths)), seed=seed, reshuffle_each_iteration=True)
+
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, target_size)
+        return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), label
+
+    dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+
+    if cache:
+        dataset = dataset.cache(cache if isinstance(cache, str) else '')
+        if shuffle:
+            dataset = dataset.shuffle(min(max(1, len(paths)), shuffle_buffer), seed=seed,
+                                      reshuffle_each_iteration=True)
+
+    dataset = _finish_batches(dataset.batch(batch_size), num_classes, augment, seed)
+    return _with_iterator_attributes(dataset, paths, labels, class_indices)
+
+def create_array_dataset(images: np.ndarray, labels: np.ndarray, class_indices: Dict[str, int],
+                         paths: Sequence[str], rows: Optional[np.ndarray] = None, batch_size: int = 32,
+                         shuffle: bool = False, augment: bool = False,
+                         seed: Optional[int] = None) -> tf.data.Dataset:
+    """
+    Build a ``tf.data`` pipeline over pre-decoded uint8 images (e.g. a memory-mapped array).
+
+    Batches are gathered from the array by row index, so nothing is decoded
+    and a memory-mapped array is only paged in as it is read. Augmentation,
+    rescaling, labels and attributes are as in ``create_image_dataset``.
+
+    Args:
+        images: Array of shape (rows, height, width, 3), dtype uint8
+        labels: Class index of each sample
+        class_indices: Class name to index mapping
+        paths: Source path of each sample
+        rows: Row of ``images`` holding each sample (defaults to 0..N-1)
+        batch_size: Batch size
+        shuffle: Reshuffle every epoch (training)
+        augment: Apply random augmentation (training)
+        seed: Optional random seed for shuffling and augmentation
+
+    Returns:
+        Dataset of (images, one-hot labels) batches
+    """
+    labels = np.asarray(labels, dtype=np.int32)
+    rows = np.arange(len(labels)) if rows is None else np.asarray(rows, dtype=np.int64)
+    height, width = images.shape[1:3]
+    print(f"Found {len(labels)} images belonging to {len(class_indices)} classes (pre-decoded).")
+
+    dataset = tf.data.Dataset.from_tensor_slices((rows, labels))
+    if shuffle:
+        dataset = dataset.shuffle(max(1, len(labels)), seed=seed, reshuffle_each_iteration=True)
+
+    def gather(batch_rows):
+        # Sorted reads are sequential on disk; restore the requested order afterwards
+        order = np.argsort(batch_rows)
+        batch = np.empty((len(batch_rows), height, width, 3), dtype=np.uint8)
+        batch[order] = images[batch_rows[order]]
+        return batch
+
+    def load(batch_rows, batch_labels):
+        batch = tf.numpy_function(gather, [batch_rows], tf.uint8)
+        batch.set_shape((None, height, width, 3))
+        return batch, batch_labels
+
+    dataset = dataset.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = _finish_batches(dataset, len(class_indices), augment, seed)
+    return _with_iterator_attributes(dataset, list(paths), labels, class_indices)
+
+def _finish_batches(dataset: tf.data.Dataset, num_classes: int, augment: bool,
+                    seed: Optional[int]) -> tf.data.Dataset:
+    """Rescale (and optionally augment) uint8 batches, one-hot the labels and prefetch."""
+    augmentation = augmentation_layers(seed) if augment else None
+
+    def finish(images, label):
+        images = tf.cast(images, tf.float32) * (1.0 / 255.0)
+        if augmentation is not None:
+            images = augmentation(images, training=True)
+        return images, tf.one_hot(label, num_classes)
+
+    dataset = dataset.map(finish, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def _with_iterator_attributes(dataset: tf.data.Dataset, paths: List[str], labels: np.ndarray,
+                              class_indices: Dict[str, int]) -> tf.data.Dataset:
+    """Attach DirectoryIterator-compatible attributes to a dataset."""
+    dataset.samples = len(paths)
+    dataset.classes = labels
+    dataset.class_indices = class_indices
+    dataset.num_classes = len(class_indices)
+    dataset.filepaths = paths
+    return dataset
@@ -1,8 +1,13 @@
 import cv2
 import numpy as np
-from PIL import Image
 import os
-from typing import Tuple, Optional
+import threading
+import time
+from typing import Tuple, Optional, Sequence
+
+# Test-time augmentation variants supported by create_tta_batch
+TTA_VARIANTS = ('original', 'hflip', 'vflip', 'rot90', 'rot180', 'rot270', 'crop')
+DEFAULT_TTA_VARIANTS = ('original', 'hflip', 'vflip', 'crop')
 
 class ImageProcessor:
     """Image processing utilities for tomato disease detection."""
@@ -16,6 +21,10 @@ class ImageProcessor:
         """
         self.target_size = target_size
         
+        # Per-thread CLAHE object and scratch buffers for prepare_model_input
+        # (cv2.CLAHE keeps internal state and is not safe to share across threads)
+        self._local = threading.local()
+        
     def load_image(self, image_path: str) -> np.ndarray:
         """
         Load and preprocess an image for model input.
@@ -35,7 +44,28 @@ class ImageProcessor:
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         return image
-    
+
+    def load_image_from_bytes(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Decode an encoded image held in memory.
+
+        Args:
+            image_bytes: Raw bytes of an encoded image (JPEG, PNG, ...)
+
+        Returns:
+            Decoded RGB image as numpy array
+        """
+        # Wrap the buffer without copying and decode with OpenCV
+        buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image from bytes")
+
+        # Convert BGR to RGB
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        return image
+
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """
         Preprocess image for model input.
@@ -57,6 +87,124 @@ class ImageProcessor:
         
         return image
     
+    def prepare_model_input(self, image: np.ndarray, out: Optional[np.ndarray] = None,
+                            timings: Optional[dict] = None) -> np.ndarray:
+        """
+        Fused enhancement and preprocessing for model input.
+        
+        Equivalent to ``preprocess_image(enhance_image(image))`` but resizes
+        first, so the LAB/CLAHE step runs at model resolution instead of on
+        the full photo, and writes the normalized result straight into a
+        float32 buffer.
+        
+        Args:
+            image: Input RGB image as uint8 numpy array
+            out: Optional preallocated buffer with shape (height, width, 3) or
+                (1, height, width, 3) to write the result into. A float32 buffer
+                receives values in [0, 1]; a uint8 buffer receives the enhanced
+                pixels unscaled, for full-integer models
+            timings: Optional dictionary receiving the seconds spent on
+                ``preprocess`` (resize and normalization) and ``enhance`` (CLAHE)
+            
+        Returns:
+            Preprocessed image; ``out`` if given, else a new float32 (1, height, width, 3) array
+        """
+        width, height = self.target_size
+        if out is None:
+            out = np.empty((1, height, width, 3), dtype=np.float32)
+        elif out.dtype not in (np.float32, np.uint8) or out.size != height * width * 3 or not out.flags['C_CONTIGUOUS']:
+            raise ValueError(f"out must be a contiguous float32 or uint8 buffer of {height}x{width}x3 values")
+        
+        buffers = self._thread_buffers()
+        start = time.perf_counter()
+        
+        # Downscale first; INTER_AREA avoids aliasing when shrinking large photos
+        interpolation = cv2.INTER_AREA if image.shape[0] > height or image.shape[1] > width else cv2.INTER_LINEAR
+        resized = cv2.resize(image, self.target_size, dst=buffers['resized'], interpolation=interpolation)
+        resized_at = time.perf_counter()
+        
+        # CLAHE on the lightness channel at model resolution
+        lab = cv2.cvtColor(resized, cv2.COLOR_RGB2LAB, dst=buffers['lab'])
+        lightness = buffers['lightness']
+        np.copyto(lightness, lab[:, :, 0])
+        buffers['clahe'].apply(lightness, dst=lightness)
+        lab[:, :, 0] = lightness
+        enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB, dst=buffers['resized'])
+        enhanced_at = time.perf_counter()
+        
+        # Normalize pixel values to [0, 1] directly into the output buffer
+        if out.dtype == np.uint8:
+            np.copyto(out.reshape(height, width, 3), enhanced)
+        else:
+            np.multiply(enhanced, np.float32(1.0 / 255.0), out=out.reshape(height, width, 3))
+        
+        if timings is not None:
+            timings['preprocess'] = (resized_at - start) + (time.perf_counter() - enhanced_at)
+            timings['enhance'] = enhanced_at - resized_at
+        
+        return out
+    
+    def create_tta_batch(self, image: np.ndarray, variants: Sequence[str] = DEFAULT_TTA_VARIANTS,
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Stack test-time augmentation variants of a preprocessed image into one batch.
+        
+        The variants are cheap views of the model-resolution input (flips,
+        rotations) or a central crop resized back, so the whole batch can be
+        scored with a single inference call.
+        
+        Args:
+            image: Preprocessed image from ``prepare_model_input`` with shape
+                (height, width, 3) or (1, height, width, 3)
+            variants: Variant names from ``TTA_VARIANTS``
+            out: Optional preallocated buffer of shape (len(variants), height, width, 3)
+            
+        Returns:
+            Batch of variants with the dtype of ``image``
+        """
+        image = image.reshape(image.shape[-3:])
+        height, width = image.shape[:2]
+        
+        unknown = [variant for variant in variants if variant not in TTA_VARIANTS]
+        if unknown:
+            raise ValueError(f"Unknown TTA variants: {', '.join(unknown)}")
+        if height != width and any(variant in ('rot90', 'rot270') for variant in variants):
+            raise ValueError("90 degree rotations need a square model input")
+        
+        if out is None:
+            out = np.empty((len(variants), height, width, 3), dtype=image.dtype)
+        
+        for row, variant in zip(out, variants):
+            if variant == 'original':
+                np.copyto(row, image)
+            elif variant == 'hflip':
+                np.copyto(row, image[:, ::-1])
+            elif variant == 'vflip':
+                np.copyto(row, image[::-1])
+            elif variant.startswith('rot'):
+                np.copyto(row, np.rot90(image, int(variant[3:]) // 90))
+            else:
+                # Central 87.5% crop, scaled back to model resolution
+                top, left = height // 16, width // 16
+                crop = image[top:height - top, left:width - left]
+                cv2.resize(crop, (width, height), dst=row, interpolation=cv2.INTER_LINEAR)
+        
+        return out
+    
+    def _thread_buffers(self) -> dict:
+        """Get the calling thread's CLAHE object and scratch buffers."""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            width, height = self.target_size
+            buffers = {
+                'clahe': cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)),
+                'resized': np.empty((height, width, 3), dtype=np.uint8),
+                'lab': np.empty((height, width, 3), dtype=np.uint8),
+                'lightness': np.empty((height, width), dtype=np.uint8)
+            }
+            self._local.buffers = buffers
+        return buffers
+    
     def enhance_image(self, image: np.ndarray) -> np.ndarray:
         """
         Apply image enhancement techniques.
@@ -145,6 +293,7 @@ class ImageProcessor:
             image = (image * 255).astype(np.uint8)
         
         # Save using PIL for better format support
+        from PIL import Image
         pil_image = Image.fromarray(image)
         pil_image.save(output_path)
     
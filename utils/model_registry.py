@@ -0,0 +1,573 @@
+import os
+import re
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.model_utils import ModelManager, INFERENCE_BACKENDS, convert_input, create_backend
+from utils.batching import BatchScheduler, DEFAULT_PREDICT_TIMEOUT
+from utils.postprocessing import PredictionPostprocessor
+from utils.prediction_cache import PredictionCache
+
+ACTIVE_POINTER_FILE = "active_model.json"
+
+# Fast-stage confidence needed to skip the full model when no calibrated threshold is known
+DEFAULT_CASCADE_THRESHOLD = 0.9
+
+class ModelVersion:
+    """A loaded, warmed-up model version with its own inference backend and scheduler."""
+
+    def __init__(self, model_manager: ModelManager, model_name: str, backend: str = "tflite",
+                 backend_options: Optional[Dict] = None,
+                 batch_max_size: int = 8, batch_max_wait_ms: float = 5.0):
+        """
+        Load a model version.
+
+        Args:
+            model_manager: Model manager pointing at the model directory
+            model_name: Name of the model to load
+            backend: Inference backend name (see ``utils.model_utils.INFERENCE_BACKENDS``)
+            backend_options: Backend-specific options (pool size, threads, ...)
+            batch_max_size: Maximum images per batched invocation
+            batch_max_wait_ms: Maximum time a request waits for its batch to fill
+        """
+        self.model_manager = model_manager
+        self.model_name = model_name
+        self.artifact_path = INFERENCE_BACKENDS[backend].artifact_path(model_manager.model_path, model_name)
+        self.artifact_stat = _artifact_stat(self.artifact_path)
+
+        self.backend = create_backend(backend, model_manager, model_name, **(backend_options or {}))
+        self.metadata = self.backend.metadata
+        self.version = self.metadata.get('version') or _version_from_name(model_name)
+        self.input_dtype = self.backend.input_dtype
+        self.postprocessor = PredictionPostprocessor.from_metadata(self.metadata, model_manager.class_names)
+        self.identity = PredictionCache.model_identity_from_metadata(self.metadata, self.artifact_path)
+
+        # One batch per unit of backend concurrency (e.g. pooled interpreter) at a time
+        self.scheduler = BatchScheduler(
+            self.predict_batch,
+            max_batch_size=batch_max_size,
+            max_wait_ms=batch_max_wait_ms,
+            num_workers=self.backend.concurrency
+        )
+
+        # Running average latency of single-image inference calls
+        self.single_inference_ms: Optional[float] = None
+        # Called with (batch size, seconds) after every inference call once serving
+        self.on_inference: Optional[Callable[[int, float], None]] = None
+        # Longest a request waits for a batched prediction
+        self.request_timeout = DEFAULT_PREDICT_TIMEOUT
+
+        # Optional cascade: a small model answers first when it is confident enough
+        self.fast_stage: Optional['ModelVersion'] = None
+        self.cascade_threshold: Optional[float] = None
+
+        self._in_flight = 0
+        self._running = 0
+        self._closing = False
+        self._idle = threading.Condition()
+
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """
+        Run one inference call on the backend.
+
+        Args:
+            images: Preprocessed images with shape (N, height, width, channels)
+
+        Returns:
+            Prediction scores with shape (N, num_classes)
+        """
+        with self._idle:
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            scores = self.backend.predict_batch(images)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._idle:
+                self._running -= 1
+
+        if len(images) == 1:
+            previous = self.single_inference_ms
+            elapsed_ms = elapsed * 1000.0
+            self.single_inference_ms = elapsed_ms if previous is None else 0.9 * previous + 0.1 * elapsed_ms
+
+        if self.on_inference is not None:
+            self.on_inference(len(images), elapsed)
+
+        return scores
+
+    def attach_fast_stage(self, fast_stage: 'ModelVersion', threshold: Optional[float] = None) -> None:
+        """
+        Put a small model in front of this one.
+
+        Images whose top-1 fast-stage confidence reaches the threshold are
+        answered by the small model; only the rest reach this model.
+
+        Args:
+            fast_stage: Loaded and warmed-up small model version
+            threshold: Confidence threshold (defaults to the ``cascade_threshold``
+                calibrated into the small model's metadata by the evaluator)
+        """
+        if threshold is None:
+            threshold = fast_stage.metadata.get('cascade_threshold', DEFAULT_CASCADE_THRESHOLD)
+        self.fast_stage = fast_stage
+        self.cascade_threshold = float(threshold)
+        # Cached results depend on both models and the threshold
+        self.identity = f"{self.identity}+{fast_stage.identity}@{self.cascade_threshold}"
+
+    def predict_cascade(self, image: np.ndarray) -> Tuple[np.ndarray, str]:
+        """
+        Score one image through the batching schedulers, fast stage first.
+
+        Args:
+            image: Preprocessed image with shape (1, height, width, channels)
+
+        Returns:
+            Tuple of (prediction scores, answering stage: 'fast' or 'full')
+        """
+        fast_stage = self.fast_stage
+        if fast_stage is not None:
+            scores = fast_stage.scheduler.predict(convert_input(image, fast_stage.input_dtype),
+                                                  timeout=self.request_timeout)
+            if float(np.max(scores)) >= self.cascade_threshold:
+                return scores, 'fast'
+        return self.scheduler.predict(image, timeout=self.request_timeout), 'full'
+
+    def predict_batch_cascade(self, images: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """
+        Score a batch, sending only the images the fast stage is unsure about to this model.
+
+        Args:
+            images: Preprocessed images with shape (N, height, width, channels)
+
+        Returns:
+            Tuple of (prediction scores with shape (N, num_classes), answering stage per image)
+        """
+        fast_stage = self.fast_stage
+        if fast_stage is None:
+            return self.predict_batch(images), ['full'] * len(images)
+
+        scores = fast_stage.predict_batch(convert_input(images, fast_stage.input_dtype))
+        escalate = np.flatnonzero(scores.max(axis=1) < self.cascade_threshold)
+        stages = ['fast'] * len(images)
+        if len(escalate):
+            scores[escalate] = self.predict_batch(images[escalate])
+            for index in escalate:
+                stages[index] = 'full'
+        return scores, stages
+
+    def predict_averaged_cascade(self, images: np.ndarray) -> Tuple[np.ndarray, str]:
+        """
+        Score variants of one image (e.g. test-time augmentations) and average them, fast stage first.
+
+        The fast stage answers when its averaged top-1 confidence reaches the
+        threshold; otherwise every variant is scored by this model.
+
+        Args:
+            images: Preprocessed variants with shape (N, height, width, channels)
+
+        Returns:
+            Tuple of (averaged prediction scores, answering stage: 'fast' or 'full')
+        """
+        fast_stage = self.fast_stage
+        if fast_stage is not None:
+            scores = fast_stage.predict_batch(convert_input(images, fast_stage.input_dtype)).mean(axis=0)
+            if float(np.max(scores)) >= self.cascade_threshold:
+                return scores, 'fast'
+        return self.predict_batch(images).mean(axis=0), 'full'
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests currently pinned to this version."""
+        return self._in_flight
+
+    @property
+    def running_inferences(self) -> int:
+        """Number of backend calls currently executing."""
+        return self._running
+
+    def warm_up(self) -> None:
+        """Start the scheduler and run a dummy inference per unit of backend concurrency."""
+        self.scheduler.start()
+        dummy = np.zeros((1, *self.backend.input_shape), dtype=self.input_dtype)
+        # Pooled interpreters are handed out in FIFO order, so this touches each one
+        for _ in range(self.backend.concurrency):
+            self.predict_batch(dummy)
+
+        # Seed the latency average with a call that excludes first-run setup
+        self.single_inference_ms = None
+        self.predict_batch(dummy)
+
+    def _enter(self) -> bool:
+        """Pin a request to this version; refused once the version is closing."""
+        with self._idle:
+            if self._closing:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _exit(self) -> None:
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def close(self, timeout: float = 60.0) -> None:
+        """
+        Refuse new requests, wait for in-flight ones to finish, then stop the scheduler.
+
+        The schedulers are never stopped under a pinned request: if requests
+        are still running after ``timeout``, a warning is printed and close
+        keeps waiting (each request is bounded by ``request_timeout``).
+
+        Args:
+            timeout: Time to wait for in-flight requests before warning
+        """
+        with self._idle:
+            self._closing = True
+            if not self._idle.wait_for(lambda: self._in_flight == 0, timeout):
+                print(f"Model version {self.model_name}: {self._in_flight} requests still in flight "
+                      f"after {timeout:.0f}s, waiting for them before shutting down")
+                self._idle.wait_for(lambda: self._in_flight == 0)
+        self.scheduler.stop()
+        if self.fast_stage is not None:
+            self.fast_stage.scheduler.stop()
+
+    def describe(self) -> Dict:
+        """Summary of this version for status endpoints."""
+        return {
+            'model_name': self.model_name,
+            'version': self.version,
+            'identity': self.identity,
+            'backend': self.backend.name,
+            'input_dtype': str(np.dtype(self.input_dtype)),
+            'cascade': {
+                'model_name': self.fast_stage.model_name,
+                'threshold': self.cascade_threshold
+            } if self.fast_stage is not None else None
+        }
+
+class ModelRegistry:
+    """Versioned model registry with background loading and atomic hot-swap."""
+
+    def __init__(self, model_manager: ModelManager, default_model: str = "tomato_disease_model",
+                 backend: str = "tflite", backend_options: Optional[Dict] = None,
+                 batch_max_size: int = 8, batch_max_wait_ms: float = 5.0,
+                 on_activate: Optional[Callable[[ModelVersion], None]] = None,
+                 on_inference: Optional[Callable[[int, float], None]] = None,
+                 cascade_model: Optional[str] = None, cascade_threshold: Optional[float] = None):
+        """
+        Initialize the model registry.
+
+        Args:
+            model_manager: Model manager pointing at the model directory
+            default_model: Model loaded when no active pointer file exists
+            backend: Inference backend used for every version
+            backend_options: Backend-specific options (pool size, threads, ...)
+            batch_max_size: Maximum images per batched invocation
+            batch_max_wait_ms: Maximum time a request waits for its batch to fill
+            on_activate: Callback invoked after a new version becomes active
+            on_inference: Callback invoked with (batch size, seconds) after each inference call
+            cascade_model: Small model loaded alongside every version as its fast stage
+            cascade_threshold: Fast-stage confidence threshold (defaults to the calibrated
+                value in the small model's metadata)
+        """
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+
+        self.model_manager = model_manager
+        self.model_dir = model_manager.model_path
+        self.default_model = default_model
+        self.backend = backend
+        self.backend_class = INFERENCE_BACKENDS[backend]
+        self.backend_options = backend_options or {}
+        self.batch_options = {
+            'batch_max_size': batch_max_size,
+            'batch_max_wait_ms': batch_max_wait_ms
+        }
+        self.on_activate = on_activate
+        self.on_inference = on_inference
+        self.cascade_model = cascade_model
+        self.cascade_threshold = cascade_threshold
+
+        self._active: Optional[ModelVersion] = None
+        self._preloaded = None
+        self._swap_lock = threading.Lock()
+        # Guards reading the active version together with pinning it
+        self._active_lock = threading.Lock()
+        self._loading: Optional[str] = None
+        self._last_error: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def active(self) -> Optional[ModelVersion]:
+        """Currently active model version (None if nothing is loaded)."""
+        return self._active
+
+    @contextmanager
+    def checkout(self):
+        """
+        Pin the active version for the duration of a request.
+
+        A swap that happens meanwhile does not affect the caller; the old
+        version is only shut down once every pinned request has finished.
+        The version is read and pinned under the same lock as the swap, so a
+        request never pins a version that is already being retired.
+        """
+        with self._active_lock:
+            version = self._active
+            if version is None:
+                raise RuntimeError("Model not loaded")
+            if not version._enter():
+                raise RuntimeError(f"Model version {version.model_name} is shutting down")
+        try:
+            yield version
+        finally:
+            version._exit()
+
+    def list_versions(self) -> List[Dict]:
+        """
+        List the models in the model directory that the configured backend can serve.
+
+        Returns:
+            List of dictionaries describing each model and its metadata
+        """
+        versions = []
+        active_name = self._active.model_name if self._active is not None else None
+        for model_name in self.backend_class.model_names(self.model_dir):
+            metadata = self._read_metadata(model_name)
+            stat = os.stat(self.backend_class.artifact_path(self.model_dir, model_name))
+            versions.append({
+                'model_name': model_name,
+                'version': metadata.get('version') or _version_from_name(model_name),
+                'size_bytes': stat.st_size,
+                'modified': stat.st_mtime,
+                'has_metadata': bool(metadata),
+                'active': model_name == active_name
+            })
+        return versions
+
+    def requested_model(self) -> str:
+        """Model named by the active pointer file, or the default model."""
+        pointer = os.path.join(self.model_dir, ACTIVE_POINTER_FILE)
+        try:
+            with open(pointer, 'r') as f:
+                return json.load(f).get('model_name') or self.default_model
+        except (OSError, ValueError):
+            return self.default_model
+
+    def preload(self, model_name: Optional[str] = None) -> bool:
+        """
+        Read a model's flatbuffer into memory without creating any interpreters.
+
+        Meant for a pre-fork server master: workers forked afterwards build
+        their interpreters on this buffer, whose pages stay shared between
+        them (copy-on-write) instead of each worker loading a private copy.
+
+        Args:
+            model_name: Artifact to preload (defaults to the pointer file or default model)
+
+        Returns:
+            True if the model was read, False if the artifact is missing
+            or the backend does not load from a flatbuffer
+        """
+        if self.backend != 'tflite':
+            return False
+
+        model_name = model_name or self.requested_model()
+        tflite_path = os.path.join(self.model_dir, f"{model_name}.tflite")
+        try:
+            with open(tflite_path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            print(f"Error preloading model {model_name}: {str(e)}")
+            return False
+
+        self._preloaded = (model_name, _artifact_stat(tflite_path), content)
+        print(f"Preloaded model {model_name} ({len(content) / (1024 * 1024):.1f} MB)")
+        return True
+
+    def _preloaded_content(self, model_name: str) -> Optional[bytes]:
+        """Preloaded flatbuffer for a model, if it is still current on disk."""
+        if self._preloaded is None:
+            return None
+        name, stat, content = self._preloaded
+        tflite_path = os.path.join(self.model_dir, f"{model_name}.tflite")
+        if name != model_name or stat != _artifact_stat(tflite_path):
+            return None
+        return content
+
+    def activate(self, model_name: Optional[str] = None, background: bool = False,
+                 persist: bool = False) -> bool:
+        """
+        Load, warm up and atomically activate a model version.
+
+        Args:
+            model_name: Artifact to activate (defaults to the pointer file or default model)
+            background: Load on a background thread and return immediately
+            persist: Write the choice to the active pointer file so other
+                workers watching the directory follow it
+
+        Returns:
+            True if the version was activated (or loading started in the background)
+        """
+        model_name = model_name or self.requested_model()
+
+        if persist:
+            self._write_pointer(model_name)
+
+        if background:
+            thread = threading.Thread(target=self._load_and_swap, args=(model_name,),
+                                      name=f'model-load-{model_name}', daemon=True)
+            thread.start()
+            return True
+
+        return self._load_and_swap(model_name)
+
+    def _load_and_swap(self, model_name: str) -> bool:
+        """Load a version off the request path, then swap it in."""
+        with self._swap_lock:
+            self._loading = model_name
+            try:
+                backend_options = dict(self.backend_options)
+                model_content = self._preloaded_content(model_name)
+                if model_content is not None:
+                    backend_options['model_content'] = model_content
+                version = ModelVersion(self.model_manager, model_name, self.backend,
+                                       backend_options, **self.batch_options)
+                version.warm_up()
+                version.on_inference = self.on_inference
+                if self.cascade_model and self.cascade_model != model_name:
+                    self._attach_fast_stage(version)
+            except Exception as e:
+                self._last_error = f"{model_name}: {str(e)}"
+                print(f"Error loading model version {model_name}: {str(e)}")
+                return False
+            finally:
+                self._loading = None
+
+            # Single reference assignment: new requests see the new version at once
+            with self._active_lock:
+                previous, self._active = self._active, version
+            if self._preloaded is not None and self._preloaded[0] != model_name:
+                self._preloaded = None
+            self._last_error = None
+            print(f"Activated model version: {model_name}")
+
+            if self.on_activate is not None:
+                self.on_activate(version)
+
+        # In-flight requests finish on the old version before it is shut down
+        if previous is not None:
+            threading.Thread(target=previous.close, name=f'model-retire-{previous.model_name}',
+                             daemon=True).start()
+
+        return True
+
+    def _attach_fast_stage(self, version: ModelVersion) -> None:
+        """Load the cascade's small model in front of a version (served without it on failure)."""
+        try:
+            fast_stage = ModelVersion(self.model_manager, self.cascade_model, self.backend,
+                                      self.backend_options, **self.batch_options)
+            fast_stage.warm_up()
+        except Exception as e:
+            print(f"Error loading cascade model {self.cascade_model}: {str(e)}; serving without cascade")
+            return
+
+        fast_stage.on_inference = self.on_inference
+        version.attach_fast_stage(fast_stage, self.cascade_threshold)
+
+    def start_watching(self, interval: float = 10.0) -> None:
+        """
+        Poll the model directory and hot-swap when the pointer file or active artifact changes.
+
+        Args:
+            interval: Seconds between checks
+        """
+        if self._watcher is not None:
+            return
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                         name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop the directory watcher."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        """Watcher loop."""
+        last_attempt = None
+        while not self._stop_watching.wait(interval):
+            try:
+                requested = self.requested_model()
+                artifact = self.backend_class.artifact_path(self.model_dir, requested)
+                state = (requested, _artifact_stat(artifact))
+
+                # Up to date, missing, or already tried (and failed) in this exact state
+                active = self._active
+                if active is not None and (active.model_name, active.artifact_stat) == state:
+                    continue
+                if state[1] is None or state == last_attempt:
+                    continue
+
+                # New pointer target, or the artifact was overwritten in place (retrained)
+                last_attempt = state
+                self._load_and_swap(requested)
+            except Exception as e:
+                print(f"Model watcher error: {str(e)}")
+
+    def status(self) -> Dict:
+        """
+        Report the registry state.
+
+        Returns:
+            Dictionary with the active version, any version being loaded and the last error
+        """
+        active = self._active
+        return {
+            'active': active.describe() if active is not None else None,
+            'loading': self._loading,
+            'requested': self.requested_model(),
+            'last_error': self._last_error,
+            'watching': self._watcher is not None
+        }
+
+    def _read_metadata(self, model_name: str) -> Dict:
+        metadata_file = os.path.join(self.model_dir, f"{model_name}_metadata.json")
+        try:
+            with open(metadata_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_pointer(self, model_name: str) -> None:
+        """Atomically replace the active pointer file."""
+        pointer = os.path.join(self.model_dir, ACTIVE_POINTER_FILE)
+        temp = f"{pointer}.{os.getpid()}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({'model_name': model_name, 'updated': time.time()}, f, indent=2)
+        os.replace(temp, pointer)
+
+def _version_from_name(model_name: str) -> Optional[str]:
+    """Extract the version from names like ``tomato_disease_model_v3``."""
+    match = re.search(r'_v(\d+)$', model_name)
+    return match.group(1) if match else None
+
+def _artifact_stat(path: str):
+    """Size and modification time of a model artifact, or None if missing."""
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
@@ -1,12 +1,22 @@
-import tensorflow as tf
+from __future__ import annotations
+
 import numpy as np
 import os
+import sys
 import json
-from typing import Dict, List, Tuple, Optional
-import tensorflow_hub as hub
-from tensorflow.keras import layers, models, optimizers
-from tensorflow.keras.applications import EfficientNetB0
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
+
+from utils.runtime import get_interpreter_class
+
+# TensorFlow and Keras are only needed for training and conversion, so they are
+# imported inside the methods that use them; serving only loads the interpreter.
+if TYPE_CHECKING:
+    import tensorflow as tf
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
 
 class ModelManager:
     """Utility class for managing the tomato disease detection model."""
@@ -36,16 +46,23 @@ class ModelManager:
         # Create model directory if it doesn't exist
         os.makedirs(model_path, exist_ok=True)
     
-    def create_model(self, input_shape: Tuple[int, int, int] = (224, 224, 3)) -> tf.keras.Model:
+    def create_model(self, input_shape: Tuple[int, int, int] = (224, 224, 3),
+                     dropout_rates: Tuple[float, float, float] = (0.5, 0.3, 0.2),
+                     learning_rate: float = 0.001) -> tf.keras.Model:
         """
         Create the CNN model with transfer learning.
         
         Args:
             input_shape: Input image shape (height, width, channels)
+            dropout_rates: Dropout before each of the three Dense layers of the head
+            learning_rate: Adam learning rate
             
         Returns:
             Compiled Keras model
         """
+        from tensorflow.keras import layers, models, optimizers
+        from tensorflow.keras.applications import EfficientNetB0
+        
         # Use EfficientNetB0 as base model
         base_model = EfficientNetB0(
             weights='imagenet',
@@ -60,17 +77,157 @@ class ModelManager:
         model = models.Sequential([
             base_model,
             layers.GlobalAveragePooling2D(),
-            layers.Dropout(0.5),
+            *self._head_layers(dropout_rates)
+        ])
+        
+        # Compile the model
+        model.compile(
+            optimizer=optimizers.Adam(learning_rate=learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        return model
+    
+    def _head_layers(self, dropout_rates: Tuple[float, float, float] = (0.5, 0.3, 0.2)) -> List:
+        """Classification head on top of the pooled backbone features."""
+        from tensorflow.keras import layers
+        
+        return [
+            layers.Dropout(dropout_rates[0]),
             layers.Dense(512, activation='relu'),
-            layers.Dropout(0.3),
+            layers.Dropout(dropout_rates[1]),
             layers.Dense(256, activation='relu'),
+            layers.Dropout(dropout_rates[2]),
+            layers.Dense(self.num_classes, activation='softmax')
+        ]
+    
+    def create_feature_extractor(self, model: tf.keras.Model) -> tf.keras.Model:
+        """
+        Frozen backbone and pooling of a ``create_model`` model, producing pooled feature vectors.
+        
+        Args:
+            model: Model built by ``create_model``
+            
+        Returns:
+            Keras model mapping images to pooled features
+        """
+        import tensorflow as tf
+        
+        return tf.keras.Sequential(model.layers[:2])
+    
+    def create_head_model(self, feature_dim: int,
+                          dropout_rates: Tuple[float, float, float] = (0.5, 0.3, 0.2),
+                          learning_rate: float = 0.001) -> tf.keras.Model:
+        """
+        Create the classification head of ``create_model`` as a model on pooled features.
+        
+        Args:
+            feature_dim: Size of the pooled backbone feature vector
+            dropout_rates: Dropout before each of the three Dense layers
+            learning_rate: Adam learning rate
+            
+        Returns:
+            Compiled Keras model
+        """
+        from tensorflow.keras import layers, models, optimizers
+        
+        head = models.Sequential([layers.Input(shape=(feature_dim,)), *self._head_layers(dropout_rates)])
+        head.compile(
+            optimizer=optimizers.Adam(learning_rate=learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        return head
+    
+    def attach_head(self, model: tf.keras.Model, head: tf.keras.Model) -> tf.keras.Model:
+        """
+        Copy the weights of a head trained on features into a ``create_model`` model.
+        
+        Args:
+            model: Model built by ``create_model`` (backbone and pooling are kept)
+            head: Trained model built by ``create_head_model``
+            
+        Returns:
+            The model, now carrying the trained head
+        """
+        for target, source in zip(model.layers[2:], head.layers):
+            target.set_weights(source.get_weights())
+        return model
+    
+    def create_small_model(self, input_shape: Tuple[int, int, int] = (224, 224, 3)) -> tf.keras.Model:
+        """
+        Create a small CNN, e.g. the fast first stage of a model cascade.
+        
+        Args:
+            input_shape: Input image shape (height, width, channels)
+            
+        Returns:
+            Compiled Keras model
+        """
+        from tensorflow.keras import layers, models
+        
+        model = models.Sequential([
+            layers.Conv2D(32, (3, 3), activation='relu', input_shape=input_shape),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.Flatten(),
+            layers.Dense(64, activation='relu'),
+            layers.Dropout(0.5),
+            layers.Dense(self.num_classes, activation='softmax')
+        ])
+        
+        model.compile(
+            optimizer='adam',
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        return model
+    
+    def create_student_model(self, input_shape: Tuple[int, int, int] = (224, 224, 3),
+                             architecture: str = "mobilenet", alpha: float = 0.35) -> tf.keras.Model:
+        """
+        Create a compact student model for knowledge distillation.
+        
+        Args:
+            input_shape: Input image shape (height, width, channels)
+            architecture: "mobilenet" (narrow MobileNetV2 with an ImageNet-initialized
+                backbone) or "small" (the small CNN from ``create_small_model``)
+            alpha: MobileNetV2 width multiplier (0.35, 0.5, 0.75 or 1.0)
+            
+        Returns:
+            Compiled Keras model taking [0, 1] images and returning class probabilities
+        """
+        from tensorflow.keras import layers, models
+        from tensorflow.keras.applications import MobileNetV2
+        
+        if architecture == "small":
+            return self.create_small_model(input_shape)
+        if architecture != "mobilenet":
+            raise ValueError(f"Unknown student architecture: {architecture}")
+        
+        backbone = MobileNetV2(
+            weights='imagenet',
+            include_top=False,
+            input_shape=input_shape,
+            alpha=alpha
+        )
+        
+        # MobileNetV2 expects inputs in [-1, 1]; the whole network is trained
+        model = models.Sequential([
+            layers.Input(shape=input_shape),
+            layers.Rescaling(2.0, offset=-1.0),
+            backbone,
+            layers.GlobalAveragePooling2D(),
             layers.Dropout(0.2),
             layers.Dense(self.num_classes, activation='softmax')
         ])
         
-        # Compile the model
         model.compile(
-            optimizer=optimizers.Adam(learning_rate=0.001),
+            optimizer='adam',
             loss='categorical_crossentropy',
             metrics=['accuracy']
         )
@@ -88,6 +245,8 @@ class ModelManager:
         Returns:
             Tuple of (train_generator, validation_generator)
         """
+        import tensorflow as tf
+        
         train_dir = os.path.join(data_dir, 'train')
         val_dir = os.path.join(data_dir, 'val')
         if os.path.exists(val_dir) and any(os.path.isdir(os.path.join(val_dir, d)) for d in os.listdir(val_dir)):
@@ -152,6 +311,52 @@ class ModelManager:
             )
         return train_generator, validation_generator
     
+    def create_datasets(self, data_dir: str, batch_size: int = 32,
+                        manifest=None) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
+        """
+        Create parallel ``tf.data`` pipelines for training and validation.
+        
+        Drop-in alternative to ``create_data_generators``: same directory
+        layout, validation split and class order, but decoding and
+        augmentation run in parallel, decoded images are cached when they
+        fit in memory and batches are prefetched.
+        
+        Args:
+            data_dir: Directory containing the dataset
+            batch_size: Batch size for training
+            manifest: Optional ``DatasetManifest`` of ``data_dir`` to read the
+                file listing from instead of walking the folders
+            
+        Returns:
+            Tuple of (train_dataset, validation_dataset)
+        """
+        from utils.data_pipeline import create_image_dataset, list_image_files
+        
+        def image_files(split, fraction=None):
+            if manifest is not None:
+                return manifest.image_files(split, fraction)
+            return list_image_files(os.path.join(data_dir, split), split=fraction)
+        
+        train_dir = os.path.join(data_dir, 'train')
+        val_dir = os.path.join(data_dir, 'val')
+        if manifest is not None:
+            has_val = bool(manifest.classes('val'))
+        else:
+            has_val = os.path.exists(val_dir) and any(os.path.isdir(os.path.join(val_dir, d)) for d in os.listdir(val_dir))
+        if has_val:
+            print("[INFO] Using separate 'train' and 'val' directories for tf.data pipelines.")
+            train_dataset = create_image_dataset(train_dir, batch_size, shuffle=True, augment=True,
+                                                 files=image_files('train'))
+            validation_dataset = create_image_dataset(val_dir, batch_size, files=image_files('val'))
+        else:
+            print("[INFO] Using validation_split on 'train' directory for tf.data pipelines.")
+            validation_split = 0.2
+            train_dataset = create_image_dataset(train_dir, batch_size, shuffle=True, augment=True,
+                                                 files=image_files('train', (validation_split, 1.0)))
+            validation_dataset = create_image_dataset(train_dir, batch_size,
+                                                      files=image_files('train', (0.0, validation_split)))
+        return train_dataset, validation_dataset
+    
     def save_model(self, model: tf.keras.Model, model_name: str = "tomato_disease_model") -> str:
         """
         Save the trained model.
@@ -180,6 +385,49 @@ class ModelManager:
         
         return model_file
     
+    def export_saved_model(self, model: tf.keras.Model, model_name: str = "tomato_disease_model") -> str:
+        """
+        Export the model as a SavedModel with a fixed-signature serving function.
+        
+        Args:
+            model: Trained Keras model
+            model_name: Name of the model
+            
+        Returns:
+            Path to the SavedModel directory
+        """
+        import tensorflow as tf
+        
+        export_dir = os.path.join(self.model_path, f"{model_name}_savedmodel")
+        
+        # Serve through a single graph with a fixed input signature
+        module = tf.Module()
+        module.model = model
+        module.serve = tf.function(
+            lambda images: {'predictions': model(images, training=False)},
+            input_signature=[tf.TensorSpec([None, *model.input_shape[1:]], tf.float32, name='images')]
+        )
+        tf.saved_model.save(module, export_dir, signatures={'serving_default': module.serve})
+        
+        print(f"SavedModel exported to: {export_dir}")
+        return export_dir
+    
+    def load_metadata(self, model_name: str = "tomato_disease_model") -> Dict:
+        """
+        Load the metadata saved next to a model.
+        
+        Args:
+            model_name: Name of the model
+            
+        Returns:
+            Metadata dictionary (empty if there is no metadata file)
+        """
+        metadata_file = os.path.join(self.model_path, f"{model_name}_metadata.json")
+        if not os.path.exists(metadata_file):
+            return {}
+        with open(metadata_file, 'r') as f:
+            return json.load(f)
+    
     def load_model(self, model_name: str = "tomato_disease_model") -> Tuple[tf.keras.Model, Dict]:
         """
         Load a trained model.
@@ -190,6 +438,8 @@ class ModelManager:
         Returns:
             Tuple of (loaded_model, metadata)
         """
+        import tensorflow as tf
+        
         model_file = os.path.join(self.model_path, f"{model_name}.h5")
         metadata_file = os.path.join(self.model_path, f"{model_name}_metadata.json")
         
@@ -207,20 +457,65 @@ class ModelManager:
         
         return model, metadata
     
-    def convert_to_tflite(self, model: tf.keras.Model, model_name: str = "tomato_disease_model") -> str:
+    def convert_to_tflite(self, model: tf.keras.Model, model_name: str = "tomato_disease_model",
+                          quantization: str = "dynamic", representative_data_dir: Optional[str] = None,
+                          num_calibration_samples: int = 200, evaluation_data_dir: Optional[str] = None,
+                          max_evaluation_samples: Optional[int] = None) -> str:
         """
         Convert the model to TensorFlow Lite format for optimized inference.
         
         Args:
             model: Keras model to convert
             model_name: Name for the saved model
+            quantization: "dynamic" for dynamic-range quantization with float32
+                input/output, or "int8" for full-integer quantization with uint8
+                input/output and the 1/255 rescaling folded into the model
+            representative_data_dir: Class-per-folder image directory used to
+                calibrate int8 quantization (e.g. data/train)
+            num_calibration_samples: Number of images used for calibration
+            evaluation_data_dir: Optional class-per-folder directory (e.g. data/test)
+                on which the float and int8 models are compared; the accuracy
+                delta is recorded in the model metadata JSON
+            max_evaluation_samples: Optional cap on the number of evaluation images
             
         Returns:
             Path to the saved TFLite model
         """
-        # Convert to TFLite
-        converter = tf.lite.TFLiteConverter.from_keras_model(model)
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        import tensorflow as tf
+        from tensorflow.keras import layers
+        
+        if quantization not in ("dynamic", "int8"):
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        
+        if quantization == "dynamic":
+            # Convert to TFLite
+            converter = tf.lite.TFLiteConverter.from_keras_model(model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        else:
+            if representative_data_dir is None:
+                raise ValueError("int8 quantization requires representative_data_dir")
+            
+            # Fold the 1/255 rescaling into the graph so the model takes raw pixels
+            export_model = tf.keras.Sequential([
+                layers.Input(shape=model.input_shape[1:]),
+                layers.Rescaling(1. / 255),
+                model
+            ])
+            calibration_images = self._load_images_for_quantization(
+                representative_data_dir, num_calibration_samples
+            )[0]
+            
+            def representative_dataset():
+                for image in calibration_images:
+                    yield [image[np.newaxis].astype(np.float32)]
+            
+            converter = tf.lite.TFLiteConverter.from_keras_model(export_model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.uint8
+            converter.inference_output_type = tf.uint8
+        
         tflite_model = converter.convert()
         
         # Save the TFLite model
@@ -228,14 +523,120 @@ class ModelManager:
         with open(tflite_file, 'wb') as f:
             f.write(tflite_model)
         
+        quantization_info = {
+            'mode': quantization,
+            'input_dtype': 'uint8' if quantization == "int8" else 'float32',
+            'tflite_size_bytes': len(tflite_model)
+        }
+        if quantization == "int8":
+            quantization_info['calibration_samples'] = len(calibration_images)
+            quantization_info['input_range'] = [0, 255]
+        
+        if evaluation_data_dir is not None:
+            images, labels = self._load_images_for_quantization(evaluation_data_dir, max_evaluation_samples)
+            float_scores = model.predict(images / 255.0, verbose=0)
+            interpreter = tf.lite.Interpreter(model_content=tflite_model)
+            interpreter.allocate_tensors()
+            tflite_scores = np.concatenate([
+                self.predict_batch_with_tflite(interpreter, images[i:i + 32] / 255.0)
+                for i in range(0, len(images), 32)
+            ])
+            float_accuracy = float(np.mean(np.argmax(float_scores, axis=1) == labels))
+            tflite_accuracy = float(np.mean(np.argmax(tflite_scores, axis=1) == labels))
+            quantization_info.update({
+                'evaluation_samples': len(labels),
+                'float_accuracy': float_accuracy,
+                'tflite_accuracy': tflite_accuracy,
+                'accuracy_delta': tflite_accuracy - float_accuracy
+            })
+        
+        self.update_metadata(model_name, {'tflite_quantization': quantization_info})
+        
         return tflite_file
     
-    def load_tflite_model(self, model_name: str = "tomato_disease_model") -> Tuple[tf.lite.Interpreter, Dict]:
+    def _load_images_for_quantization(self, data_dir: str,
+                                      max_samples: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Load a class-balanced sample of images as raw 0-255 pixels.
+        
+        Images go through the same enhancement and resizing as at serving time.
+        
+        Args:
+            data_dir: Directory with one sub-folder per class
+            max_samples: Maximum number of images (None loads all)
+            
+        Returns:
+            Tuple of (images as float32 (N, 224, 224, 3) in [0, 255], class indices)
+        """
+        from utils.image_processing import ImageProcessor
+        
+        image_processor = ImageProcessor()
+        per_class = {}
+        for class_index, class_name in enumerate(self.class_names):
+            class_dir = os.path.join(data_dir, class_name)
+            if os.path.isdir(class_dir):
+                files = sorted(f for f in os.listdir(class_dir)
+                               if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+                per_class[class_index] = [os.path.join(class_dir, f) for f in files]
+        
+        # Round-robin over classes so a small sample still covers every class
+        rng = np.random.default_rng(42)
+        for paths in per_class.values():
+            rng.shuffle(paths)
+        samples = []
+        while any(per_class.values()) and (max_samples is None or len(samples) < max_samples):
+            for class_index, paths in per_class.items():
+                if paths and (max_samples is None or len(samples) < max_samples):
+                    samples.append((paths.pop(), class_index))
+        
+        if not samples:
+            raise ValueError(f"No images found in {data_dir}")
+        
+        images = np.empty((len(samples), 224, 224, 3), dtype=np.float32)
+        for i, (path, _) in enumerate(samples):
+            image_processor.prepare_model_input(image_processor.load_image(path), images[i])
+        images *= 255.0
+        labels = np.array([class_index for _, class_index in samples])
+        
+        return images, labels
+    
+    def update_metadata(self, model_name: str, updates: Dict) -> Dict:
+        """
+        Merge fields into a model's metadata JSON.
+        
+        Args:
+            model_name: Name of the model
+            updates: Fields to add or replace
+            
+        Returns:
+            Updated metadata
+        """
+        metadata_file = os.path.join(self.model_path, f"{model_name}_metadata.json")
+        metadata = {}
+        if os.path.exists(metadata_file):
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+        
+        metadata.update(updates)
+        with open(metadata_file, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        
+        return metadata
+    
+    def load_tflite_model(self, model_name: str = "tomato_disease_model",
+                          num_threads: Optional[int] = None,
+                          model_content: Optional[bytes] = None,
+                          use_xnnpack: bool = True) -> Tuple[tf.lite.Interpreter, Dict]:
         """
         Load a TensorFlow Lite model.
         
         Args:
             model_name: Name of the model to load
+            num_threads: Number of CPU threads the interpreter may use (None for the runtime default)
+            model_content: Already loaded flatbuffer of the model; the interpreter
+                references it instead of reading the file, so interpreters built
+                on the same buffer (also across forked workers) share its memory
+            use_xnnpack: Apply the runtime's default XNNPACK CPU delegate
             
         Returns:
             Tuple of (interpreter, metadata)
@@ -243,11 +644,20 @@ class ModelManager:
         tflite_file = os.path.join(self.model_path, f"{model_name}.tflite")
         metadata_file = os.path.join(self.model_path, f"{model_name}_metadata.json")
         
-        if not os.path.exists(tflite_file):
+        if model_content is None and not os.path.exists(tflite_file):
             raise FileNotFoundError(f"TFLite model file not found: {tflite_file}")
         
-        # Load the TFLite model
-        interpreter = tf.lite.Interpreter(model_path=tflite_file)
+        # Load the TFLite model with the lightest available runtime
+        Interpreter = get_interpreter_class()
+        options = {'num_threads': num_threads}
+        if not use_xnnpack:
+            # OpResolverType lives next to the Interpreter in every runtime package
+            op_resolver_type = sys.modules[Interpreter.__module__].OpResolverType
+            options['experimental_op_resolver_type'] = op_resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        if model_content is not None:
+            interpreter = Interpreter(model_content=model_content, **options)
+        else:
+            interpreter = Interpreter(model_path=tflite_file, **options)
         interpreter.allocate_tensors()
         
         # Load metadata
@@ -269,24 +679,66 @@ class ModelManager:
         Returns:
             Tuple of (predictions, predicted_class)
         """
-        # Get input and output details
+        # Run inference on a batch of one
+        predictions = self.predict_batch_with_tflite(interpreter, image)
+        
+        # Get predicted class
+        predicted_class_idx = np.argmax(predictions[0])
+        predicted_class = self.class_names[predicted_class_idx]
+        
+        return predictions[0], predicted_class
+    
+    def predict_batch_with_tflite(self, interpreter: tf.lite.Interpreter, images: np.ndarray) -> np.ndarray:
+        """
+        Run a single TensorFlow Lite invocation over a batch of images.
+        
+        The interpreter input is resized to the batch size when it differs
+        from the currently allocated shape.
+        
+        Args:
+            interpreter: TFLite interpreter
+            images: Preprocessed images with shape (N, height, width, channels), either
+                float32 in [0, 1] or uint8 pixels (converted to the model's input type)
+            
+        Returns:
+            Prediction scores with shape (N, num_classes)
+        """
         input_details = interpreter.get_input_details()
         output_details = interpreter.get_output_details()
         
-        # Set input tensor
-        interpreter.set_tensor(input_details[0]['index'], image)
+        # Full-integer models take raw uint8 pixels instead of [0, 1] floats
+        input_dtype = input_details[0]['dtype']
+        if input_dtype == np.uint8:
+            scale, zero_point = input_details[0]['quantization']
+            identity_quantization = scale in (0.0, 1.0) and zero_point == 0
+            if images.dtype != np.uint8 or not identity_quantization:
+                pixels = images * 255.0 if images.dtype != np.uint8 else images.astype(np.float32)
+                if scale:
+                    pixels = pixels / scale + zero_point
+                images = np.clip(np.rint(pixels), 0, 255).astype(np.uint8)
+        elif input_dtype == np.float32 and images.dtype != np.float32:
+            images = images.astype(np.float32) / 255.0
+        
+        # Resize the input tensor only when the batch size changes
+        batch_size = images.shape[0]
+        if input_details[0]['shape'][0] != batch_size:
+            interpreter.resize_tensor_input(
+                input_details[0]['index'], [batch_size, *images.shape[1:]]
+            )
+            interpreter.allocate_tensors()
         
-        # Run inference
+        interpreter.set_tensor(input_details[0]['index'], images)
         interpreter.invoke()
         
-        # Get output tensor
-        predictions = interpreter.get_tensor(output_details[0]['index'])
+        # Copy the output so it survives the next invocation
+        predictions = np.array(interpreter.get_tensor(output_details[0]['index']))
         
-        # Get predicted class
-        predicted_class_idx = np.argmax(predictions[0])
-        predicted_class = self.class_names[predicted_class_idx]
+        # Dequantize integer outputs back to probabilities
+        if output_details[0]['dtype'] != np.float32:
+            scale, zero_point = output_details[0]['quantization']
+            predictions = (predictions.astype(np.float32) - zero_point) * scale
         
-        return predictions[0], predicted_class
+        return predictions
     
     def get_model_summary(self, model: tf.keras.Model) -> str:
         """
@@ -333,4 +785,373 @@ class ModelManager:
             'classification_report': report,
             'confusion_matrix': conf_matrix.tolist(),
             'predictions': predictions.tolist()
-        } 
\ No newline at end of file
+        }
+
+
+class InterpreterPool:
+    """Thread-safe pool of TensorFlow Lite interpreters for concurrent inference."""
+    
+    def __init__(self, model_manager: ModelManager, model_name: str = "tomato_disease_model",
+                 pool_size: int = 2, num_threads: Optional[int] = 1,
+                 model_content: Optional[bytes] = None, use_xnnpack: bool = True):
+        """
+        Initialize the interpreter pool.
+        
+        Args:
+            model_manager: Model manager used to load each interpreter
+            model_name: Name of the TFLite model to load
+            pool_size: Number of interpreters in the pool
+            num_threads: Number of CPU threads given to each interpreter
+            model_content: Optional preloaded flatbuffer shared by all interpreters
+            use_xnnpack: Apply the XNNPACK CPU delegate to each interpreter
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        
+        self.model_name = model_name
+        self.pool_size = pool_size
+        self.num_threads = num_threads
+        self.metadata = {}
+        
+        self._available = queue.Queue()
+        for _ in range(pool_size):
+            interpreter, self.metadata = model_manager.load_tflite_model(
+                model_name, num_threads=num_threads, model_content=model_content, use_xnnpack=use_xnnpack
+            )
+            self._available.put(interpreter)
+        
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+    
+    @property
+    def input_dtype(self) -> np.dtype:
+        """Input tensor type of the pooled model (uint8 for full-integer models)."""
+        interpreter = self.acquire()
+        try:
+            return np.dtype(interpreter.get_input_details()[0]['dtype'])
+        finally:
+            self.release(interpreter)
+    
+    def acquire(self, timeout: Optional[float] = None) -> tf.lite.Interpreter:
+        """
+        Check an interpreter out of the pool, blocking until one is free.
+        
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+            
+        Returns:
+            TFLite interpreter owned by the caller until released
+        """
+        start = time.perf_counter()
+        try:
+            interpreter = self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No TFLite interpreter became available in time")
+        
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_time += time.perf_counter() - start
+        
+        return interpreter
+    
+    def release(self, interpreter: tf.lite.Interpreter) -> None:
+        """
+        Return an interpreter to the pool.
+        
+        Args:
+            interpreter: Interpreter previously obtained from acquire()
+        """
+        with self._lock:
+            self._in_use -= 1
+        self._available.put(interpreter)
+    
+    @contextmanager
+    def interpreter(self, timeout: Optional[float] = None):
+        """
+        Context manager that checks an interpreter out and back in.
+        
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+        """
+        interpreter = self.acquire(timeout)
+        try:
+            yield interpreter
+        finally:
+            self.release(interpreter)
+    
+    def stats(self) -> Dict:
+        """
+        Report pool utilization.
+        
+        Returns:
+            Dictionary containing pool size, usage and wait statistics
+        """
+        with self._lock:
+            in_use = self._in_use
+            checkouts = self._checkouts
+            wait_time = self._wait_time
+        
+        return {
+            'pool_size': self.pool_size,
+            'num_threads': self.num_threads,
+            'in_use': in_use,
+            'available': self.pool_size - in_use,
+            'utilization': in_use / self.pool_size,
+            'total_checkouts': checkouts,
+            'avg_wait_ms': (wait_time / checkouts * 1000.0) if checkouts else 0.0
+        }
+
+
+class InferenceBackend:
+    """
+    Interface shared by the inference backends.
+    
+    A backend scores batches of preprocessed images; batching and
+    post-processing are done by the caller, so backends are interchangeable.
+    """
+    
+    name = None
+    # Suffix of the model file or directory in the model directory
+    artifact_suffix = None
+    
+    def __init__(self, model_manager: ModelManager, model_name: str = "tomato_disease_model"):
+        """
+        Initialize the backend.
+        
+        Args:
+            model_manager: Model manager pointing at the model directory
+            model_name: Name of the model to serve
+        """
+        self.model_manager = model_manager
+        self.model_name = model_name
+        self.metadata = {}
+        self.input_dtype = np.dtype(np.float32)
+        self.input_shape = (224, 224, 3)
+        # Number of batches that may run at the same time
+        self.concurrency = 1
+    
+    @classmethod
+    def artifact_path(cls, model_dir: str, model_name: str) -> str:
+        """
+        Path of the file whose changes mark a new version of a model.
+        
+        Args:
+            model_dir: Model directory
+            model_name: Name of the model
+            
+        Returns:
+            Path to the model file
+        """
+        return os.path.join(model_dir, f"{model_name}{cls.artifact_suffix}")
+    
+    @classmethod
+    def model_names(cls, model_dir: str) -> List[str]:
+        """
+        List the models in a directory that this backend can serve.
+        
+        Args:
+            model_dir: Model directory
+            
+        Returns:
+            Sorted model names
+        """
+        if not os.path.isdir(model_dir):
+            return []
+        
+        names = [entry[:-len(cls.artifact_suffix)] for entry in os.listdir(model_dir)
+                 if entry.endswith(cls.artifact_suffix)]
+        return sorted(name for name in names if os.path.exists(cls.artifact_path(model_dir, name)))
+    
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """
+        Score a batch of preprocessed images.
+        
+        Args:
+            images: Preprocessed images with shape (N, height, width, channels)
+            
+        Returns:
+            Prediction scores with shape (N, num_classes)
+        """
+        raise NotImplementedError
+    
+    def stats(self) -> Dict:
+        """
+        Report backend statistics.
+        
+        Returns:
+            Dictionary describing the backend
+        """
+        return {'backend': self.name, 'concurrency': self.concurrency}
+
+
+class TFLiteBackend(InferenceBackend):
+    """TensorFlow Lite interpreters (XNNPACK by default) in a thread-safe pool."""
+    
+    name = "tflite"
+    artifact_suffix = ".tflite"
+    
+    def __init__(self, model_manager: ModelManager, model_name: str = "tomato_disease_model",
+                 pool_size: int = 2, num_threads: Optional[int] = 1,
+                 use_xnnpack: bool = True, model_content: Optional[bytes] = None):
+        """
+        Initialize the TFLite backend.
+        
+        Args:
+            model_manager: Model manager pointing at the model directory
+            model_name: Name of the TFLite model
+            pool_size: Number of pooled interpreters
+            num_threads: CPU threads per interpreter
+            use_xnnpack: Apply the XNNPACK CPU delegate
+            model_content: Optional preloaded flatbuffer to build the interpreters on
+        """
+        super().__init__(model_manager, model_name)
+        self.pool = InterpreterPool(model_manager, model_name, pool_size=pool_size, num_threads=num_threads,
+                                    model_content=model_content, use_xnnpack=use_xnnpack)
+        self.use_xnnpack = use_xnnpack
+        self.metadata = self.pool.metadata
+        self.input_dtype = self.pool.input_dtype
+        with self.pool.interpreter() as interpreter:
+            self.input_shape = tuple(int(d) for d in interpreter.get_input_details()[0]['shape'][1:])
+        self.concurrency = self.pool.pool_size
+    
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        with self.pool.interpreter() as interpreter:
+            return self.model_manager.predict_batch_with_tflite(interpreter, images)
+    
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update(self.pool.stats())
+        stats['use_xnnpack'] = self.use_xnnpack
+        return stats
+
+
+class KerasFunctionBackend(InferenceBackend):
+    """Keras model called through a compiled, fixed-signature ``tf.function``."""
+    
+    name = "keras"
+    artifact_suffix = ".h5"
+    
+    def __init__(self, model_manager: ModelManager, model_name: str = "tomato_disease_model",
+                 jit_compile: bool = False):
+        """
+        Initialize the Keras backend.
+        
+        Unlike ``model.predict``, which builds a data adapter and callback loop
+        on every call, the model is traced once into a graph for
+        ``(None, height, width, channels)`` float32 batches and reused.
+        
+        Args:
+            model_manager: Model manager pointing at the model directory
+            model_name: Name of the Keras (.h5) model
+            jit_compile: Also compile the graph with XLA
+        """
+        import tensorflow as tf
+        
+        super().__init__(model_manager, model_name)
+        self.model, self.metadata = model_manager.load_model(model_name)
+        self.input_shape = tuple(self.model.input_shape[1:])
+        
+        model = self.model
+        self._function = tf.function(
+            lambda images: model(images, training=False),
+            input_signature=[tf.TensorSpec([None, *self.input_shape], tf.float32)],
+            jit_compile=jit_compile
+        )
+    
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        if images.dtype != np.float32:
+            images = images.astype(np.float32) / 255.0
+        return self._function(images).numpy()
+
+
+class SavedModelBackend(InferenceBackend):
+    """Serving signature of a SavedModel (see ``ModelManager.export_saved_model``)."""
+    
+    name = "savedmodel"
+    artifact_suffix = "_savedmodel"
+    
+    def __init__(self, model_manager: ModelManager, model_name: str = "tomato_disease_model",
+                 signature: str = "serving_default"):
+        """
+        Initialize the SavedModel backend.
+        
+        Args:
+            model_manager: Model manager pointing at the model directory
+            model_name: Name of the model (loaded from ``<model_name>_savedmodel``)
+            signature: Signature to call
+        """
+        import tensorflow as tf
+        
+        super().__init__(model_manager, model_name)
+        export_dir = os.path.join(model_manager.model_path, f"{model_name}{self.artifact_suffix}")
+        if not os.path.isdir(export_dir):
+            raise FileNotFoundError(f"SavedModel not found: {export_dir}")
+        
+        self._loaded = tf.saved_model.load(export_dir)
+        self._function = self._loaded.signatures[signature]
+        self.metadata = model_manager.load_metadata(model_name)
+        
+        # Signatures take keyword arguments; use the single input's name
+        _, input_specs = self._function.structured_input_signature
+        self._input_name, input_spec = next(iter(input_specs.items()))
+        self.input_shape = tuple(input_spec.shape[1:])
+    
+    @classmethod
+    def artifact_path(cls, model_dir: str, model_name: str) -> str:
+        return os.path.join(model_dir, f"{model_name}{cls.artifact_suffix}", "saved_model.pb")
+    
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        if images.dtype != np.float32:
+            images = images.astype(np.float32) / 255.0
+        outputs = self._function(**{self._input_name: images})
+        return next(iter(outputs.values())).numpy()
+
+
+INFERENCE_BACKENDS = {
+    backend.name: backend for backend in (TFLiteBackend, KerasFunctionBackend, SavedModelBackend)
+}
+
+
+def create_backend(name: str, model_manager: ModelManager, model_name: str = "tomato_disease_model",
+                   **options) -> InferenceBackend:
+    """
+    Create an inference backend by name.
+    
+    Args:
+        name: Backend name (``tflite``, ``keras`` or ``savedmodel``)
+        model_manager: Model manager pointing at the model directory
+        model_name: Name of the model to serve
+        **options: Backend-specific options
+        
+    Returns:
+        Loaded inference backend
+    """
+    if name not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name} (choose from {', '.join(INFERENCE_BACKENDS)})")
+    return INFERENCE_BACKENDS[name](model_manager, model_name, **options)
+
+
+def convert_input(images: np.ndarray, dtype) -> np.ndarray:
+    """
+    Convert preprocessed images to a model's input type.
+    
+    Float inputs hold [0, 1] values and uint8 inputs (full-integer models)
+    hold [0, 255] values; serving and evaluation both convert through here.
+    
+    Args:
+        images: Preprocessed images (float in [0, 1] or uint8)
+        dtype: Input dtype of the model
+        
+    Returns:
+        Images with the model's input dtype (``images`` itself if it already matches)
+    """
+    if images.dtype == dtype:
+        return images
+    if np.dtype(dtype) == np.uint8:
+        return np.rint(images * 255.0).astype(np.uint8)
+    if images.dtype == np.uint8:
+        return images.astype(dtype) / np.asarray(255.0, dtype=dtype)
+    return images.astype(dtype)
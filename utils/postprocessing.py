@@ -0,0 +1,127 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Mapping from model class names to frontend keys
+FRONTEND_CLASS_KEYS = {
+    "Tomato___Bacterial_spot": "Bacterial_spot",
+    "Tomato___Early_blight": "Early_blight",
+    "Tomato___Late_blight": "Late_blight",
+    "Tomato___Leaf_Mold": "Leaf_Mold",
+    "Tomato___Septoria_leaf_spot": "Septoria_leaf_spot",
+    "Tomato___Spider_mites Two-spotted_spider_mite": "Spider_mites",
+    "Tomato___Target_Spot": "Target_Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Tomato_Yellow_Leaf_Curl_Virus",
+    "Tomato___Tomato_mosaic_virus": "Tomato_mosaic_virus",
+    "Tomato___healthy": "healthy"
+}
+
+class PredictionPostprocessor:
+    """Vectorized post-processing of model scores into prediction results."""
+
+    def __init__(self, class_names: List[str], top_k: int = 3):
+        """
+        Initialize the post-processor.
+
+        Args:
+            class_names: Class names in model output order
+            top_k: Number of top predictions to report per image
+        """
+        self.class_names = list(class_names)
+        self.num_classes = len(self.class_names)
+        self.top_k = min(top_k, self.num_classes)
+
+        # Label tables are built once and indexed with the top-k indices
+        self.frontend_keys = np.array(
+            [FRONTEND_CLASS_KEYS.get(name, name) for name in self.class_names], dtype=object
+        )
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict, default_class_names: List[str],
+                      top_k: int = 3) -> 'PredictionPostprocessor':
+        """
+        Build a post-processor from model metadata.
+
+        Args:
+            metadata: Model metadata loaded from the metadata JSON
+            default_class_names: Class names to use when the metadata has none
+            top_k: Number of top predictions to report per image
+
+        Returns:
+            PredictionPostprocessor for the model
+        """
+        class_names = metadata.get('class_names') or default_class_names
+        return cls(class_names, top_k)
+
+    def top_k_indices(self, scores: np.ndarray, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Select the k highest scores of every row with one partial sort.
+
+        Args:
+            scores: Score matrix with shape (N, num_classes)
+            k: Number of entries to keep (defaults to top_k)
+
+        Returns:
+            Tuple of (indices, values), both with shape (N, k) and sorted by descending score
+        """
+        k = self.top_k if k is None else k
+        scores = np.asarray(scores).reshape(-1, self.num_classes)
+
+        # Unordered top-k per row, then order just those k entries
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_values = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_values, axis=1, kind='stable')
+
+        indices = np.take_along_axis(top, order, axis=1)
+        values = np.take_along_axis(top_values, order, axis=1)
+
+        return indices, values
+
+    def format_results(self, scores: np.ndarray) -> List[Dict]:
+        """
+        Build the response dictionaries for a batch of model scores.
+
+        Args:
+            scores: Score matrix with shape (N, num_classes)
+
+        Returns:
+            List of N dictionaries containing prediction results
+        """
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1, self.num_classes)
+        indices, values = self.top_k_indices(scores)
+
+        top_keys = self.frontend_keys[indices].tolist()
+        top_values = values.tolist()
+        all_scores = scores.tolist()
+        timestamp = datetime.now().isoformat()
+
+        results = []
+        for keys, confidences, row in zip(top_keys, top_values, all_scores):
+            results.append({
+                'predicted_class': keys[0],
+                'confidence': confidences[0],
+                'all_predictions': dict(zip(self.class_names, row)),
+                'top_predictions': [
+                    {
+                        'class': key,
+                        'confidence': confidence,
+                        'percentage': confidence * 100
+                    }
+                    for key, confidence in zip(keys, confidences)
+                ],
+                'timestamp': timestamp
+            })
+
+        return results
+
+    def format_result(self, scores: np.ndarray) -> Dict:
+        """
+        Build the response dictionary for a single row of model scores.
+
+        Args:
+            scores: Prediction scores for a single image
+
+        Returns:
+            Dictionary containing prediction results
+        """
+        return self.format_results(scores)[0]
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+class PredictionCache:
+    """Content-addressed LRU cache of prediction results for repeated uploads."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0,
+                 on_lookup: Optional[Callable[[bool], None]] = None):
+        """
+        Initialize the prediction cache.
+
+        Args:
+            max_entries: Maximum number of cached results (0 disables caching)
+            ttl_seconds: Time after which a cached result expires
+            on_lookup: Optional callback receiving whether each lookup was a hit (for metrics)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_lookup = on_lookup
+        self.model_identity = ''
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def model_identity_from_metadata(metadata: Dict, artifact_path: Optional[str] = None) -> str:
+        """
+        Derive a stable identity for a model from its metadata.
+
+        Args:
+            metadata: Model metadata loaded from the metadata JSON
+            artifact_path: Optional model file whose size and mtime are mixed in,
+                so retrained models sharing the same metadata get a new identity
+
+        Returns:
+            Hex digest identifying the model
+        """
+        identity = {'metadata': metadata}
+        if artifact_path is not None and os.path.exists(artifact_path):
+            stat = os.stat(artifact_path)
+            identity['artifact'] = [os.path.basename(artifact_path), stat.st_size, stat.st_mtime_ns]
+
+        encoded = json.dumps(identity, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def set_model_identity(self, identity: str) -> None:
+        """
+        Record the identity of the loaded model, dropping results of any other model.
+
+        Args:
+            identity: Identity of the newly loaded model
+        """
+        with self._lock:
+            if identity != self.model_identity:
+                self._entries.clear()
+                self.model_identity = identity
+
+    def make_key(self, image_bytes: bytes, variant: str = '') -> str:
+        """
+        Build the cache key for an upload.
+
+        Args:
+            image_bytes: Raw bytes of the uploaded image
+            variant: Optional prediction mode (e.g. test-time augmentation settings)
+
+        Returns:
+            Cache key combining the content hash, the model identity and the variant
+        """
+        key = f"{self.model_identity}:{hashlib.sha256(image_bytes).hexdigest()}"
+        return f"{key}:{variant}" if variant else key
+
+    def get_or_compute(self, image_bytes: bytes, compute_fn: Callable[[], Dict],
+                       cacheable: Optional[Callable[[Dict], bool]] = None, variant: str = '') -> Dict:
+        """
+        Return a cached result, or compute it once even under concurrent identical requests.
+
+        Args:
+            image_bytes: Raw bytes of the uploaded image
+            compute_fn: Function producing the prediction result
+            cacheable: Optional predicate deciding whether a result may be stored
+            variant: Optional prediction mode; results of different modes are cached separately
+
+        Returns:
+            Copy of the prediction result, with ``cached`` set when it is a stored
+            result computed for an earlier or concurrent identical request
+        """
+        if self.max_entries <= 0:
+            return dict(compute_fn(), cached=False)
+
+        key = self.make_key(image_bytes, variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                future, owner = None, False
+            else:
+                # Join an identical computation that is already running
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._in_flight[key] = future
+
+            if owner:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if self.on_lookup is not None:
+            self.on_lookup(not owner)
+        if entry is not None:
+            return dict(entry[0], cached=True)
+        if not owner:
+            # Shared results the owner did not store (e.g. errors) are not reported as cached
+            result, stored = future.result()
+            return dict(result, cached=stored)
+
+        try:
+            result = compute_fn()
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(key, None)
+            # Skip storing if the model changed while computing
+            stored = (cacheable is None or cacheable(result)) and key.startswith(f"{self.model_identity}:")
+            if stored:
+                self._entries[key] = (result, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result((result, stored))
+
+        return dict(result, cached=False)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache usage.
+
+        Returns:
+            Dictionary containing size, hit and miss counts and the hit rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
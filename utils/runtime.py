@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Fallback reference point when the process start time cannot be read from /proc
+_IMPORT_TIME = time.time()
+
+def get_interpreter_class():
+    """
+    Get the lightest available TensorFlow Lite interpreter class.
+
+    Prefers the standalone ``tflite_runtime`` package, then ``ai_edge_litert``,
+    and only falls back to full TensorFlow when neither is installed.
+
+    Returns:
+        Interpreter class accepting ``model_path``/``model_content`` and ``num_threads``
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+def process_uptime() -> float:
+    """
+    Seconds since the current process started.
+
+    Returns:
+        Process uptime, or time since this module was imported when /proc is unavailable
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 is the start time in clock ticks after boot; skip the command name
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        with open('/proc/uptime') as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time() - _IMPORT_TIME
+
+def memory_usage_mb() -> Dict[str, float]:
+    """
+    Resident memory of the current process.
+
+    Returns:
+        Dictionary with current and peak resident set size in MB
+    """
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_mb = 0.0
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    current_mb = peak_mb
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current_mb = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+
+    return {'rss_mb': current_mb, 'peak_rss_mb': peak_mb}
+
+def memory_sharing_mb() -> Dict[str, float]:
+    """
+    Split of the resident memory into pages shared with other processes and private pages.
+
+    For forked server workers, the private part is what each extra worker costs.
+
+    Returns:
+        Dictionary with shared and private resident memory in MB (empty when /proc is unavailable)
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.startswith(('Shared_', 'Private_')):
+                    name = 'shared_mb' if key.startswith('Shared_') else 'private_mb'
+                    usage[name] = usage.get(name, 0.0) + int(value.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return usage
+
+def startup_report() -> Dict:
+    """
+    Summarize how long startup took and what it cost in memory.
+
+    Returns:
+        Dictionary with startup time, memory usage and whether TensorFlow was imported
+    """
+    report = {'startup_seconds': process_uptime()}
+    report.update(memory_usage_mb())
+    report.update(memory_sharing_mb())
+    report['tensorflow_imported'] = 'tensorflow' in sys.modules
+    return report